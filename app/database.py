@@ -1,19 +1,142 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import create_engine, Session
+from sqlalchemy.exc import OperationalError
+from contextvars import ContextVar
+import itertools
 import os
 from dotenv import load_dotenv
 
+from app.utils.locations import current_location_id
+from app.utils.logger import logger
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=True)
+# SQL statement logging is expensive on every query: opt-in only
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# connections kept open per process; the readiness check opens them all
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, pool_size=DB_POOL_SIZE)
 # Creates the database connection engine
 
+
+def parse_shards(value: str) -> dict:
+    # "2=postgresql://...,3=postgresql://..." -> {2: url, 3: url}
+    shards = {}
+    for entry in value.split(","):
+        if entry.strip():
+            location_id, url = entry.split("=", 1)
+            shards[int(location_id)] = url.strip()
+    return shards
+
+
+# Locations whose rows live in a database of their own (e.g. a busy store
+# on its own PostgreSQL node); all the others are in DATABASE_URL. Several
+# locations can share one. Each database has the full schema (alembic
+# upgrade head on each).
+LOCATION_SHARDS = parse_shards(os.getenv("LOCATION_SHARDS", ""))
+_engines_by_url = {DATABASE_URL: engine}
+for _url in LOCATION_SHARDS.values():
+    if _url not in _engines_by_url:
+        _engines_by_url[_url] = create_engine(_url, echo=SQL_ECHO, pool_size=DB_POOL_SIZE)
+shard_engines = {location_id: _engines_by_url[url]
+                 for location_id, url in LOCATION_SHARDS.items()}
+
+
+def engine_for(location_id: int = None):
+    # the database of a location (the request's location by default)
+    if location_id is None:
+        location_id = current_location_id()
+    return shard_engines.get(location_id, engine)
+
+
+def all_engines() -> list:
+    # the main database first, then every shard database once
+    return list(_engines_by_url.values())
+
+
+# Optional read replicas (comma separated URLs) for the GET routes
+READ_REPLICA_URLS = [url.strip() for url in
+                     os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# seconds between replica health checks (see app/utils/warmup.py)
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "5"))
+
+
+class ReplicaPool:
+    # Round robin over the replicas that passed their last health check
+
+    def __init__(self, urls):
+        # pre-ping: a replica that went away fails at checkout, not mid-query
+        self.engines = [create_engine(url, echo=SQL_ECHO, pool_size=DB_POOL_SIZE,
+                                      pool_pre_ping=True) for url in urls]
+        self.healthy = [True] * len(self.engines)
+        self._turn = itertools.count()
+
+    def candidates(self):
+        # healthy replicas, starting with the next one in turn
+        count = len(self.engines)
+        if not count:
+            return []
+        start = next(self._turn) % count
+        return [self.engines[i % count] for i in range(start, start + count)
+                if self.healthy[i % count]]
+
+    def set_health(self, replica, healthy: bool):
+        index = self.engines.index(replica)
+        if self.healthy[index] != healthy:
+            state = "back up" if healthy else "down"
+            logger.warning(f"Database - replica {replica.url!r} is {state}")
+        self.healthy[index] = healthy
+
+    def check(self):
+        # SELECT 1 on every replica; run periodically by the warm-up task
+        for replica in self.engines:
+            try:
+                with replica.connect() as connection:
+                    connection.exec_driver_sql("SELECT 1")
+            except Exception:
+                self.set_health(replica, False)
+            else:
+                self.set_health(replica, True)
+
+
+replicas = ReplicaPool(READ_REPLICA_URLS)
+
+# True while the client is inside its read-your-writes window: set per
+# request by app/utils/read_your_writes.py
+prefer_primary = ContextVar("prefer_primary", default=False)
+
 # Needed by FastAPI routes to access the DB session
 
 
 def get_session():
-    # FastAPI dependency that gives a new DB session per request
-    with Session(engine) as session:
+    # FastAPI dependency that gives a new DB session per request, on the
+    # database of the request's location
+    with Session(engine_for()) as session:
         # opens a database connection, hands it over to your route
         # automatically closes it after the request is done
         yield session
+
+
+def get_read_session():
+    # Like get_session, for read-only routes: a session on a healthy
+    # replica, or on the primary when there are none, none is reachable or
+    # the client wrote something a moment ago. The replicas are the main
+    # database's: a location in a shard reads its shard.
+    if current_location_id() in shard_engines:
+        with Session(engine_for()) as session:
+            yield session
+        return
+    if not prefer_primary.get():
+        for replica in replicas.candidates():
+            session = Session(replica)
+            try:
+                session.connection()
+            except OperationalError:
+                session.close()
+                replicas.set_health(replica, False)
+                continue
+            with session:
+                yield session
+            return
+    with Session(engine) as session:
+        yield session
@@ -1,29 +1,25 @@
 # Makes 'models' a Python package
 # Without this we can't import models, raises error Module Not Found
-from .menu import *
-from .employees import *
-from .customers import *
-from .orders import *
-from .order_items import *
-from .order_summary import *
+from .menu import MenuItem, MenuItemCreate, MenuItemRead, MenuItemStock, MenuItemUpdate
+from .employees import Employee, EmployeeCreate, EmployeeRead, EmployeeUpdate
+from .customers import Customer, CustomerCreate, CustomerRead, CustomerUpdate
+from .orders import ACTIVE_STATUSES, Order, OrderCreate, OrderRead, OrderUpdate
+from .order_items import OrderItem, OrderItemCreate, MenuItemNested, OrderItemRead
+from .order_summary import ItemSummary, OrderSummary, PaginatedOrderSummary
+from .batch import BatchGet, CustomerBatch, EmployeeBatch, MenuItemBatch, OrderBatch
+from .archive import OrderArchive, OrderItemArchive
 
 
 __all__ = [
-    "MenuItem", "MenuItemCreate", "MenuItemRead", "MenuItemUpdate",
+    "MenuItem", "MenuItemCreate", "MenuItemRead", "MenuItemStock", "MenuItemUpdate",
     "Employee", "EmployeeCreate", "EmployeeRead", "EmployeeUpdate",
     "Customer", "CustomerCreate", "CustomerRead", "CustomerUpdate",
-    "Order", "OrderCreate", "OrderRead", "OrderUpdate",
+    "ACTIVE_STATUSES", "Order", "OrderCreate", "OrderRead", "OrderUpdate",
     "OrderItem", "OrderItemCreate", "MenuItemNested", "OrderItemRead",
-    "ItemSummary", "OrderSummary", "PaginatedOrderSummary"
+    "ItemSummary", "OrderSummary", "PaginatedOrderSummary",
+    "BatchGet", "CustomerBatch", "EmployeeBatch", "MenuItemBatch", "OrderBatch",
+    "OrderArchive", "OrderItemArchive"
 ]
 
-# Rebuild Pydantic models with forward references
-Customer.model_rebuild()
-MenuItem.model_rebuild()
-Order.model_rebuild()
-OrderCreate.model_rebuild()
-OrderRead.model_rebuild()
-OrderUpdate.model_rebuild()
-OrderItem.model_rebuild()
-OrderItemCreate.model_rebuild()
-OrderItemRead.model_rebuild()
+# No model_rebuild() calls: every schema resolves its nested models when it
+# is defined, and the Relationship() forward refs are resolved by SQLAlchemy
@@ -0,0 +1,43 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlalchemy.sql import func
+
+from app.utils.locations import LocationScoped
+
+# Cold storage for finished orders (see app/utils/archive.py). The ARQ
+# worker moves old Completed/Cancelled orders and their items here, so
+# `orders` and `order_items` (and their indexes) only hold recent and
+# active ones. Same columns as the live tables, ids included; rows here
+# are never written again.
+
+
+class OrderArchive(LocationScoped, SQLModel, table=True):
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        # a customer's latest order (Customer.last_order_at) and history
+        Index("ix_orders_archive_customer_id_created_at",
+              "customer_id", "created_at"),
+    )
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    customer_id: int = Field(foreign_key="customers.id")
+    created_at: Optional[datetime] = None
+    status: str = Field(max_length=20)
+    version: int
+    order_total: float
+    location_id: int = Field(sa_column_kwargs={"server_default": "1"})
+    archived_at: Optional[datetime] = Field(
+        default=None, sa_column_kwargs={"server_default": func.now()})
+
+
+class OrderItemArchive(SQLModel, table=True):
+    __tablename__ = "order_items_archive"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    order_id: int = Field(foreign_key="orders_archive.id", index=True)
+    menu_item_id: int = Field(foreign_key="menu_items.id")
+    quantity: int
+    unit_price: float
+    line_total: float
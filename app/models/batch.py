@@ -0,0 +1,36 @@
+from typing import List
+from sqlmodel import Field, SQLModel
+
+from .customers import CustomerRead
+from .employees import EmployeeRead
+from .menu import MenuItemRead
+from .orders import OrderRead
+
+# Most ids per batch read: they go into one IN (...) query
+MAX_BATCH_IDS = 1000
+
+
+class BatchGet(SQLModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+
+# Batch read results: the rows found, in the order of the requested ids
+# (each id once), and the ids that don't exist
+class MenuItemBatch(SQLModel):
+    items: List[MenuItemRead]
+    missing: List[int]
+
+
+class CustomerBatch(SQLModel):
+    items: List[CustomerRead]
+    missing: List[int]
+
+
+class EmployeeBatch(SQLModel):
+    items: List[EmployeeRead]
+    missing: List[int]
+
+
+class OrderBatch(SQLModel):
+    items: List[OrderRead]
+    missing: List[int]
@@ -1,25 +1,40 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List, TYPE_CHECKING
 from pydantic import field_validator
-from datetime import date
+from datetime import date, datetime
+from sqlalchemy import UniqueConstraint
 from sqlalchemy.sql import func
 
+from app.utils.locations import LocationScoped, location_field
+
 if TYPE_CHECKING:
     from .orders import Order
 
 # DB Model
 
 
-class Customer(SQLModel, table=True):
+class Customer(LocationScoped, SQLModel, table=True):
     __tablename__ = "customers"
+    __table_args__ = (
+        # emails are unique per location
+        UniqueConstraint("location_id", "email", name="uq_customers_location_id_email"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(max_length=100)
-    email: Optional[str] = Field(
-        max_length=120, sa_column_kwargs={"unique": True})
+    email: Optional[str] = Field(max_length=120)
     phone: Optional[str] = Field(default=None, max_length=20)
     joined_date: Optional[date] = Field(default=None, sa_column_kwargs={
-                                        "server_default": func.now()})
+                                        "server_default": func.current_date()})
+
+    # lifetime stats, kept current by the order write paths
+    # (app/utils/customer_stats.py) so reading them costs no extra query
+    order_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    lifetime_spend: float = Field(
+        default=0, sa_column_kwargs={"server_default": "0"})
+    last_order_at: Optional[datetime] = None
+    # the restaurant (app/utils/locations.py)
+    location_id: int = location_field()
 
     orders: List["Order"] = Relationship(back_populates="customer")
 
@@ -43,10 +58,14 @@ class CustomerCreate(SQLModel):
 # Read Schema
 class CustomerRead(SQLModel):
     id: int
+    location_id: int
     name: str
     email: Optional[str]
     phone: Optional[str]
     joined_date: Optional[date]
+    order_count: int
+    lifetime_spend: float
+    last_order_at: Optional[datetime]
 
 
 # Update Schema
@@ -2,19 +2,28 @@ from sqlmodel import SQLModel, Field
 from typing import Optional
 from pydantic import field_validator
 from datetime import date
+from sqlalchemy import UniqueConstraint
+
+from app.utils.locations import LocationScoped, location_field
 
 
 # DB Model
-class Employee(SQLModel, table=True):
+class Employee(LocationScoped, SQLModel, table=True):
     __tablename__ = "employees"
+    __table_args__ = (
+        # emails and phones are unique per location
+        UniqueConstraint("location_id", "email", name="uq_employees_location_id_email"),
+        UniqueConstraint("location_id", "phone", name="uq_employees_location_id_phone"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(max_length=100)
     role: str = Field(max_length=50)
-    email: str = Field(max_length=120, sa_column_kwargs={"unique": True})
-    phone: Optional[str] = Field(
-        default=None, max_length=20, sa_column_kwargs={"unique": True})
+    email: str = Field(max_length=120)
+    phone: Optional[str] = Field(default=None, max_length=20)
     hire_date: date
+    # the restaurant (app/utils/locations.py)
+    location_id: int = location_field()
 
     def __repr__(self):
         return f"<Employee {self.name} (${self.role})>"
@@ -38,6 +47,7 @@ class EmployeeCreate(SQLModel):
 # Read Schema
 class EmployeeRead(SQLModel):
     id: int
+    location_id: int
     name: str
     role: str
     email: str
@@ -5,34 +5,55 @@ from typing import Optional, List, TYPE_CHECKING
 # Optional[...]: Tells Python that a field can be None
 from pydantic import field_validator
 # to define custom validators
+from sqlalchemy import Index, UniqueConstraint, func
+
+from app.utils.locations import LocationScoped, location_field
 
 if TYPE_CHECKING:
     from .order_items import OrderItem
 
 
 # DB Model
-class MenuItem(SQLModel, table=True):
+class MenuItem(LocationScoped, SQLModel, table=True):
     # table=True: To let SQLModel know it should create and map to a db table
     # the table will be created from scratch if we call create _all()
     __tablename__ = "menu_items"
     # Optional in SQLModel, it will infer the tablename default as menuitem
+    __table_args__ = (
+        # names are unique per location
+        UniqueConstraint("location_id", "name", name="uq_menu_items_location_id_name"),
+        # GET /menu/search?category=...&min_price=...&max_price=...
+        Index("ix_menu_items_category_price", "category", "price"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     # creates column id, Optional because auto-generated
     # Field(...): Tells SQLModel it is pk and should default to None
     # (so the DB will auto-generate it)
-    name: str = Field(max_length=100, sa_column_kwargs={"unique": True})
-    # required column, sqlalchemy setting: unique
+    name: str = Field(max_length=100)
+    # required column, unique per location (uq_menu_items_location_id_name)
     description: Optional[str] = None
     price: float
     category: str = Field(max_length=50)
     preparation_time_minutes: int
+    # units left as of the last reconciliation with the live Redis counter
+    # (app/utils/stock.py); NULL: stock isn't tracked, never sold out
+    stock_quantity: Optional[int] = None
+    # the restaurant (app/utils/locations.py)
+    location_id: int = location_field()
 
     order_items: List["OrderItem"] = Relationship(back_populates="menu_item")
 
     def __repr__(self):
         return f"<MenuItem {self.name} (${self.price})>"
 
+
+# GET /menu/search?q=: trigram (pg_trgm) GIN index for the substring and
+# similarity matches on the name (see app/utils/menu_search.py). On SQLite,
+# where search runs in memory, it is a plain index on lower(name).
+Index("ix_menu_items_name_trgm", func.lower(MenuItem.__table__.c.name).label("name_lower"),
+      postgresql_using="gin", postgresql_ops={"name_lower": "gin_trgm_ops"})
+
 # POST route will expect an id in the input - which the client shouldn't provide
 # "422 Unprocessable Entity" if the client doesn't send id
 # "IntegrityError" if they send an id that's already used
@@ -65,11 +86,27 @@ class MenuItemCreate(SQLModel):
 # Read Schema (used in GET response)
 class MenuItemRead(SQLModel):
     id: int
+    location_id: int
     name: str
     description: Optional[str]
     price: float
     category: str
     preparation_time_minutes: int
+    # live units left (None: not tracked) and whether it can be ordered
+    stock_quantity: Optional[int] = None
+    available: bool = True
+
+
+# Stock Schema (used in PUT /menu/{id}/stock)
+class MenuItemStock(SQLModel):
+    # required, null to stop tracking the stock
+    stock_quantity: Optional[int]
+
+    @field_validator("stock_quantity")
+    def not_negative(cls, v):
+        if v is not None and v < 0:
+            raise ValueError("Stock cannot be negative")
+        return v
 
 
 # Update Schema (used in PATCH response)
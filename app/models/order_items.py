@@ -2,6 +2,7 @@
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, TYPE_CHECKING
 from pydantic import field_validator
+from sqlalchemy import Index
 
 if TYPE_CHECKING:
     from .menu import MenuItem
@@ -11,11 +12,24 @@ if TYPE_CHECKING:
 # DB Model
 class OrderItem(SQLModel, table=True):
     __tablename__ = "order_items"
+    __table_args__ = (
+        # GET /orders/?menu_item_id=... (EXISTS on order_items) and menu
+        # item deletes; also replaces the single menu_item_id index
+        Index("ix_order_items_menu_item_id_order_id", "menu_item_id", "order_id"),
+        # SQLite: never hand out an id again, not even the archived last
+        # one's (PostgreSQL sequences don't anyway)
+        {"sqlite_autoincrement": True},
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="orders.id")
+    order_id: int = Field(foreign_key="orders.id", index=True)
     menu_item_id: int = Field(foreign_key="menu_items.id")
     quantity: int
+    # The menu price when the item was ordered, and quantity * unit_price:
+    # totals are read from here, without a join, and don't change when the
+    # menu price does
+    unit_price: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    line_total: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     # Relationships
     menu_item: Optional["MenuItem"] = Relationship(
@@ -47,4 +61,6 @@ class OrderItemRead(SQLModel):
     id: int
     menu_item_id: int
     quantity: int
+    unit_price: float
+    line_total: float
     menu_item: MenuItemNested
@@ -10,8 +10,10 @@ class ItemSummary(SQLModel):
 
 
 class OrderSummary(SQLModel):
+    location_id: int
     customer_id: int
     customer_name: str
+    order_total: float
     items_ordered: List[ItemSummary]
 
 
@@ -2,22 +2,64 @@ from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List, TYPE_CHECKING
 from pydantic import field_validator
 from datetime import datetime
+from sqlalchemy import Index, text
+from sqlalchemy.orm import declared_attr
 from sqlalchemy.sql import func
 
+from app.utils.locations import LocationScoped, location_field
+from .order_items import OrderItemCreate, OrderItemRead
+# imported for real (order_items doesn't import this module at runtime), so
+# OrderCreate/OrderRead are complete when defined and need no model_rebuild()
+
 if TYPE_CHECKING:
     from .customers import Customer
-    from .order_items import OrderItem, OrderItemCreate, OrderItemRead
+    from .order_items import OrderItem
+
+
+# Orders the kitchen still has to work on; ix_orders_active covers them
+ACTIVE_STATUSES = ("Pending", "Preparing")
+ACTIVE_ORDERS = text("status IN ('Pending', 'Preparing')")
 
 
 # DB Model
-class Order(SQLModel, table=True):
+class Order(LocationScoped, SQLModel, table=True):
     __tablename__ = "orders"
+    __table_args__ = (
+        # GET /orders/ of a location, in id order (cursor paging)
+        Index("ix_orders_location_id_id", "location_id", "id"),
+        # GET /orders/?status=... and ?customer_id=..., in id order
+        Index("ix_orders_status_id", "status", "id"),
+        Index("ix_orders_customer_id_id", "customer_id", "id"),
+        # a customer's latest order (Customer.last_order_at) and date ranges
+        # of GET /customers/{id}/orders
+        Index("ix_orders_customer_id_created_at", "customer_id", "created_at"),
+        # small partial index for the kitchen's Pending/Preparing queries,
+        # per location like the API requests
+        Index("ix_orders_active", "location_id", "id",
+              postgresql_where=ACTIVE_ORDERS, sqlite_where=ACTIVE_ORDERS),
+        # SQLite: never hand out an id again, not even the archived last
+        # one's (PostgreSQL sequences don't anyway)
+        {"sqlite_autoincrement": True},
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     customer_id: int = Field(foreign_key="customers.id")
     created_at: Optional[datetime] = Field(
-        sa_column_kwargs={"server_default": func.now()})
+        index=True, sa_column_kwargs={"server_default": func.now()})
     status: str = Field(default="Pending", max_length=20)
+    # bumped on every write; the ETag of the order
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    # sum of the items' line_total, kept current by every item write
+    order_total: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # the restaurant (app/utils/locations.py)
+    location_id: int = location_field()
+
+    # Optimistic concurrency: every ORM UPDATE/DELETE of an order runs as
+    # "... WHERE id = ? AND version = ?" and bumps the version; a write that
+    # lost the race matches no row and raises StaleDataError
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
 
     # Relationships
     customer: Optional["Customer"] = Relationship(back_populates="orders")
@@ -31,7 +73,7 @@ class Order(SQLModel, table=True):
 class OrderCreate(SQLModel):
     customer_id: int
     status: Optional[str] = "Pending"
-    items: List["OrderItemCreate"]
+    items: List[OrderItemCreate]
 
     @field_validator("status")
     def not_empty(cls, v):
@@ -43,10 +85,13 @@ class OrderCreate(SQLModel):
 # Read Schema
 class OrderRead(SQLModel):
     id: int
+    location_id: int
     customer_id: int
     created_at: datetime
     status: str
-    items: List["OrderItemRead"]
+    version: int
+    order_total: float
+    items: List[OrderItemRead]
 
 # Update Schema
 
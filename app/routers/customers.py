@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlmodel import Session
+from typing import List, Literal, Optional
+from datetime import datetime
 
-from app.database import get_session
-from app.models import Customer, CustomerCreate, CustomerRead, CustomerUpdate
-from app.utils.validators import check_customer_unique_email
+from app.database import get_read_session, get_session
+from app.models import BatchGet, Customer, CustomerBatch, CustomerCreate, CustomerRead, CustomerUpdate, OrderRead
 from app.utils.logger import logger
+from app.utils.responses import rows_response
+from app.utils.projections import fetch_order_history, fetch_row, fetch_rows, fetch_rows_by_ids
+from app.utils.batch import parse_ids, with_missing_ids
+from app.utils.fieldsets import order_fieldset, parse_fields
+from app.utils.writes import insert_returning, update_returning
 
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
@@ -19,12 +24,10 @@ def add_customer(
     try:
         logger.info("POST/customers/ - Adding new customer...")
 
-        check_customer_unique_email(session, customer.email)
-        customer = Customer(**customer.model_dump())
-        session.add(customer)
-        session.commit()
-        session.refresh(customer)
-        return customer
+        # a taken email is rejected by the unique constraint
+        customer = insert_returning(session, Customer, CustomerRead,
+                                    customer.model_dump())
+        return rows_response(customer)
 
     except Exception as e:
         logger.error(f"POST/customers - Failed to add customer: {str(e)}")
@@ -33,23 +36,81 @@ def add_customer(
 
 # READ ALL
 @router.get("/", response_model=List[CustomerRead])
-def list_customers(session: Session = Depends(get_session)):
+def list_customers(ids: Optional[str] = None, fields: Optional[str] = None,
+                   session: Session = Depends(get_read_session)):
     logger.info("GET/customers - Fetching all customers")
-    customers = session.exec(select(Customer)).all()
+    id_list = parse_ids(ids)
+    if id_list is not None:
+        # ?ids=1,2,3: just those, in that order, with one IN query
+        customers, missing = fetch_rows_by_ids(
+            session, Customer, CustomerRead, id_list,
+            fields=parse_fields(fields, CustomerRead))
+        logger.info(f"GET/customers - {len(customers)} customers retrieved by id")
+        return with_missing_ids(rows_response(customers), missing)
+    customers = fetch_rows(session, Customer, CustomerRead,
+                           order_by=[Customer.id],
+                           fields=parse_fields(fields, CustomerRead))
     logger.info(f"GET/customers - {len(customers)} customers retrieved")
-    return customers
+    return rows_response(customers)
 
 
 # READ ONE
 @router.get("/{customer_id}", response_model=CustomerRead)
-def get_customer(customer_id: int, session: Session = Depends(get_session)):
+def get_customer(customer_id: int, fields: Optional[str] = None,
+                 session: Session = Depends(get_read_session)):
     logger.info(f"POST/customers/{customer_id} - Fetching customer details")
-    customer = session.get(Customer, customer_id)
+    customer = fetch_row(session, Customer, CustomerRead, customer_id,
+                         fields=parse_fields(fields, CustomerRead))
     if not customer:
         logger.warning(f"POST/customers/{customer_id} - Customer not found")
         raise HTTPException(status_code=404, detail="Customer not found")
     logger.info(f"POST/customers/{customer_id} - Customer details retrieved")
-    return customer
+    return rows_response(customer)
+
+
+# BATCH READ
+@router.post("/batch-get", response_model=CustomerBatch)
+def batch_get_customers(request: BatchGet, fields: Optional[str] = None,
+                        session: Session = Depends(get_read_session)):
+    logger.info(f"POST/customers/batch-get - Fetching {len(request.ids)} customers")
+    customers, missing = fetch_rows_by_ids(
+        session, Customer, CustomerRead, request.ids,
+        fields=parse_fields(fields, CustomerRead))
+    logger.info(f"POST/customers/batch-get - {len(customers)} found, "
+                f"{len(missing)} missing")
+    return rows_response({"items": customers, "missing": missing})
+
+
+# ORDER HISTORY
+@router.get("/{customer_id}/orders", response_model=List[OrderRead])
+def get_customer_orders(
+        customer_id: int,
+        status: Optional[List[str]] = Query(None),
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        order: Literal["asc", "desc"] = "desc",
+        limit: int = Query(20, ge=1, le=1000),
+        cursor: Optional[int] = None,
+        fields: Optional[str] = None,
+        expand: Optional[str] = None,
+        session: Session = Depends(get_read_session)
+):
+    # Newest first by default, paged like GET /orders/ (X-Next-Cursor ->
+    # ?cursor=); served by the (customer_id, id) and (customer_id,
+    # created_at) indexes. Archived orders are listed too, like the
+    # order_count and last_order_at of the customer count them.
+    logger.info(f"GET/customers/{customer_id}/orders - Fetching order history")
+    columns, items = order_fieldset(fields, expand)
+    if session.get(Customer, customer_id) is None:
+        logger.warning(f"GET/customers/{customer_id}/orders - Customer not found")
+        raise HTTPException(status_code=404, detail="Customer not found")
+
+    orders, next_cursor = fetch_order_history(
+        session, status, customer_id, created_from, created_to, order=order,
+        limit=limit, cursor=cursor, fields=columns, items=items)
+    logger.info(
+        f"GET/customers/{customer_id}/orders - {len(orders)} orders retrieved")
+    return rows_response(orders, next_cursor=next_cursor)
 
 
 # UPDATE
@@ -59,24 +120,14 @@ def update_customer(
         session: Session = Depends(get_session)
 ):
     logger.info(f"POST/customers/{customer_id} - Updating customer details")
-    customer = session.get(Customer, customer_id)
+    # a taken email is caught by the unique constraint
+    customer = update_returning(session, Customer, CustomerRead, customer_id,
+                                updated_data.model_dump())
     if not customer:
         logger.warning(f"POST/customers/{customer_id} - Customer not found")
         raise HTTPException(status_code=404, detail="Customer not found")
-
-    # Check if email or phone is already taken by another employee
-    check_customer_unique_email(session,
-                                updated_data.email,
-                                customer_id=customer_id)
-
-    for key, value in updated_data.model_dump().items():
-        setattr(customer, key, value)
-
-    session.add(customer)
-    session.commit()
-    session.refresh(customer)
     logger.info(f"POST/customers/{customer_id} - Customer details updated")
-    return customer
+    return rows_response(customer)
 
 
 # partial UPDATE
@@ -86,34 +137,22 @@ def patch_customer(
         session: Session = Depends(get_session)
 ):
     logger.info(f"PATCH/customers/{customer_id} - Patching customer details")
-    customer = session.get(Customer, customer_id)
+    customer = update_returning(session, Customer, CustomerRead, customer_id,
+                                updated_data.model_dump(exclude_unset=True))
     if not customer:
         logger.warning(f"PATCH/customers/{customer_id} - Customer not found")
         raise HTTPException(status_code=404, detail="Customer not found")
-
-    update_data = updated_data.model_dump(exclude_unset=True)
-
-    # Unique check for email and phone if present
-    email = update_data.get("email")
-    if email:
-        check_customer_unique_email(session, email, customer_id=customer_id)
-
-    for key, value in update_data.items():
-        setattr(customer, key, value)
-
-    session.add(customer)
-    session.commit()
-    session.refresh(customer)
     logger.info(f"PATCH/customers/{customer_id} - Customer details patched")
-    return customer
+    return rows_response(customer)
 
 
 # DELETE
 @router.delete("/{customer_id}", status_code=204)
 def delete_customer(customer_id: int, session: Session = Depends(get_session)):
     logger.info(f"DELETE/customers/{customer_id} - Deleting customer")
+    # another location's customer isn't found either (app/utils/locations.py)
     customer = session.get(Customer, customer_id)
-    if not customer_id:
+    if not customer:
         logger.warning(f"DELETE/customers/{customer_id} - Customer not found")
         raise HTTPException(status_code=404, detail="Customer not found")
 
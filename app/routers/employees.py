@@ -1,11 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from typing import List
+from sqlmodel import Session
+from typing import List, Optional
 
-from app.database import get_session
-from app.models import Employee, EmployeeCreate, EmployeeRead, EmployeeUpdate
-from app.utils.validators import check_employee_unique_fields
+from app.database import get_read_session, get_session
+from app.models import BatchGet, Employee, EmployeeBatch, EmployeeCreate, EmployeeRead, EmployeeUpdate
 from app.utils.logger import logger
+from app.utils.responses import rows_response
+from app.utils.projections import fetch_row, fetch_rows, fetch_rows_by_ids
+from app.utils.batch import parse_ids, with_missing_ids
+from app.utils.fieldsets import parse_fields
+from app.utils.writes import insert_returning, update_returning
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
 
@@ -18,13 +22,11 @@ def add_employee(
 ):
     try:
         logger.info("POST/employees - Adding new employee")
-        check_employee_unique_fields(session, emp.email, emp.phone)
-        employee = Employee(**emp.model_dump())
-        session.add(employee)
-        session.commit()
-        session.refresh(employee)
-        logger.info(f"POST/employees - Added employee {employee.name}")
-        return employee
+        # a taken email or phone is rejected by the unique constraints
+        employee = insert_returning(session, Employee, EmployeeRead,
+                                    emp.model_dump())
+        logger.info(f"POST/employees - Added employee {employee['name']}")
+        return rows_response(employee)
 
     except Exception as e:
         logger.error(f"POST/employees - Failed to add employee: {str(e)}")
@@ -33,23 +35,49 @@ def add_employee(
 
 # READ ALL
 @router.get("/", response_model=List[EmployeeRead])
-def list_employees(session: Session = Depends(get_session)):
+def list_employees(ids: Optional[str] = None, fields: Optional[str] = None,
+                   session: Session = Depends(get_read_session)):
     logger.info("GET/employees - Fetching all employees...")
-    employees = session.exec(select(Employee)).all()
+    id_list = parse_ids(ids)
+    if id_list is not None:
+        # ?ids=1,2,3: just those, in that order, with one IN query
+        employees, missing = fetch_rows_by_ids(
+            session, Employee, EmployeeRead, id_list,
+            fields=parse_fields(fields, EmployeeRead))
+        logger.info(f"GET/employees - {len(employees)} employees retrieved by id")
+        return with_missing_ids(rows_response(employees), missing)
+    employees = fetch_rows(session, Employee, EmployeeRead,
+                           order_by=[Employee.id],
+                           fields=parse_fields(fields, EmployeeRead))
     logger.info(f"GEt/employees - {len(employees)} employees retrieved")
-    return employees
+    return rows_response(employees)
 
 
 # READ ONE
 @router.get("/{emp_id}", response_model=EmployeeRead)
-def get_employee(emp_id: int, session: Session = Depends(get_session)):
+def get_employee(emp_id: int, fields: Optional[str] = None,
+                 session: Session = Depends(get_read_session)):
     logger.info(f"GET/employees/{emp_id} - Fetching employee details")
-    employee = session.get(Employee, emp_id)
+    employee = fetch_row(session, Employee, EmployeeRead, emp_id,
+                         fields=parse_fields(fields, EmployeeRead))
     if not employee:
         logger.warning(f"GET/employees/{emp_id} - Employee not found")
         raise HTTPException(status_code=404, detail="Employee item not found")
     logger.info(f"GET/employees/{emp_id} - Employee details retrieved")
-    return employee
+    return rows_response(employee)
+
+
+# BATCH READ
+@router.post("/batch-get", response_model=EmployeeBatch)
+def batch_get_employees(request: BatchGet, fields: Optional[str] = None,
+                        session: Session = Depends(get_read_session)):
+    logger.info(f"POST/employees/batch-get - Fetching {len(request.ids)} employees")
+    employees, missing = fetch_rows_by_ids(
+        session, Employee, EmployeeRead, request.ids,
+        fields=parse_fields(fields, EmployeeRead))
+    logger.info(f"POST/employees/batch-get - {len(employees)} found, "
+                f"{len(missing)} missing")
+    return rows_response({"items": employees, "missing": missing})
 
 
 # UPDATE
@@ -59,25 +87,14 @@ def update_employee(
         session: Session = Depends(get_session)
 ):
     logger.info(f"PUT/employees/{emp_id} - Updating employee details")
-    employee = session.get(Employee, emp_id)
+    # a taken email or phone is caught by the unique constraints
+    employee = update_returning(session, Employee, EmployeeRead, emp_id,
+                                updated_data.model_dump())
     if not employee:
         logger.warning(f"PUT/employees/{emp_id} - Employee not found")
         raise HTTPException(status_code=404, detail="Employee not found")
-
-    # Check if email or phone is already taken by another employee
-    check_employee_unique_fields(session,
-                                 updated_data.email,
-                                 updated_data.phone,
-                                 emp_id=emp_id)
-
-    for key, value in updated_data.model_dump().items():
-        setattr(employee, key, value)
-
-    session.add(employee)
-    session.commit()
-    session.refresh(employee)
     logger.info(f"PUT/employees/{emp_id} - Employee updated successfully")
-    return employee
+    return rows_response(employee)
 
 
 # partial UPDATE
@@ -87,27 +104,13 @@ def patch_employee(
         session: Session = Depends(get_session)
 ):
     logger.info(f"PATCH/employees/{emp_id} - Patching employee details")
-    employee = session.get(Employee, emp_id)
+    employee = update_returning(session, Employee, EmployeeRead, emp_id,
+                                updated_data.model_dump(exclude_unset=True))
     if not employee:
         logger.warning(f"PATCH/employees/{emp_id} - Employee not found")
         raise HTTPException(status_code=404, detail="Employee not found")
-
-    update_data = updated_data.model_dump(exclude_unset=True)
-
-    # Unique check for email and phone if present
-    email = update_data.get("email")
-    phone = update_data.get("phone")
-    if email or phone:
-        check_employee_unique_fields(session, email, phone, emp_id=emp_id)
-
-    for key, value in update_data.items():
-        setattr(employee, key, value)
-
-    session.add(employee)
-    session.commit()
-    session.refresh(employee)
     logger.info(f"PATCH/employees/{emp_id} - Employee patched successfully")
-    return employee
+    return rows_response(employee)
 
 
 # DELETE
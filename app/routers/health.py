@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
+
+from app.utils.warmup import readiness
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+# LIVENESS: the process is up and serving
+@router.get("/live")
+def liveness():
+    return {"status": "ok"}
+
+
+# READINESS: schema at the migration head, DB pool and Redis warmed up
+@router.get("/ready")
+def readiness_check():
+    body = {"status": "ready" if readiness.ready else "starting",
+            "checks": readiness.checks, "errors": readiness.errors}
+    return ORJSONResponse(body, status_code=200 if readiness.ready else 503)
@@ -0,0 +1,23 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from typing import List
+
+from app.models import OrderRead
+from app.utils.kitchen import active_orders
+from app.utils.locations import current_location_id
+from app.utils.logger import logger
+
+router = APIRouter(prefix="/kitchen", tags=["Kitchen"])
+
+
+# ACTIVE ORDERS: every Pending/Preparing order of the location with its
+# items, oldest first.
+# Served from memory (app/utils/kitchen.py), never from the database.
+@router.get("/active", response_model=List[OrderRead])
+def get_active_orders():
+    if not active_orders.loaded:
+        logger.warning("GET/kitchen/active - Active orders not loaded yet")
+        raise HTTPException(status_code=503, detail="Kitchen board is loading",
+                            headers={"Retry-After": "1"})
+    return Response(content=active_orders.encoded(current_location_id()),
+                    media_type="application/json")
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 # fastAPI tools
 # APIRouter: to create a group of related routes (like all menu-related routes)
 # HTTPException: to return custom errors (like 404 if item not found)
 # Depends: to inject dependencies (like DB sessions)
-from sqlmodel import Session, select
+from sqlmodel import Session
 # SQLModel query tools
 # Session: The DB session to run queries
-# select: Used to query the database
-from typing import List
+from typing import List, Optional
 # to get lists
 
-from app.database import get_session
+from app.database import get_read_session, get_session
 # Get the DB session function
-from app.models import MenuItem, MenuItemCreate, MenuItemRead, MenuItemUpdate
-from app.utils.validators import check_menuitem_unique_name
+from app.models import BatchGet, MenuItem, MenuItemBatch, MenuItemCreate, MenuItemRead, MenuItemStock, MenuItemUpdate
+from app.utils.kitchen import menu_item_changed, publish_sync
+from app.utils.writes import insert_returning, update_returning
 from app.utils.logger import logger
+from app.utils.responses import rows_response
+from app.utils.projections import fetch_row, fetch_rows, fetch_rows_by_ids
+from app.utils.batch import parse_ids, with_missing_ids
+from app.utils.fieldsets import parse_fields
+from app.utils.menu_search import menu_search_for, search_menu
+from app.utils.stock import attach_stock, set_stock_sync, stock_columns
 
 router = APIRouter(prefix="/menu", tags=["Menu Items"])
 # tags help group routes in the API docs (Swagger UI)
@@ -33,17 +39,14 @@ def create_menu_item(
     logger.info("POST/menu - Creating new menu item")
 
     try:
-        # Unique name check
-        check_menuitem_unique_name(session, item.name)
-
-        menu_item = MenuItem(**item.model_dump())
         # .model_dump() converts the item object into a Python dict
-        session.add(menu_item)
-        session.commit()
-        session.refresh(menu_item)
-        # Reloads from DB (to get auto-generated ID)
-        logger.info(f"POST/menu - Created menu item {menu_item.id}")
-        return menu_item
+        # one INSERT ... RETURNING (gets the auto-generated ID back); a
+        # taken name is rejected by the unique constraint -> 400
+        menu_item = insert_returning(session, MenuItem, MenuItemRead,
+                                     item.model_dump())
+        logger.info(f"POST/menu - Created menu item {menu_item['id']}")
+        menu_search_for().changed(menu_item)
+        return rows_response(attach_stock([menu_item])[0])
 
     except Exception as e:
         logger.error(f"POST/menu - Failed to create menu item: {str(e)}")
@@ -52,25 +55,81 @@ def create_menu_item(
 
 # READ ALL
 @router.get("/", response_model=List[MenuItemRead])
-def get_all_menu_items(session: Session = Depends(get_session)):
+def get_all_menu_items(ids: Optional[str] = None, fields: Optional[str] = None,
+                       session: Session = Depends(get_read_session)):
     logger.info("GET/menu - Fetching all menu items")
-    items = session.exec(select(MenuItem)).all()
-    # select(MenuItem): SQLModel way to get all items
-    # .all(): Get all results as a list
+    id_list = parse_ids(ids)
+    names = parse_fields(fields, MenuItemRead)
+    if id_list is not None:
+        # ?ids=1,2,3: just those, in that order, with one IN query
+        items, missing = fetch_rows_by_ids(session, MenuItem, MenuItemRead, id_list,
+                                           fields=stock_columns(names))
+        logger.info(f"GET/menu - {len(items)} menu items retrieved by id")
+        return with_missing_ids(rows_response(attach_stock(items, names)), missing)
+    # ?fields=id,name: only those columns are selected
+    items = fetch_rows(session, MenuItem, MenuItemRead, order_by=[MenuItem.id],
+                       fields=stock_columns(names))
+    # fetch_rows: selects only the columns MenuItemRead needs, as plain rows
+    # (no ORM objects for the session to track)
     logger.info(f"GET/menu - {len(items)} menu items retrieved")
-    return items
+    # live stock counts from Redis (app/utils/stock.py)
+    return rows_response(attach_stock(items, names))
+
+
+# SEARCH
+# declared before /{item_id}, or "search" would be taken for an item id
+@router.get("/search", response_model=List[MenuItemRead])
+def search_menu_items(q: Optional[str] = Query(None, max_length=100),
+                      category: Optional[str] = None,
+                      min_price: Optional[float] = Query(None, ge=0),
+                      max_price: Optional[float] = Query(None, ge=0),
+                      limit: int = Query(20, ge=1, le=100),
+                      fields: Optional[str] = None,
+                      session: Session = Depends(get_read_session)):
+    # ?q=: case-insensitive name match, best first (see app/utils/menu_search.py)
+    logger.info(f"GET/menu/search - Searching menu items for {q!r}")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        logger.warning("GET/menu/search - min_price is greater than max_price")
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
+    names = parse_fields(fields, MenuItemRead)
+    items = search_menu(session, q.strip() if q else None, category,
+                        min_price, max_price, limit)
+    # copies: the in-memory index's own dicts aren't changed
+    columns = stock_columns(names)
+    items = [{name: item[name] for name in MenuItemRead.model_fields
+              if name in item and (columns is None or name in columns)}
+             for item in items]
+    attach_stock(items, names)
+    logger.info(f"GET/menu/search - {len(items)} menu items found")
+    return rows_response(items)
 
 
 # READ ONE
 @router.get("/{item_id}", response_model=MenuItemRead)
-def get_menu_item(item_id: int, session: Session = Depends(get_session)):
+def get_menu_item(item_id: int, fields: Optional[str] = None,
+                  session: Session = Depends(get_read_session)):
     logger.info(f"GET/menu/{item_id} - Fetching menu item details")
-    item = session.get(MenuItem, item_id)
+    names = parse_fields(fields, MenuItemRead)
+    item = fetch_row(session, MenuItem, MenuItemRead, item_id,
+                     fields=stock_columns(names))
     if not item:
         logger.warning(f"GET/menu/{item_id} - Menu item not found")
         raise HTTPException(status_code=404, detail="Menu item not found")
     logger.info(f"GET/menu/{item_id} - Menu item retreived successfully")
-    return item
+    return rows_response(attach_stock([item], names)[0])
+
+
+# BATCH READ
+@router.post("/batch-get", response_model=MenuItemBatch)
+def batch_get_menu_items(request: BatchGet, fields: Optional[str] = None,
+                         session: Session = Depends(get_read_session)):
+    # a ticket's menu items in one call: missing ids don't fail the call
+    logger.info(f"POST/menu/batch-get - Fetching {len(request.ids)} menu items")
+    names = parse_fields(fields, MenuItemRead)
+    items, missing = fetch_rows_by_ids(session, MenuItem, MenuItemRead, request.ids,
+                                       fields=stock_columns(names))
+    logger.info(f"POST/menu/batch-get - {len(items)} found, {len(missing)} missing")
+    return rows_response({"items": attach_stock(items, names), "missing": missing})
 
 
 # UPDATE
@@ -79,26 +138,17 @@ def update_menu_item(
         item_id: int, updated_data: MenuItemCreate,
         session: Session = Depends(get_session)):
     logger.info(f"PUT/menu/{item_id} - Updating menu item")
-    item = session.get(MenuItem, item_id)
+    # one UPDATE ... RETURNING; a taken name is caught by the unique constraint
+    item = update_returning(session, MenuItem, MenuItemRead, item_id,
+                            updated_data.model_dump())
     if not item:
         logger.warning(f"PUT/menu/{item_id} - Menu item not found")
         raise HTTPException(status_code=404, detail="Menu item not found")
-
-    check_menuitem_unique_name(session, updated_data.name, item_id=item_id)
-
-    for key, value in updated_data.model_dump().items():
-        # .items() gives you a list of key-value pairs
-        setattr(item, key, value)
-        # sets the attribute on the item object
-        # setattr(item, "name", "Pizza"), setattr(item, "price", 8.99) etc
-        # Same as writing:
-        # eg., item.name = "Pizza" , item.price = 8.99 etc
-
-    session.add(item)
-    session.commit()
-    session.refresh(item)
     logger.info(f"PUT/menu/{item_id} - Menu item updated successfully")
-    return item
+    menu_search_for().changed(item)
+    # open orders on the kitchen board show the new name/price
+    publish_sync(menu_item_changed(item))
+    return rows_response(attach_stock([item])[0])
 
 
 # partial UPDATE
@@ -107,27 +157,39 @@ def patch_menu_item(
         item_id: int, updated_data: MenuItemUpdate,
         session: Session = Depends(get_session)):
     logger.info(f"PATCH/menu/{item_id} - Patching menu item")
-    item = session.get(MenuItem, item_id)
+    # exclude_unset: only the fields that were sent in the request,
+    # otherwise the others would be overwritten with NULL
+    item = update_returning(session, MenuItem, MenuItemRead, item_id,
+                            updated_data.model_dump(exclude_unset=True))
     if not item:
         logger.warning(f"PATCH/menu/{item_id} - Menu item not found")
         raise HTTPException(status_code=404, detail="Menu item not found")
+    logger.info(f"PATCH/menu/{item_id} - Menu item patched successfully")
+    menu_search_for().changed(item)
+    # open orders on the kitchen board show the new name/price
+    publish_sync(menu_item_changed(item))
+    return rows_response(attach_stock([item])[0])
 
-    update_data = updated_data.model_dump(exclude_unset=True)
-
-    if "name" in update_data:
-        check_menuitem_unique_name(
-            session, update_data["name"], item_id=item_id)
-
-    for key, value in update_data.items():
-        # onset: only includes the fields that were sent in the request
-        # ow, it will overwrite other values as NULL
-        setattr(item, key, value)
 
-    session.add(item)
-    session.commit()
-    session.refresh(item)
-    logger.info(f"PATCH/menu/{item_id} - Menu item patched successfully")
-    return item
+# SET STOCK
+@router.put("/{item_id}/stock", response_model=MenuItemRead)
+def set_menu_item_stock(
+        item_id: int, stock: MenuItemStock,
+        session: Session = Depends(get_session)):
+    # sets the units left (a restock, a count), or null to stop tracking;
+    # orders then reserve from it (app/utils/stock.py)
+    logger.info(f"PUT/menu/{item_id}/stock - Setting stock to {stock.stock_quantity}")
+    item = update_returning(session, MenuItem, MenuItemRead, item_id,
+                            {"stock_quantity": stock.stock_quantity})
+    if not item:
+        logger.warning(f"PUT/menu/{item_id}/stock - Menu item not found")
+        raise HTTPException(status_code=404, detail="Menu item not found")
+    # then the live counter: if Redis is down this is a 503, and the next
+    # reconciliation puts the column back to the counter's value
+    set_stock_sync(item_id, stock.stock_quantity)
+    logger.info(f"PUT/menu/{item_id}/stock - Stock set")
+    item["available"] = stock.stock_quantity is None or stock.stock_quantity > 0
+    return rows_response(item)
 
 
 # DELETE
@@ -140,8 +202,16 @@ def delete_menu_item(item_id: int, session: Session = Depends(get_session)):
         logger.warning(f"DELETE/menu/{item_id} - Menu Item not found")
         raise HTTPException(status_code=404, detail="Menu item not found")
 
+    tracked = item.stock_quantity is not None
     session.delete(item)
     session.commit()
     logger.info(f"DELETE/menu/{item_id} - Menu item deleted successfully")
+    menu_search_for().removed(item_id)
+    if tracked:
+        # its counter goes too (a leftover one is harmless)
+        try:
+            set_stock_sync(item_id, None)
+        except HTTPException:
+            pass
     return
     # Since we’re returning 204, just a blank response to say "done"
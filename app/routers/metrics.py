@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException
+
+from app.tasks.enqueue import get_pool, redis_settings
+from app.utils.admission import admission
+from app.utils.logger import logger
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/worker")
+async def get_worker_metrics():
+    # per-job queue wait, run time, retries and outcomes of every live
+    # ARQ worker, plus the number of jobs waiting in the queue
+    logger.info("GET/metrics/worker - Fetching worker metrics")
+    from arq.connections import create_pool
+    from redis.exceptions import RedisError
+
+    from app.tasks.metrics import read_worker_metrics
+
+    try:
+        if get_pool() is not None:
+            # the pool warmed up at startup
+            return await read_worker_metrics(get_pool())
+        redis = await create_pool(redis_settings())
+        try:
+            return await read_worker_metrics(redis)
+        finally:
+            await redis.aclose()
+    except (RedisError, OSError) as e:
+        logger.error(f"GET/metrics/worker - Redis unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail="Redis unavailable")
+
+
+@router.get("/admission")
+def get_admission_metrics():
+    # running and waiting requests per route group, and how many were shed
+    logger.info("GET/metrics/admission - Fetching admission metrics")
+    return admission.snapshot()
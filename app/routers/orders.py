@@ -1,19 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session, select
-from typing import List
-from sqlmodel import delete
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import Response
+from sqlmodel import Session
+from sqlalchemy.orm.attributes import flag_modified
+from typing import List, Literal, Optional
 from fastapi import BackgroundTasks
+from datetime import datetime
 
-from app.database import get_session
+from app.database import get_read_session, get_session
 from app.models import *
 from app.utils.validators import validate_customer_exists, validate_menu_items_exist
 from app.utils.logger import logger
+from app.utils.responses import rows_response
+from app.utils.projections import attach_order_items, fetch_archived_orders, fetch_order, fetch_order_page, fetch_orders_by_ids, order_filters
+from app.utils.batch import parse_ids, with_missing_ids
+from app.utils.fieldsets import order_fieldset
 from app.tasks.enqueue import enqueue_sync
+from app.utils.customer_stats import order_total, update_customer_stats
+from app.utils.order_items import menu_item_prices, new_item, refresh_order_total, replace_order_items
+from app.utils.group_commit import write_order
+from app.utils.stock import held_lines, line_changes, order_lines, release_stock, reserved_stock, tracked_items
+from app.utils.writes import update_returning
+from app.utils.locations import current_location_id
+from app.utils.kitchen import order_changed, order_message, order_removed, publish_sync
+from app.utils.versioning import check_if_match, etag, if_match_versions, write_conflicts
 
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
 
+def order_response(session: Session, order_id: int, status_code: int = 200):
+    # After a write: the order as it is now, read once (two queries) for
+    # both the kitchen board and the response. Serializing the ORM object
+    # instead lazy-loads every item's menu item, a query per line.
+    # Write responses carry the new version as ETag, for the next If-Match.
+    order = fetch_order(session, order_id)
+    publish_sync(order_changed(order))
+    response = rows_response(order, status_code=status_code)
+    response.headers["ETag"] = etag(order["version"])
+    return response
+
+
 # CREATE
 @router.post("/", response_model=OrderRead)
 def create_order(
@@ -27,26 +53,25 @@ def create_order(
     try:
         validate_customer_exists(session, order.customer_id)
         item_ids = [item.menu_item_id for item in order.items]
-        validate_menu_items_exist(session, item_ids)
-
-        new_order = Order(customer_id=order.customer_id, status=order.status)
-
-        # Attach OrderItems (as model instances, not dicts)
-        new_order.items = [
-            OrderItem(menu_item_id=item.menu_item_id, quantity=item.quantity)
-            for item in order.items
-        ]
-
-        session.add(new_order)
-        session.commit()
-        session.refresh(new_order)
+        stock = validate_menu_items_exist(session, item_ids)
+
+        # sold out items: 409 before anything is written; the stock is
+        # given back if the write fails (see app/utils/stock.py)
+        with reserved_stock(held_lines(order.status, order_lines(order.items)), stock):
+            # one multi-row write, batched with other requests' orders when
+            # ORDER_GROUP_COMMIT is on (see app/utils/group_commit.py)
+            order_id = write_order(session, order)
         logger.info(
-            f"POST/order - Order {new_order.id} created with {len(order.items)} items")
+            f"POST/order - Order {order_id} created with {len(order.items)} items")
+        new_order = fetch_order(session, order_id)
+        publish_sync(order_changed(new_order))
 
         # Enqueue background task
-        background_tasks.add_task(enqueue_sync, new_order.id)
+        background_tasks.add_task(enqueue_sync, order_id, current_location_id())
 
-        return new_order
+        response = rows_response(new_order)
+        response.headers["ETag"] = etag(new_order["version"])
+        return response
 
     except Exception as e:
         logger.error(f"POST/order - Failed to create order: {str(e)}")
@@ -55,23 +80,76 @@ def create_order(
 
 # READ ALL
 @router.get("/", response_model=List[OrderRead])
-def list_orders(session: Session = Depends(get_session)):
+def list_orders(
+        status: Optional[List[str]] = Query(None),
+        customer_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        menu_item_id: Optional[int] = None,
+        order: Literal["asc", "desc"] = "asc",
+        limit: Optional[int] = Query(None, ge=1, le=1000),
+        cursor: Optional[int] = None,
+        ids: Optional[str] = None,
+        fields: Optional[str] = None,
+        expand: Optional[str] = None,
+        session: Session = Depends(get_read_session)
+):
+    # Sorted by id. Paging is by cursor: pass the X-Next-Cursor header of
+    # the previous page as ?cursor=. Without ?limit all matches are returned.
+    # ?fields=id,status&expand=items: sparse orders, items only if asked for
     logger.info("GET/order - Fetching all orders...")
-    orders = session.exec(select(Order)).all()
+    columns, items = order_fieldset(fields, expand)
+    where = order_filters(status, customer_id, created_from, created_to,
+                          menu_item_id)
+    id_list = parse_ids(ids)
+    if id_list is not None:
+        # ?ids=1,2,3: just those (still filtered), in that order, unpaged
+        orders, missing = fetch_orders_by_ids(session, id_list, *where,
+                                              fields=columns, items=items)
+        logger.info(f"GET/order - {len(orders)} orders retrieved by id")
+        return with_missing_ids(rows_response(orders), missing)
+    orders, next_cursor = fetch_order_page(session, *where, order=order,
+                                           limit=limit, cursor=cursor,
+                                           fields=columns, items=items)
     logger.info(f"GET/order - {len(orders)} orders retrieved")
-    return orders
+    return rows_response(orders, next_cursor=next_cursor)
 
 
 # READ ONE
 @router.get("/{order_id}", response_model=OrderRead)
-def get_order(order_id: int, session: Session = Depends(get_session)):
+def get_order(order_id: int, fields: Optional[str] = None,
+              expand: Optional[str] = None,
+              session: Session = Depends(get_read_session)):
     logger.info(f"GET/order/{order_id} - Fetching order details")
-    order = session.get(Order, order_id)
+    columns, items = order_fieldset(fields, expand)
+    order = fetch_order(session, order_id, fields=columns, items=items)
+    if not order:
+        # old finished orders live in the archive (app/utils/archive.py)
+        archived = fetch_archived_orders(session, [order_id], fields=columns, items=items)
+        order = archived[0] if archived else None
     if not order:
         logger.warning(f"GET/order/{order_id} - Order not found")
         raise HTTPException(status_code=404, detail="Order not found")
     logger.info(f"GET/order/{order_id} - Order retrieved successfully")
-    return order
+    response = rows_response(order)
+    if "version" in order:
+        # send it back as If-Match on the next write
+        response.headers["ETag"] = etag(order["version"])
+    return response
+
+
+# BATCH READ
+@router.post("/batch-get", response_model=OrderBatch)
+def batch_get_orders(request: BatchGet, fields: Optional[str] = None,
+                     expand: Optional[str] = None,
+                     session: Session = Depends(get_read_session)):
+    # a ticket's orders in two queries (orders, then all their items)
+    logger.info(f"POST/order/batch-get - Fetching {len(request.ids)} orders")
+    columns, items = order_fieldset(fields, expand)
+    orders, missing = fetch_orders_by_ids(session, request.ids,
+                                          fields=columns, items=items)
+    logger.info(f"POST/order/batch-get - {len(orders)} found, {len(missing)} missing")
+    return rows_response({"items": orders, "missing": missing})
 
 
 # UPDATE
@@ -79,6 +157,7 @@ def get_order(order_id: int, session: Session = Depends(get_session)):
 def update_order(
         order_id: int,
         updated_data: OrderCreate,
+        if_match: Optional[str] = Header(None),
         session: Session = Depends(get_session)
 ):
     logger.info(f"PUT/order/{order_id} - Updating order")
@@ -86,30 +165,48 @@ def update_order(
     if not order:
         logger.warning(f"PUT/order/{order_id} - Order not found")
         raise HTTPException(status_code=404, detail="Order not found")
+    check_if_match(if_match, order.version)
 
     validate_customer_exists(session, updated_data.customer_id)
     item_ids = [item.menu_item_id for item in updated_data.items]
-    validate_menu_items_exist(session, item_ids)
-
-    order.customer_id = updated_data.customer_id
-    order.status = updated_data.status
-
-    # Delete old items
-    session.exec(delete(OrderItem).where(OrderItem.order_id == order_id))
-    session.commit()
-
-    # Add new order items
-    order.items = [
-        OrderItem(menu_item_id=item.menu_item_id, quantity=item.quantity)
-        for item in updated_data.items
-    ]
-
-    session.add(order)
-    session.commit()
-    session.refresh(order)
+    stock = validate_menu_items_exist(session, item_ids)
+    # reserve what the new items add, give back what they drop (all of
+    # it when the order is now Cancelled)
+    old_lines = held_lines(order.status, order_lines(order.items))
+    stock.update(tracked_items(session, old_lines.keys() - stock.keys()))
+    more, less = line_changes(
+        old_lines, held_lines(updated_data.status, order_lines(updated_data.items)))
+
+    with reserved_stock(more, stock), write_conflicts(f"PUT/order/{order_id}"):
+        old_customer_id, old_total = order.customer_id, order.order_total
+        order.customer_id = updated_data.customer_id
+        order.status = updated_data.status
+        # the order row is always written (and its version bumped), even
+        # when only the items change
+        flag_modified(order, "status")
+        session.flush()
+
+        # Only the items that changed are inserted/updated/deleted, in this
+        # same transaction, so the order is never seen without its items.
+        # New lines are priced now; kept lines keep their price.
+        inserted, updated, deleted = replace_order_items(
+            session, order_id, updated_data.items)
+        # move the order's total (and count, if the customer changed)
+        new_total = order_total(session, order_id)
+        if old_customer_id == order.customer_id:
+            update_customer_stats(session, order.customer_id,
+                                  spend=new_total - old_total)
+        else:
+            update_customer_stats(session, old_customer_id, orders=-1,
+                                  spend=-old_total)
+            update_customer_stats(session, order.customer_id, orders=1,
+                                  spend=new_total)
+        session.commit()
+    release_stock(less, stock)
     logger.info(
-        f"PUT/order/{order_id} - Order updated successfully with {len(order.items)} items")
-    return order
+        f"PUT/order/{order_id} - Order updated successfully with {len(updated_data.items)} items "
+        f"({inserted} added, {updated} changed, {deleted} removed)")
+    return order_response(session, order_id)
 
 
 # partial UPDATE
@@ -117,39 +214,184 @@ def update_order(
 def patch_order(
         order_id: int,
         updated_data: OrderUpdate,
+        if_match: Optional[str] = Header(None),
         session: Session = Depends(get_session)
 ):
     logger.info(f"PATCH/order/{order_id} - Patching order")
+    update_data = updated_data.model_dump(exclude_unset=True)
+
+    if "customer_id" not in update_data and update_data.get("status") != "Cancelled":
+        # status-only PATCH (the kitchen's): one UPDATE ... RETURNING that
+        # bumps the version, with the If-Match check in its WHERE clause.
+        # Cancelling, and reopening a Cancelled order, move stock: they
+        # take the way below.
+        response = patch_order_status(session, order_id, update_data, if_match)
+        if response is not None:
+            return response
+
     order = session.get(Order, order_id)
     if not order:
         logger.warning(f"PATCH/order/{order_id} - Order not found")
         raise HTTPException(status_code=404, detail="Order not found")
+    check_if_match(if_match, order.version)
+
+    # cancelling gives the order's stock back, reopening reserves it again
+    lines = {}
+    new_status = update_data.get("status", order.status)
+    if (order.status == "Cancelled") != (new_status == "Cancelled"):
+        lines = order_lines(order.items)
+    more, less = line_changes(held_lines(order.status, lines),
+                              held_lines(new_status, lines))
+    stock = tracked_items(session, lines)
+
+    with reserved_stock(more, stock), write_conflicts(f"PATCH/order/{order_id}"):
+        if "customer_id" in update_data and \
+                update_data["customer_id"] != order.customer_id:
+            validate_customer_exists(session, update_data["customer_id"])
+            old_customer_id = order.customer_id
+            order.customer_id = update_data["customer_id"]
+            session.flush()
+            total = order.order_total
+            update_customer_stats(session, old_customer_id, orders=-1,
+                                  spend=-total)
+            update_customer_stats(session, order.customer_id, orders=1,
+                                  spend=total)
+
+        if "status" in update_data:
+            order.status = update_data["status"]
 
-    update_data = updated_data.model_dump(exclude_unset=True)
+        session.commit()
+    release_stock(less, stock)
+    logger.info(f"PATCH/order/{order_id} - Order patched successfully")
+    return order_response(session, order_id)
+
+
+def patch_order_status(session: Session, order_id: int, update_data: dict,
+                       if_match: Optional[str]):
+    # None when the order is Cancelled: reopening it reserves stock, which
+    # is patch_order()'s job
+    where = [Order.status != "Cancelled"]
+    versions = if_match_versions(if_match)
+    if versions is not None:
+        where.append(Order.version.in_(versions))
+    values = {}
+    if update_data:
+        values = {"status": update_data["status"], "version": Order.version + 1}
+
+    order = update_returning(session, Order, OrderRead, order_id, values, *where)
+    if not order:
+        # no row matched: tell a missing order from a failed If-Match
+        current = session.get(Order, order_id)
+        if not current:
+            logger.warning(f"PATCH/order/{order_id} - Order not found")
+            raise HTTPException(status_code=404, detail="Order not found")
+        check_if_match(if_match, current.version)
+        if current.status == "Cancelled":
+            return None
+        # matched again by now: it changed between the UPDATE and the get
+        raise HTTPException(
+            status_code=409,
+            detail="Order was changed by another request, reload it and retry")
+    attach_order_items(session, [order])
+    logger.info(f"PATCH/order/{order_id} - Order patched successfully")
+    publish_sync(order_changed(order))
+    response = rows_response(order)
+    response.headers["ETag"] = etag(order["version"])
+    return response
 
-    if "customer_id" in update_data:
-        validate_customer_exists(session, update_data["customer_id"])
-        order.customer_id = update_data["customer_id"]
 
-    if "status" in update_data:
-        order.status = update_data["status"]
+# ADD ONE ITEM
+@router.post("/{order_id}/items", response_model=OrderRead, status_code=201)
+def add_order_item(
+        order_id: int,
+        item: OrderItemCreate,
+        if_match: Optional[str] = Header(None),
+        session: Session = Depends(get_session)
+):
+    logger.info(f"POST/order/{order_id}/items - Adding menu item {item.menu_item_id}")
+    order = session.get(Order, order_id)
+    if not order:
+        logger.warning(f"POST/order/{order_id}/items - Order not found")
+        raise HTTPException(status_code=404, detail="Order not found")
+    check_if_match(if_match, order.version)
+    stock = validate_menu_items_exist(session, [item.menu_item_id])
+
+    with reserved_stock(held_lines(order.status, {item.menu_item_id: item.quantity}), stock), \
+            write_conflicts(f"POST/order/{order_id}/items"):
+        old_total = order.order_total
+        flag_modified(order, "status")
+        prices = menu_item_prices(session, [item.menu_item_id])
+        session.add(OrderItem(**new_item(order_id, item.menu_item_id,
+                                         item.quantity, prices)))
+        session.flush()
+        update_customer_stats(session, order.customer_id,
+                              spend=refresh_order_total(session, order_id) - old_total)
+        session.commit()
+    logger.info(f"POST/order/{order_id}/items - Item added")
+    return order_response(session, order_id, status_code=201)
 
-    session.commit()
-    session.refresh(order)
-    logger.info(f"PATCH/order/{order_id} - Order patched successfully")
-    return order
+
+# REMOVE ONE ITEM
+@router.delete("/{order_id}/items/{item_id}", status_code=204)
+def remove_order_item(
+        order_id: int,
+        item_id: int,
+        if_match: Optional[str] = Header(None),
+        session: Session = Depends(get_session)
+):
+    logger.info(f"DELETE/order/{order_id}/items/{item_id} - Removing item")
+    order = session.get(Order, order_id)
+    if not order:
+        logger.warning(f"DELETE/order/{order_id}/items/{item_id} - Order not found")
+        raise HTTPException(status_code=404, detail="Order not found")
+    check_if_match(if_match, order.version)
+    item = session.get(OrderItem, item_id)
+    if not item or item.order_id != order_id:
+        logger.warning(f"DELETE/order/{order_id}/items/{item_id} - Item not found")
+        raise HTTPException(status_code=404, detail="Order item not found")
+
+    removed = held_lines(order.status, {item.menu_item_id: item.quantity})
+    with write_conflicts(f"DELETE/order/{order_id}/items/{item_id}"):
+        old_total = order.order_total
+        flag_modified(order, "status")
+        session.delete(item)
+        session.flush()
+        update_customer_stats(session, order.customer_id,
+                              spend=refresh_order_total(session, order_id) - old_total)
+        session.commit()
+    release_stock(removed, tracked_items(session, removed))
+    logger.info(f"DELETE/order/{order_id}/items/{item_id} - Item removed")
+    publish_sync(order_message(session, order_id))
+    # no body, but the new ETag for the next conditional write
+    return Response(status_code=204, headers={"ETag": etag(order.version)})
 
 
 # DELETE
 @router.delete("/{order_id}", status_code=204)
-def delete_order(order_id: int, session: Session = Depends(get_session)):
+def delete_order(
+        order_id: int,
+        if_match: Optional[str] = Header(None),
+        session: Session = Depends(get_session)
+):
     logger.info(f"DELETE/order/{order_id} - Deleting order")
     order = session.get(Order, order_id)
     if not order:
         logger.warning(f"PATCH/order/{order_id} - Order not found")
         raise HTTPException(status_code=404, detail="Order not found")
-
-    session.delete(order)
-    session.commit()
+    check_if_match(if_match, order.version)
+
+    # a Completed order's items were made: their stock isn't given back;
+    # a Cancelled one's was given back already
+    lines = {}
+    if order.status not in ("Completed", "Cancelled"):
+        lines = order_lines(order.items)
+    with write_conflicts(f"DELETE/order/{order_id}"):
+        customer_id, total, version = order.customer_id, order.order_total, order.version
+        session.delete(order)
+        session.flush()
+        update_customer_stats(session, customer_id, orders=-1, spend=-total)
+        session.commit()
+    release_stock(lines, tracked_items(session, lines))
     logger.info(f"PATCH/order/{order_id} - Order deleted successfully")
+    publish_sync(order_removed(order_id, version=version))
     return
@@ -1,80 +1,151 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlmodel import Session, select, func
-from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import heapq
 from typing import List, Optional
 
-from app.database import get_session
+from app.database import all_engines, get_read_session
 from app.models import *
 from app.utils.logger import logger
+from app.utils.responses import model_response
 
 router = APIRouter(prefix="/summary", tags=["Order Summary"])
 
 
+def count_orders(session: Session, on_date) -> int:
+    # Get total orders using a count query
+    return session.exec(
+        select(func.count()).select_from(Order).where(*on_date)
+    ).one()
+
+
+def page_orders(session: Session, on_date, offset: int, limit: int) -> list:
+    # Paginated order records, with the customer's name
+    return session.exec(
+        select(Order.id, Order.location_id, Order.created_at, Order.customer_id,
+               Order.order_total, Customer.name)
+        .join(Customer, Customer.id == Order.customer_id)
+        .where(*on_date)
+        .order_by(Order.created_at.desc())
+        .offset(offset).limit(limit)
+    ).all()
+
+
+def order_items(session: Session, order_ids: list) -> dict:
+    # All the page's items in one query. Prices and totals are the ones
+    # stored when the order was placed, so old days don't change when the
+    # menu does; menu_items is joined only for the names.
+    items_by_order = {order_id: [] for order_id in order_ids}
+    if order_ids:
+        items = session.exec(
+            select(OrderItem.order_id, OrderItem.quantity, OrderItem.unit_price,
+                   OrderItem.line_total, MenuItem.name)
+            .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+            .where(OrderItem.order_id.in_(order_ids))
+            .order_by(OrderItem.id)
+        ).all()
+        for item in items:
+            items_by_order[item.order_id].append(ItemSummary(
+                name=item.name,
+                quantity=item.quantity,
+                price=item.unit_price,
+                total=round(item.line_total, 2)
+            ))
+    return items_by_order
+
+
+def on_engines(engines: list, work) -> list:
+    # work(session, index) on every database at once, results in engine
+    # order. The pool's threads have no request location: every location
+    # is seen.
+    def run(index):
+        with Session(engines[index]) as session:
+            return work(session, index)
+
+    with ThreadPoolExecutor(max_workers=len(engines)) as executor:
+        return list(executor.map(run, range(len(engines))))
+
+
+def all_locations_page(on_date, offset: int, per_page: int):
+    # Fans out to the main database and every shard: each counts its orders
+    # and returns its newest offset + per_page, and the merge (newest first)
+    # keeps the page. Then the page's items, from the databases they are in.
+    engines = all_engines()
+    results = on_engines(engines, lambda session, index: (
+        count_orders(session, on_date),
+        page_orders(session, on_date, 0, offset + per_page)))
+    total_orders = sum(count for count, _ in results)
+    tagged = [[(engine_index, order) for order in orders]
+              for engine_index, (_, orders) in enumerate(results)]
+    page = list(heapq.merge(*tagged, key=lambda entry: entry[1].created_at,
+                            reverse=True))[offset:offset + per_page]
+
+    ids_by_engine = [[order.id for engine_index, order in page if engine_index == index]
+                     for index in range(len(engines))]
+    items = on_engines(engines, lambda session, index: order_items(
+        session, ids_by_engine[index]))
+    orders = [order for _, order in page]
+    items_by_order = {(engine_index, order.id): items[engine_index][order.id]
+                      for engine_index, order in page}
+    return total_orders, orders, [items_by_order[(engine_index, order.id)]
+                                  for engine_index, order in page]
+
+
 @router.get("/", response_model=PaginatedOrderSummary)
 def get_order_summary(
     date_str: Optional[str] = Query(None, alias="date"),
     page: int = Query(1, ge=1),
     per_page: int = Query(5, ge=1, le=100),
-    session: Session = Depends(get_session)
+    all_locations: bool = Query(False),
+    session: Session = Depends(get_read_session)
 ):
+    # all_locations=true: every location's orders (all databases), newest
+    # first; otherwise the request's location only
     try:
         target_date = datetime.strptime(
             date_str, "%Y-%m-%d").date() if date_str else date.today()
     except ValueError:
         logger.warning(f"GET /orders/summary - Invalid date: {date_str}")
-        return HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
     logger.info(
-        f"GET /orders/summary - date={target_date}, page={page}, per_page={per_page}")
-
-    # Base query for the orders on the given date
-    base_query = select(Order).where(
-        func.date(Order.created_at) == target_date)
-
-    # Get total orders using a count query
-    total_orders = session.exec(
-        select(func.count()).select_from(Order).where(
-            func.date(Order.created_at) == target_date)
-    ).one()
+        f"GET /orders/summary - date={target_date}, page={page}, per_page={per_page}, "
+        f"all_locations={all_locations}")
 
-    total_pages = (total_orders + per_page - 1) // per_page
+    # Orders on the given date, as a created_at range so that
+    # ix_orders_created_at can be used (date(created_at) = ... can't)
+    day_start = datetime.combine(target_date, datetime.min.time())
+    on_date = (Order.created_at >= day_start,
+               Order.created_at < day_start + timedelta(days=1))
     offset = (page - 1) * per_page
 
-    # Paginated order records
-    orders = session.exec(
-        base_query.order_by(Order.created_at.desc()).offset(
-            offset).limit(per_page)
-    ).all()
-
-    summaries = []
-
-    for order in orders:
-        customer = session.get(Customer, order.customer_id)
-        items = []
+    if all_locations:
+        total_orders, orders, items = all_locations_page(on_date, offset, per_page)
+    else:
+        total_orders = count_orders(session, on_date)
+        orders = page_orders(session, on_date, offset, per_page)
+        items_by_order = order_items(session, [order.id for order in orders])
+        items = [items_by_order[order.id] for order in orders]
 
-        for item in order.items:
-            menu_item = session.get(MenuItem, item.menu_item_id)
-            items.append(ItemSummary(
-                name=menu_item.name,
-                quantity=item.quantity,
-                price=menu_item.price,
-                total=round(item.quantity * menu_item.price, 2)
-            ))
+    total_pages = (total_orders + per_page - 1) // per_page
 
-        summaries.append(OrderSummary(
-            customer_id=customer.id,
-            customer_name=customer.name,
-            items_ordered=items
-        ))
+    summaries = [OrderSummary(
+        location_id=order.location_id,
+        customer_id=order.customer_id,
+        customer_name=order.name,
+        order_total=round(order.order_total, 2),
+        items_ordered=order_items_list
+    ) for order, order_items_list in zip(orders, items)]
 
     logger.info(
         f"GET /orders/summary - {len(summaries)} orders retrieved for {target_date}")
 
-    return PaginatedOrderSummary(
+    return model_response(PaginatedOrderSummary, PaginatedOrderSummary(
         date=target_date.strftime("%Y-%m-%d"),
         page=page,
         per_page=per_page,
         total_pages=total_pages,
         total_orders=total_orders,
         orders=summaries
-    )
+    ))
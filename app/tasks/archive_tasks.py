@@ -0,0 +1,18 @@
+import asyncio
+
+from app.database import all_engines
+from app.tasks.metrics import track_job
+from app.utils.archive import archive_old_orders
+from app.utils.logger import logger
+
+
+# nightly cron job (see WorkerSettings.cron_jobs)
+@track_job
+async def archive_orders(ctx):
+    # the main database and every location shard
+    moved = 0
+    for db_engine in [ctx["engine"]] if "engine" in ctx else all_engines():
+        # plain blocking SQL: run it off the worker's event loop
+        moved += await asyncio.to_thread(archive_old_orders, db_engine)
+    logger.info(f"ARQ: archived {moved} orders")
+    return moved
@@ -1,27 +1,82 @@
 import asyncio
 # for running asynchronous code
 import os
-from arq.connections import create_pool, RedisSettings
-# create_pool connects to Redis
-# RedisSettings allows ARQ to configure Redis from a URL
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
+# arq (and redis-py under it) is imported on first use, not at app import:
+# importing the package costs ~0.1s of every cold start
+
+
+def redis_settings():
+    # RedisSettings allows ARQ to configure Redis from a URL
+    from arq.connections import RedisSettings
+
+    return RedisSettings.from_dsn(REDIS_URL)
+
+# Shared pool, opened by the API's startup warm-up (see app/utils/warmup.py)
+_pool = None
+_pool_loop = None
+
+
+async def open_pool():
+    # create_pool connects to Redis
+    from arq.connections import create_pool
+    global _pool, _pool_loop
+
+    if _pool is None:
+        _pool = await create_pool(redis_settings())
+        _pool_loop = asyncio.get_running_loop()
+    await _pool.ping()
+    return _pool
+
+
+async def close_pool():
+    global _pool, _pool_loop
+
+    if _pool is not None:
+        await _pool.aclose()
+    _pool, _pool_loop = None, None
+
+
+def get_pool():
+    return _pool
+
+
+def submit_to_pool(make_coro):
+    # From a sync route's worker thread: runs make_coro(pool) on the event
+    # loop that owns the warm pool. Returns the concurrent future, or None
+    # when the pool isn't open (yet).
+    if _pool is None:
+        return None
+    return asyncio.run_coroutine_threadsafe(make_coro(_pool), _pool_loop)
 
 
 # these funcs triggers the bg task from the API
-async def enqueue(order_id: int):
+async def enqueue(order_id: int, location_id: int):
     # async function
-    redis = await create_pool(
-        RedisSettings.from_dsn(os.getenv("REDIS_URL", "redis://redis:6379")))
-    await redis.enqueue_job("update_order_status", order_id)
-    # enqueues the job called the func name with parameter
+    from arq.connections import create_pool
+
+    redis = await create_pool(redis_settings())
+    try:
+        await redis.enqueue_job("update_order_status", order_id, location_id)
+        # enqueues the job called the func name with parameter
+    finally:
+        await redis.aclose()
 
 
 # since the router is sync func, it is not await compatible. So this:
-def enqueue_sync(order_id: int):
+def enqueue_sync(order_id: int, location_id: int):
+    # reuse the warm pool: hand the job to the event loop that owns it
+    future = submit_to_pool(
+        lambda pool: pool.enqueue_job("update_order_status", order_id, location_id))
+    if future is not None:
+        future.result(timeout=10)
+        return
     try:
         loop = asyncio.get_running_loop()
-        loop.create_task(enqueue(order_id))
+        loop.create_task(enqueue(order_id, location_id))
         # tries to get current running event loop
         # if it finds, enqueue func is scheduled in bg without blocking
     except RuntimeError:
-        asyncio.run(enqueue(order_id))
+        asyncio.run(enqueue(order_id, location_id))
         # if no running loop, just runs enqueue
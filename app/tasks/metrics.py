@@ -0,0 +1,124 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+
+from app.utils.logger import logger
+
+# Redis key prefix the workers publish their metrics snapshot under
+METRICS_KEY_PREFIX = "arq:metrics:"
+# how many recent jobs per function are kept for the latency percentiles
+METRICS_WINDOW = int(os.getenv("ARQ_METRICS_WINDOW", "1000"))
+# a snapshot older than this is treated as a dead worker
+METRICS_TTL_SECONDS = 120
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class JobMetrics:
+    # In-process job statistics of one worker, per function name
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.queue_wait = defaultdict(lambda: deque(maxlen=self.window))
+        self.duration = defaultdict(lambda: deque(maxlen=self.window))
+        self.outcomes = defaultdict(Counter)
+        self.retries = Counter()
+
+    def record(self, function: str, queue_wait: float, duration: float,
+               job_try: int, outcome: str):
+        self.queue_wait[function].append(queue_wait)
+        self.duration[function].append(duration)
+        self.outcomes[function][outcome] += 1
+        if job_try > 1:
+            self.retries[function] += 1
+
+    def snapshot(self) -> dict:
+        functions = {}
+        for name, outcomes in self.outcomes.items():
+            waits, durations = self.queue_wait[name], self.duration[name]
+            functions[name] = {
+                "jobs": sum(outcomes.values()),
+                "outcomes": dict(outcomes),
+                "retried_jobs": self.retries[name],
+                "queue_wait_s": {p: round(percentile(waits, n), 4)
+                                 for p, n in (("p50", 50), ("p95", 95),
+                                              ("p99", 99), ("max", 100))},
+                "duration_s": {p: round(percentile(durations, n), 4)
+                               for p, n in (("p50", 50), ("p95", 95),
+                                            ("p99", 99), ("max", 100))},
+            }
+        return {"pid": os.getpid(), "timestamp": time.time(),
+                "functions": functions}
+
+
+metrics = JobMetrics()
+
+
+def track_job(func):
+    # Wraps an ARQ task to record queue wait, run time, try number and outcome
+    from arq import Retry
+
+    @functools.wraps(func)
+    async def wrapper(ctx, *args, **kwargs):
+        started = time.time()
+        # score is the time (ms) the job became due, so deferred jobs
+        # don't count their deferral as waiting
+        queue_wait = max(0.0, started - ctx.get("score", started * 1000) / 1000)
+        outcome = "success"
+        try:
+            return await func(ctx, *args, **kwargs)
+        except Retry:
+            outcome = "retry"
+            raise
+        except asyncio.CancelledError:
+            # job_timeout and aborts both cancel the task
+            outcome = "cancelled"
+            raise
+        except Exception:
+            outcome = "failed"
+            raise
+        finally:
+            metrics.record(func.__name__, queue_wait, time.time() - started,
+                           ctx.get("job_try", 1), outcome)
+    return wrapper
+
+
+# same as arq.constants.default_queue_name; arq isn't imported by the API
+DEFAULT_QUEUE_NAME = "arq:queue"
+
+
+async def queue_depth(redis, queue_name: str = DEFAULT_QUEUE_NAME) -> int:
+    return await redis.zcard(queue_name)
+
+
+async def report_metrics(ctx):
+    # ARQ cron job: log this worker's metrics and publish them to Redis
+    # so the API can serve them from /metrics/worker
+    redis = ctx["redis"]
+    snapshot = metrics.snapshot()
+    snapshot["queue_depth"] = await queue_depth(redis)
+    logger.info(f"ARQ metrics: {json.dumps(snapshot)}")
+    await redis.set(f"{METRICS_KEY_PREFIX}{snapshot['pid']}",
+                    json.dumps(snapshot), ex=METRICS_TTL_SECONDS)
+
+
+async def read_worker_metrics(redis) -> dict:
+    # Collects the snapshots every live worker published
+    workers = []
+    async for key in redis.scan_iter(match=f"{METRICS_KEY_PREFIX}*"):
+        value = await redis.get(key)
+        if value:
+            workers.append(json.loads(value))
+    return {"queue_depth": await queue_depth(redis), "workers": workers}
@@ -1,41 +1,89 @@
+from arq import Retry
+from sqlalchemy.orm.exc import StaleDataError
 from sqlmodel import Session, select
 import asyncio
 # for async sleeps
+import os
 
-from app.database import engine
+from app.database import engine_for
 # connects to db
-from app.models import Order, MenuItem
+from app.models import ACTIVE_STATUSES, MenuItem, Order, OrderItem
+from app.tasks.metrics import track_job
+from app.utils.kitchen import order_message, publish
 from app.utils.logger import logger
 
+# Multiplies every sleep in the task; benchmarks set it close to 0
+TIME_SCALE = float(os.getenv("ORDER_TASK_TIME_SCALE", "1"))
+
+
+# how often a status change is retried after losing a compare-and-swap
+CAS_RETRIES = 5
+
+
+def advance_status(db_engine, order_id: int, status: str, location_id: int = None):
+    # Moves an active order to `status` with a compare-and-swap on
+    # Order.version: the UPDATE only matches if nobody (e.g. a PATCH from
+    # the API) wrote the order since we read it. On a conflict we re-read
+    # and decide again, so an order the API completed or cancelled in the
+    # meantime is left alone. Returns the kitchen board message, or None.
+    for attempt in range(1, CAS_RETRIES + 1):
+        with Session(db_engine) as session:
+            order = session.get(Order, order_id)
+            if not order:
+                logger.warning(f"ARQ: Order {order_id} was deleted")
+                return None
+            if order.status not in ACTIVE_STATUSES:
+                logger.info(f"ARQ: Order {order_id} is already {order.status}")
+                return None
+            order.status = status
+            try:
+                session.commit()
+            except StaleDataError:
+                logger.info(f"ARQ: Order {order_id} changed while updating "
+                            f"(attempt {attempt}), retrying")
+                continue
+            return order_message(session, order_id, location_id)
+    raise Retry(defer=1)
+
 
 # defines the bg task what should do
-async def update_order_status(_, order_id: int):
-    logger.info(f"ARQ: Received order_id={order_id}")
+@track_job
+async def update_order_status(ctx, order_id: int, location_id: int = None):
+    # location_id: where the order was placed, it picks the database (jobs
+    # enqueued before locations existed have none: the main database)
+    logger.info(f"ARQ: Received order_id={order_id} (location {location_id})")
+    db_engine = ctx.get("engine") or engine_for(location_id)
+    # a short session per step, so no DB connection is held while sleeping
 
-    with Session(engine) as session:
+    with Session(db_engine) as session:
         order = session.exec(select(Order).where(Order.id == order_id)).first()
         if not order:
             logger.warning(f"ARQ: Order {order_id} not found")
             return
 
-        # Step 1: Change status to "Preparing" after 1 minute
-        await asyncio.sleep(60)
-        order.status = "Preparing"
-        session.add(order)
-        session.commit()
-        logger.info(f"ARQ: Order {order_id} is preparing")
-
-        # Step 2: Fetch prep time and sleep again
-        prep_times = []
-        for item in order.items:
-            menu_item = session.get(MenuItem, item.menu_item_id)
-            if menu_item and menu_item.preparation_time_minutes:
-                prep_times.append(menu_item.preparation_time_minutes)
-
-        if prep_times:
-            await asyncio.sleep(max(prep_times) * 60)
-
-        order.status = "Completed"
-        session.add(order)
-        session.commit()
-        logger.info(f"ARQ: Order {order_id} has been Completed")
+    # Step 1: Change status to "Preparing" after 1 minute
+    await asyncio.sleep(60 * TIME_SCALE)
+    preparing = advance_status(db_engine, order_id, "Preparing", location_id)
+    if preparing is None:
+        return
+    logger.info(f"ARQ: Order {order_id} is preparing")
+    # tell the API processes' kitchen boards
+    await publish(ctx.get("redis"), preparing)
+
+    # Step 2: Fetch prep time and sleep again
+    with Session(db_engine) as session:
+        prep_times = session.exec(
+            select(MenuItem.preparation_time_minutes)
+            .join(OrderItem, OrderItem.menu_item_id == MenuItem.id)
+            .where(OrderItem.order_id == order_id)
+        ).all()
+    prep_times = [minutes for minutes in prep_times if minutes]
+
+    if prep_times:
+        await asyncio.sleep(max(prep_times) * 60 * TIME_SCALE)
+
+    completed = advance_status(db_engine, order_id, "Completed", location_id)
+    if completed is None:
+        return
+    logger.info(f"ARQ: Order {order_id} has been Completed")
+    await publish(ctx.get("redis"), completed)
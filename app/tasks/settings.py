@@ -1,7 +1,11 @@
 import os
+from arq import cron
 from arq.connections import RedisSettings
 
+from app.tasks.archive_tasks import archive_orders
+from app.tasks.metrics import report_metrics
 from app.tasks.order_tasks import update_order_status
+from app.tasks.stock_tasks import reconcile_stock
 from app.utils.logger import logger
 
 
@@ -9,7 +13,9 @@ async def startup(_):
     logger.info("ARQ worker starting...")
 
 
-async def shutdown(_):
+async def shutdown(ctx):
+    # last snapshot, so the final numbers aren't lost
+    await report_metrics(ctx)
     logger.info("ARQ worker stopping...")
 
 
@@ -17,6 +23,15 @@ async def shutdown(_):
 class WorkerSettings:
     functions = [update_order_status]
     # tasks ARQ the tasks the worker can run
+    cron_jobs = [
+        cron(report_metrics, second={0, 30}, run_at_startup=True),
+        cron(archive_orders, hour={int(os.getenv("ARCHIVE_CRON_HOUR", "3"))},
+             minute={0}, second={0}),
+        cron(reconcile_stock, second={15}, run_at_startup=True),
+    ]
+    # logs the job metrics and publishes them for GET /metrics/worker;
+    # moves old finished orders to the archive tables every night; copies
+    # the menu stock counters back to the database every minute
     on_startup = startup
     on_shutdown = shutdown
     # looks for these func for logging
@@ -24,3 +39,5 @@ class WorkerSettings:
         os.getenv("REDIS_URL", "redis://redis:6379"))
     job_timeout = 1200   # (20 minutes)
     # max time a task can run. After this time, it will get cancelled
+    max_jobs = int(os.getenv("ARQ_MAX_JOBS", "10"))
+    # how many jobs one worker runs concurrently
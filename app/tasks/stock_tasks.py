@@ -0,0 +1,16 @@
+from app.database import all_engines
+from app.tasks.metrics import track_job
+from app.utils.logger import logger
+from app.utils.stock import reconcile
+
+
+# cron job, every minute (see WorkerSettings.cron_jobs)
+@track_job
+async def reconcile_stock(ctx):
+    # the live Redis counters back to menu_items.stock_quantity
+    # the main database and every location shard
+    changed = 0
+    for db_engine in [ctx["engine"]] if "engine" in ctx else all_engines():
+        changed += await reconcile(ctx["redis"], db_engine)
+    logger.info(f"ARQ: reconciled stock, {changed} menu items changed")
+    return changed
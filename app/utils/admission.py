@@ -0,0 +1,280 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from fastapi.responses import ORJSONResponse
+
+from app.database import DATABASE_URL, DB_POOL_SIZE, LOCATION_SHARDS, READ_REPLICA_URLS
+from app.utils.logger import logger
+
+# Admission control: a spike used to pile every request up in the
+# threadpool, all waiting on a DB connection, until everything timed out
+# together. Now at most ADMISSION_MAX_CONCURRENCY requests run at once (all
+# the DB pools together, see database_capacity()); the rest wait in a
+# bounded queue per route group and are let in by priority. A full queue,
+# or a wait over ADMISSION_MAX_WAIT_SECONDS, gets an immediate 503.
+ADMISSION_CONTROL = os.getenv(
+    "ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+
+
+def database_capacity() -> int:
+    # connections a request can be running on: every pool (DB_POOL_SIZE
+    # plus SQLAlchemy's default overflow of 10) of the main database, each
+    # shard database and each read replica; a request holds one of them
+    databases = {DATABASE_URL, *LOCATION_SHARDS.values()}
+    return (len(databases) + len(READ_REPLICA_URLS)) * (DB_POOL_SIZE + 10)
+
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv(
+    "ADMISSION_MAX_CONCURRENCY", str(database_capacity())))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "50"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "2"))
+# slots only order writes and the kitchen board may use (see _has_room)
+ADMISSION_RESERVED = int(os.getenv("ADMISSION_RESERVED", "2"))
+# the summary report and metrics never hold more than this many
+ANALYTICS_MAX_CONCURRENCY = int(os.getenv("ANALYTICS_MAX_CONCURRENCY", "2"))
+
+# Per-client token bucket (requests/second, burst size); 0 turns it off.
+# RATE_LIMIT_BACKEND=redis shares the buckets between API processes through
+# the warm Redis pool, falling back to this process's buckets without it.
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# buckets kept in memory, least recently used dropped first
+RATE_LIMIT_MAX_CLIENTS = 10000
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class RouteGroup:
+    def __init__(self, name: str, priority: int, limit: int,
+                 queue_size: int = ADMISSION_QUEUE_SIZE):
+        self.name = name
+        self.priority = priority  # lower is let in first
+        self.limit = max(1, limit)
+        self.queue_size = queue_size
+        self.running = 0
+        self.waiting = deque()
+        self.shed = 0
+
+
+ORDER_WRITES = RouteGroup("order_writes", 0, ADMISSION_MAX_CONCURRENCY)
+KITCHEN = RouteGroup("kitchen", 0, ADMISSION_MAX_CONCURRENCY)
+DEFAULT = RouteGroup("default", 1, ADMISSION_MAX_CONCURRENCY)
+ANALYTICS = RouteGroup("analytics", 2, ANALYTICS_MAX_CONCURRENCY)
+
+
+def route_group(method: str, path: str):
+    # None: never queued nor shed (health probes)
+    if path.startswith("/health"):
+        return None
+    if path.startswith("/orders") and method in WRITE_METHODS and \
+            not path.endswith("/batch-get"):
+        return ORDER_WRITES
+    if path.startswith("/kitchen"):
+        return KITCHEN
+    if path.startswith(("/summary", "/metrics")):
+        return ANALYTICS
+    return DEFAULT
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionController:
+    # Runs on the event loop only, so no locking
+
+    def __init__(self, groups, max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+                 max_wait: float = ADMISSION_MAX_WAIT_SECONDS,
+                 reserved: int = ADMISSION_RESERVED):
+        self.groups = sorted(groups, key=lambda group: group.priority)
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.reserved = reserved
+        self.running = 0
+
+    def _has_room(self, group: RouteGroup) -> bool:
+        # the last `reserved` slots are for the priority 0 groups (order
+        # writes and the kitchen) only
+        cap = self.max_concurrency if group.priority == 0 else \
+            self.max_concurrency - self.reserved
+        return self.running < cap and group.running < group.limit
+
+    async def acquire(self, group: RouteGroup):
+        # raises Overloaded when the group's queue is full or the wait is
+        # over max_wait; the caller must release() after a normal return
+        if not group.waiting and self._has_room(group):
+            self._start(group)
+            return
+        if len(group.waiting) >= group.queue_size:
+            group.shed += 1
+            raise Overloaded(f"{group.name} queue is full")
+        waiter = asyncio.get_running_loop().create_future()
+        group.waiting.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # the client went away; if it was let in already, pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release(group)
+            raise
+        finally:
+            if not waiter.done():
+                # timed out or the client went away: give up the place
+                waiter.cancel()
+                group.waiting.remove(waiter)
+        if waiter.cancelled():
+            group.shed += 1
+            raise Overloaded(f"{group.name} waited over {self.max_wait}s")
+
+    def release(self, group: RouteGroup):
+        self.running -= 1
+        group.running -= 1
+        self._dispatch()
+
+    def _start(self, group: RouteGroup):
+        self.running += 1
+        group.running += 1
+
+    def _dispatch(self):
+        # hand the free slots to the waiters, most important group first
+        for group in self.groups:
+            while group.waiting and self._has_room(group):
+                self._start(group)
+                group.waiting.popleft().set_result(None)
+
+    def snapshot(self) -> dict:
+        return {"running": self.running, "max_concurrency": self.max_concurrency,
+                "groups": {group.name: {"running": group.running,
+                                        "limit": group.limit,
+                                        "waiting": len(group.waiting),
+                                        "shed": group.shed}
+                           for group in self.groups}}
+
+
+class TokenBuckets:
+    # In-process per-client buckets
+
+    def __init__(self, rate: float, burst: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, last refill)
+
+    async def take(self, client: str) -> float:
+        # 0 when allowed, else the seconds until a token is available
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Same bucket as TokenBuckets.take(), atomically in Redis. Returns the
+# seconds to wait as a string (Lua numbers would be truncated to integers).
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisTokenBuckets:
+    def __init__(self, rate: float, burst: int, fallback: TokenBuckets):
+        self.rate = rate
+        self.burst = burst
+        self.fallback = fallback
+        self._script = None
+
+    async def take(self, client: str) -> float:
+        from app.tasks.enqueue import get_pool
+
+        redis = get_pool()
+        if redis is None:
+            return await self.fallback.take(client)
+        try:
+            if self._script is None:
+                self._script = redis.register_script(TOKEN_BUCKET_SCRIPT)
+            wait = await self._script(keys=[f"ratelimit:{client}"],
+                                      args=[self.rate, self.burst, time.time()])
+            return float(wait)
+        except Exception as e:
+            logger.warning(f"Rate limit - Redis unavailable, using local buckets: {str(e)}")
+            return await self.fallback.take(client)
+
+
+def client_key(scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def reject(status_code: int, detail: str, retry_after: float):
+    return ORJSONResponse(
+        {"detail": detail}, status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+admission = AdmissionController([ORDER_WRITES, KITCHEN, DEFAULT, ANALYTICS])
+
+
+class AdmissionMiddleware:
+    # Pure ASGI middleware: rate limit per client (429), then admission by
+    # route group (503). Both answer right away with Retry-After.
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+        self.buckets = None
+        if RATE_LIMIT_PER_SECOND > 0:
+            self.buckets = TokenBuckets(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+            if RATE_LIMIT_BACKEND == "redis":
+                self.buckets = RedisTokenBuckets(
+                    RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST, self.buckets)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        group = route_group(scope["method"], scope["path"])
+        if group is None:
+            return await self.app(scope, receive, send)
+
+        if self.buckets is not None:
+            wait = await self.buckets.take(client_key(scope))
+            if wait > 0:
+                logger.warning(f"{scope['method']}{scope['path']} - Rate limited "
+                               f"client {client_key(scope)}")
+                return await reject(429, "Too many requests", wait)(scope, receive, send)
+
+        try:
+            await self.controller.acquire(group)
+        except Overloaded as e:
+            logger.warning(f"{scope['method']}{scope['path']} - Shed: {str(e)}")
+            return await reject(503, "Server busy, retry later",
+                                self.controller.max_wait)(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(group)
@@ -0,0 +1,72 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, delete, select
+
+from app.models import Order, OrderArchive, OrderItem, OrderItemArchive
+from app.utils.logger import logger
+
+# Completed/Cancelled orders older than ARCHIVE_AFTER_DAYS are moved, with
+# their items, to orders_archive / order_items_archive by the worker's
+# nightly cron job (app/tasks/archive_tasks.py). GET /orders/{id} and the
+# batch reads still find them by id; nothing writes them again.
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# orders per transaction: short transactions, short row locks
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# a run stops after this long and picks up from there the next night
+ARCHIVE_MAX_SECONDS = float(os.getenv("ARCHIVE_MAX_SECONDS", "600"))
+ARCHIVE_STATUSES = ("Completed", "Cancelled")
+
+ORDER_COLUMNS = ["id", "customer_id", "created_at", "status", "version", "order_total",
+                 "location_id"]
+ITEM_COLUMNS = ["id", "order_id", "menu_item_id", "quantity", "unit_price", "line_total"]
+
+
+def archive_batch(session: Session, cutoff: datetime, batch_size: int) -> int:
+    # Copies up to batch_size finished orders created before cutoff, and
+    # their items, into the archive tables and deletes them from the live
+    # ones, in the caller's transaction. Returns how many were moved.
+    # SKIP LOCKED (PostgreSQL): rows an API write is holding are left for
+    # the next batch; a write that comes after the move gets a 409 from
+    # the version check, as for a deleted order.
+    order_ids = session.exec(
+        select(Order.id)
+        .where(Order.created_at < cutoff, Order.status.in_(ARCHIVE_STATUSES))
+        .order_by(Order.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not order_ids:
+        return 0
+
+    orders, items = Order.__table__, OrderItem.__table__
+    session.exec(OrderArchive.__table__.insert().from_select(
+        ORDER_COLUMNS,
+        select(*[orders.c[name] for name in ORDER_COLUMNS])
+        .where(orders.c.id.in_(order_ids))))
+    session.exec(OrderItemArchive.__table__.insert().from_select(
+        ITEM_COLUMNS,
+        select(*[items.c[name] for name in ITEM_COLUMNS])
+        .where(items.c.order_id.in_(order_ids))))
+    session.exec(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    session.exec(delete(Order).where(Order.id.in_(order_ids)))
+    return len(order_ids)
+
+
+def archive_old_orders(db_engine, after_days: float = ARCHIVE_AFTER_DAYS,
+                       batch_size: int = ARCHIVE_BATCH_SIZE,
+                       max_seconds: float = ARCHIVE_MAX_SECONDS) -> int:
+    # one transaction per batch until nothing is left (or time is up)
+    cutoff = datetime.now() - timedelta(days=after_days)
+    started = time.monotonic()
+    moved = 0
+    while time.monotonic() - started < max_seconds:
+        with Session(db_engine) as session:
+            count = archive_batch(session, cutoff, batch_size)
+            session.commit()
+        moved += count
+        if count < batch_size:
+            break
+    logger.info(f"Archive - moved {moved} orders created before {cutoff:%Y-%m-%d %H:%M}")
+    return moved
@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from app.models.batch import MAX_BATCH_IDS
+
+# Batch reads: GET /{resource}/?ids=1,2,3 answers with the list of the rows
+# found, in the requested order, and the missing ids in X-Missing-Ids;
+# POST /{resource}/batch-get returns {"items": [...], "missing": [...]}.
+
+
+def parse_ids(ids: Optional[str]) -> Optional[list[int]]:
+    # ?ids=1,2,3 -> [1, 2, 3]; None when not given
+    if ids is None:
+        return None
+    try:
+        values = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400,
+                            detail="ids must be comma separated integers")
+    if len(values) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400,
+                            detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return values
+
+
+def with_missing_ids(response: Response, missing: list[int]) -> Response:
+    if missing:
+        response.headers["X-Missing-Ids"] = ",".join(str(i) for i in missing)
+    return response
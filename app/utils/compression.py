@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+# Responses of at least this many bytes are compressed, with brotli when the
+# client accepts it (and the package is installed), else gzip. Small bodies
+# aren't worth the CPU and the extra headers.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# brotli's 11 is far too slow for dynamic responses
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+# bigger bodies are compressed in a worker thread, off the event loop
+THREAD_MIN_BYTES = 64 * 1024
+
+
+def choose_encoding(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"accept-encoding":
+            accepted = {part.split(";")[0].strip()
+                        for part in value.decode("latin-1").lower().split(",")}
+            if brotli is not None and "br" in accepted:
+                return "br"
+            if "gzip" in accepted:
+                return "gzip"
+    return None
+
+
+def with_vary(headers) -> list:
+    # Every response that goes through here could have come out compressed
+    # for another client, so a cache must key it on Accept-Encoding too:
+    # small ones and those to clients that asked for none included
+    headers = list(headers)
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return headers
+    return headers + [(b"vary", b"Accept-Encoding")]
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    # Pure ASGI middleware. The routes send their JSON in one body message
+    # (rows_response / model_response); those are compressed whole.
+    # Streamed responses pass through unchanged.
+
+    def __init__(self, app, min_bytes: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.min_bytes = min_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(scope)
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": with_vary(message.get("headers", []))}
+                await send(message)
+            return await self.app(scope, receive, send_with_vary)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # held back until we know the body
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            headers = with_vary(start.get("headers", []))
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.min_bytes or \
+                    any(name == b"content-encoding" for name, _ in headers):
+                await send({**start, "headers": headers})
+            else:
+                if len(body) >= THREAD_MIN_BYTES:
+                    body = await asyncio.to_thread(compress, body, encoding)
+                else:
+                    body = compress(body, encoding)
+                headers = [(name, value) for name, value in headers
+                           if name != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode()),
+                            (b"content-length", str(len(body)).encode())]
+                await send({**start, "headers": headers})
+                message = {**message, "body": body}
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
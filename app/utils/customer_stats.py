@@ -0,0 +1,70 @@
+from sqlmodel import Session, func, select, union_all, update
+
+from app.models import Customer, Order, OrderArchive
+
+# Customer.order_count / lifetime_spend / last_order_at are maintained
+# incrementally: every order write calls update_customer_stats() in the same
+# transaction, after flushing its own changes.
+
+
+def order_total(session: Session, order_id: int) -> float:
+    # the stored total (see refresh_order_total() in app/utils/order_items.py)
+    total = session.exec(
+        select(Order.order_total).where(Order.id == order_id)
+    ).one_or_none()
+    return total or 0.0
+
+
+def latest_order_at(customer_id):
+    # Scalar subquery: the newest created_at over the customer's live and
+    # archived orders, each side read off its (customer_id, created_at)
+    # index. customer_id may be Customer.id, for a correlated UPDATE.
+    created = union_all(
+        select(func.max(Order.created_at).label("created_at"))
+        .where(Order.customer_id == customer_id).correlate(Customer),
+        select(func.max(OrderArchive.created_at))
+        .where(OrderArchive.customer_id == customer_id).correlate(Customer),
+    ).subquery()
+    return select(func.max(created.c.created_at)).scalar_subquery()
+
+
+def update_customer_stats(session: Session, customer_id: int,
+                          orders: int = 0, spend: float = 0.0):
+    # One UPDATE: the deltas are applied by the database, so concurrent
+    # orders of the same customer can't overwrite each other's counts.
+    # last_order_at is re-read through the (customer_id, created_at)
+    # indexes, which also covers deleting the customer's latest order.
+    session.exec(
+        update(Customer)
+        .where(Customer.id == customer_id)
+        .values(
+            order_count=Customer.order_count + orders,
+            lifetime_spend=Customer.lifetime_spend + spend,
+            last_order_at=latest_order_at(customer_id),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def recompute_customer_stats(connection, *where):
+    # Recomputes the stats of the matching customers from scratch, for bulk
+    # loads that bypass the API (scripts/seed_data.py)
+    orders_of = Order.customer_id == Customer.id
+    archived_of = OrderArchive.customer_id == Customer.id
+    connection.execute(
+        update(Customer)
+        .where(*where)
+        .values(
+            order_count=select(func.count()).select_from(Order)
+            .where(orders_of).scalar_subquery()
+            + select(func.count()).select_from(OrderArchive)
+            .where(archived_of).scalar_subquery(),
+            lifetime_spend=func.coalesce(
+                select(func.sum(Order.order_total))
+                .where(orders_of).scalar_subquery(), 0)
+            + func.coalesce(
+                select(func.sum(OrderArchive.order_total))
+                .where(archived_of).scalar_subquery(), 0),
+            last_order_at=latest_order_at(Customer.id),
+        )
+    )
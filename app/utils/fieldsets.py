@@ -0,0 +1,46 @@
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.models import OrderRead
+
+# ?fields=id,status and ?expand=items on the read endpoints. The fields
+# choose the columns that are SELECTed (see read_columns() in
+# app/utils/projections.py), so an unrequested column or relationship is
+# never read. The id is always returned: paging and links need it.
+
+# order relationships that ?expand= (or naming them in ?fields=) loads
+ORDER_EXPANSIONS = {"items"}
+
+
+def parse_fields(fields: Optional[str], schema) -> Optional[set]:
+    # None means every field of the schema
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return names | {"id"}
+
+
+def parse_expand(expand: Optional[str], allowed=ORDER_EXPANSIONS) -> set:
+    if expand is None:
+        return set()
+    names = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = names - allowed
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"Unknown expansions: {', '.join(sorted(unknown))}")
+    return names
+
+
+def order_fieldset(fields: Optional[str], expand: Optional[str]):
+    # Returns (columns, items) for fetch_orders(): the order fields to
+    # select, and whether to load the items. The items come with a full
+    # order, or with a sparse one when named in ?fields= or ?expand=.
+    names = parse_fields(fields, OrderRead)
+    expansions = parse_expand(expand)
+    items = names is None or "items" in names or "items" in expansions
+    return names, items
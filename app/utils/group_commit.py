@@ -0,0 +1,180 @@
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError
+
+from fastapi import HTTPException
+from sqlmodel import Session, insert
+
+from app.database import engine_for
+from app.models import Order, OrderCreate, OrderItem
+from app.utils.customer_stats import update_customer_stats
+from app.utils.order_items import menu_item_prices, new_item
+from app.utils.locations import current_location_id
+from app.utils.logger import logger
+
+# Opt-in group commit for POST /orders/. At peak most of an order insert is
+# its commit (one WAL flush per order); with ORDER_GROUP_COMMIT on, the
+# orders that arrive within GROUP_COMMIT_WINDOW_MS of each other are
+# written by a single transaction, up to GROUP_COMMIT_MAX_BATCH at a time.
+ORDER_GROUP_COMMIT = os.getenv(
+    "ORDER_GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "50"))
+# seconds a route waits for the writer before answering 503; by default
+# what a healthy writer can take (see write_timeout)
+GROUP_COMMIT_TIMEOUT = float(os.getenv("GROUP_COMMIT_TIMEOUT", "0")) or None
+
+
+def insert_orders(session: Session, orders: list[OrderCreate],
+                  location_ids: list[int] = None) -> list[int]:
+    # Multi-row INSERTs for the orders and for all of their items (with
+    # their price snapshots and the order totals), plus the customer stats,
+    # in the caller's transaction (the caller commits). Returns the new
+    # order ids, in the same order as `orders`. location_ids: each order's
+    # location, the request's location by default.
+    if location_ids is None:
+        location_ids = [current_location_id()] * len(orders)
+    prices = menu_item_prices(
+        session, [item.menu_item_id for order in orders for item in order.items])
+    totals = [sum(item.quantity * prices[item.menu_item_id] for item in order.items)
+              for order in orders]
+    order_ids = session.exec(
+        insert(Order).returning(Order.id, sort_by_parameter_order=True),
+        params=[{"customer_id": order.customer_id, "status": order.status,
+                 "order_total": total, "location_id": location_id}
+                for order, total, location_id in zip(orders, totals, location_ids)],
+    ).scalars().all()
+
+    items = [new_item(order_id, item.menu_item_id, item.quantity, prices)
+             for order_id, order in zip(order_ids, orders) for item in order.items]
+    if items:
+        session.exec(insert(OrderItem), params=items)
+
+    stats = defaultdict(lambda: [0, 0.0])  # customer_id -> [orders, spend]
+    for order, total in zip(orders, totals):
+        stats[order.customer_id][0] += 1
+        stats[order.customer_id][1] += total
+    # customers in id order: concurrent batches lock their rows in the same
+    # order and can't deadlock each other
+    for customer_id in sorted(stats):
+        count, spend = stats[customer_id]
+        update_customer_stats(session, customer_id, orders=count, spend=spend)
+    return order_ids
+
+
+class OrderGroupCommit:
+    # The route threads queue their orders and wait; one writer thread takes
+    # the first waiting order, gathers whatever else arrives within the
+    # window (or until the batch is full), writes them all with
+    # insert_orders() (one transaction per database, see LOCATION_SHARDS)
+    # and hands each route its order id back.
+
+    def __init__(self, window_ms: float = GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH,
+                 timeout: float = GROUP_COMMIT_TIMEOUT):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def submit(self, order: OrderCreate, location_id: int) -> int:
+        # blocks the calling route until its order is committed; raises
+        # whatever error writing this order (and only this order) raised
+        future = Future()
+        self._queue.put((order, location_id, future))
+        self._start_writer()
+        try:
+            return future.result(timeout=self.write_timeout(location_id))
+        except TimeoutError:
+            if not future.cancel():
+                # the writer has taken it and is writing it now: its outcome
+                # is the answer, else a committed order could get a 503
+                logger.warning("POST/order - group commit is slow, waiting for the write")
+                return future.result()
+        # a stuck writer (a lock, an exhausted pool) must not hold every
+        # route thread forever; the cancelled order is skipped, never written
+        logger.error(f"POST/order - group commit writer did not answer in "
+                     f"{self.write_timeout(location_id):.0f}s")
+        raise HTTPException(status_code=503, detail="Order writes are backed up, retry later")
+
+    def write_timeout(self, location_id: int) -> float:
+        # The window, then up to two pool checkouts: one for the batch and
+        # one for writing this order alone if the batch failed. There's no
+        # statement timeout on top of the pool's, so that bounds it.
+        if self.timeout:
+            return self.timeout
+        pool = engine_for(location_id).pool
+        pool_timeout = pool.timeout() if hasattr(pool, "timeout") else 30
+        return self.window + 2 * pool_timeout
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._run, name="order-group-commit", daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        by_engine = defaultdict(list)
+        for entry in batch:
+            # False: its route timed out and cancelled it, skip it; after
+            # this the route can't cancel it any more
+            if entry[2].set_running_or_notify_cancel():
+                by_engine[engine_for(entry[1])].append(entry)
+        for db_engine, entries in by_engine.items():
+            self.write_to(db_engine, entries)
+
+    def write_to(self, db_engine, batch):
+        try:
+            with Session(db_engine) as session:
+                order_ids = insert_orders(session, [order for order, _, _ in batch],
+                                          [location_id for _, location_id, _ in batch])
+                session.commit()
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # One bad order (e.g. its customer was deleted after validation)
+            # fails the whole transaction: write them one by one, so only
+            # that order's request gets the error.
+            logger.warning(f"POST/order - group commit of {len(batch)} orders "
+                           f"failed, writing them one by one: {str(e)}")
+            for entry in batch:
+                self.write_to(db_engine, [entry])
+            return
+        for (_, _, future), order_id in zip(batch, order_ids):
+            future.set_result(order_id)
+
+
+order_writer = OrderGroupCommit() if ORDER_GROUP_COMMIT else None
+
+
+def write_order(session: Session, order: OrderCreate) -> int:
+    # through the group commit when it's on, else in the request's own session
+    if order_writer is not None:
+        # end the request's (read) transaction first: its pooled connection
+        # goes back for the writer thread instead of idling while we wait
+        session.commit()
+        return order_writer.submit(order, current_location_id())
+    order_id = insert_orders(session, [order])[0]
+    session.commit()
+    return order_id
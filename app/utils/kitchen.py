@@ -0,0 +1,231 @@
+import asyncio
+import os
+import threading
+import uuid
+
+import orjson
+from sqlmodel import Session
+
+from app.database import all_engines
+from app.models.order_items import MenuItemNested
+from app.models.orders import ACTIVE_ORDERS, ACTIVE_STATUSES
+from app.utils.locations import current_location_id
+from app.utils.logger import logger
+from app.utils.projections import fetch_order, fetch_orders
+
+# Every process keeps the Pending/Preparing orders in memory for
+# GET /kitchen/active. Whoever changes an order (API write paths, the ARQ
+# worker) applies it locally and publishes it on this Redis channel; each
+# API process follows the channel and reloads from the database (through
+# ix_orders_active) whenever it (re)connects.
+KITCHEN_CHANNEL = os.getenv("KITCHEN_CHANNEL", "kitchen:orders")
+
+# tells this process's own messages apart when they come back from Redis
+ORIGIN = uuid.uuid4().hex
+
+# seconds between reconnects to the channel, doubling up to the max
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 30
+# how many removed orders' last versions are kept to reject late messages
+# (they arrive within moments, so only the recent removals matter)
+MAX_TOMBSTONES = 10_000
+
+
+class ActiveOrderIndex:
+    # OrderRead-shaped dicts of the active orders of every location, by
+    # (location_id, order id): ids are only unique per database
+
+    def __init__(self):
+        self._orders = {}
+        self._lock = threading.Lock()
+        # location_id -> that location's board as JSON
+        self._encoded = {}
+        # (location_id, order id) -> last version of the orders that left
+        # the board (finished or deleted), oldest first
+        self._removed = {}
+        self.loaded = False
+
+    def load(self, orders: list[dict], forget_removed: bool = False):
+        # forget_removed: a different database (the tests' fresh ones),
+        # whose ids say nothing about the removed orders seen so far
+        with self._lock:
+            if forget_removed:
+                self._removed = {}
+            self._orders = {(order["location_id"], order["id"]): order for order in orders}
+            self._encoded = {}
+            self.loaded = True
+
+    def upsert(self, order: dict):
+        key = (order["location_id"], order["id"])
+        with self._lock:
+            current = self._orders.get(key)
+            if current is not None and current["version"] > order["version"]:
+                # a late message about an older version of the order
+                return
+            if key in self._removed and self._removed[key] >= order["version"]:
+                # ... or about a version before it was finished or deleted
+                return
+            if order["status"] in ACTIVE_STATUSES:
+                self._orders[key] = order
+                self._removed.pop(key, None)
+            else:
+                self._orders.pop(key, None)
+                self._tombstone(key, order["version"])
+            self._encoded.pop(order["location_id"], None)
+
+    def remove(self, location_id: int, order_id: int, version: int = None):
+        # version: the deleted order's last one (else the one on the board)
+        key = (location_id, order_id)
+        with self._lock:
+            current = self._orders.pop(key, None)
+            if current is not None:
+                self._encoded.pop(location_id, None)
+                if version is None:
+                    version = current["version"]
+            if version is not None:
+                self._tombstone(key, version)
+
+    def _tombstone(self, key, version: int):
+        # with the lock held
+        # re-inserted at the end: the oldest removals are dropped first
+        self._removed[key] = max(version, self._removed.pop(key, version))
+        if len(self._removed) > MAX_TOMBSTONES:
+            del self._removed[next(iter(self._removed))]
+
+    def update_menu_item(self, menu_item: dict):
+        # a renamed or re-priced menu item shows up on the open orders, as
+        # the order items embed it (MenuItemNested: no location_id etc.)
+        location_id = menu_item["location_id"]
+        nested = {name: menu_item[name] for name in MenuItemNested.model_fields}
+        with self._lock:
+            for (order_location_id, _), order in self._orders.items():
+                if order_location_id != location_id:
+                    continue
+                for item in order["items"]:
+                    if item["menu_item_id"] == menu_item["id"]:
+                        item["menu_item"] = nested
+                        self._encoded.pop(location_id, None)
+
+    def apply(self, message: dict):
+        if message["op"] == "upsert":
+            self.upsert(message["order"])
+        elif message["op"] == "remove":
+            self.remove(message["location_id"], message["order_id"], message.get("version"))
+        elif message["op"] == "menu_item":
+            self.update_menu_item(message["menu_item"])
+
+    def orders(self, location_id: int = None) -> list[dict]:
+        # one location's, or all of them
+        with self._lock:
+            return [self._orders[key] for key in sorted(self._orders)
+                    if location_id is None or key[0] == location_id]
+
+    def encoded(self, location_id: int) -> bytes:
+        # the kitchen polls constantly: the JSON is only rebuilt after a change
+        with self._lock:
+            if location_id not in self._encoded:
+                self._encoded[location_id] = orjson.dumps(
+                    [self._orders[key] for key in sorted(self._orders)
+                     if key[0] == location_id])
+            return self._encoded[location_id]
+
+
+active_orders = ActiveOrderIndex()
+
+
+def order_changed(order: dict) -> dict:
+    return {"op": "upsert", "order": order}
+
+
+def order_removed(order_id: int, location_id: int = None, version: int = None) -> dict:
+    # the request's location by default; version: the order's last one, so
+    # a late upsert of it can't bring it back
+    if location_id is None:
+        location_id = current_location_id()
+    return {"op": "remove", "order_id": order_id, "location_id": location_id,
+            "version": version}
+
+
+def menu_item_changed(menu_item: dict) -> dict:
+    # menu_item: a MenuItemRead-shaped dict
+    return {"op": "menu_item", "menu_item": {
+        "id": menu_item["id"], "location_id": menu_item["location_id"],
+        "name": menu_item["name"], "price": menu_item["price"]}}
+
+
+def order_message(session: Session, order_id: int, location_id: int = None) -> dict:
+    # upsert with the order as it is now in the database, or a removal
+    order = fetch_order(session, order_id)
+    return order_changed(order) if order else order_removed(order_id, location_id)
+
+
+def encode_message(message: dict) -> bytes:
+    return orjson.dumps({**message, "origin": ORIGIN})
+
+
+async def publish(redis, message: dict):
+    # for async code that has a Redis connection (the ARQ worker's ctx)
+    active_orders.apply(message)
+    if redis is not None:
+        await redis.publish(KITCHEN_CHANNEL, encode_message(message))
+
+
+def publish_sync(message: dict):
+    # for the sync routes: apply here right away, then hand the publish to
+    # the warm Redis pool's event loop without waiting for it
+    from app.tasks.enqueue import submit_to_pool
+
+    active_orders.apply(message)
+    future = submit_to_pool(
+        lambda pool: pool.publish(KITCHEN_CHANNEL, encode_message(message)))
+    if future is not None:
+        future.add_done_callback(_log_publish_error)
+
+
+def _log_publish_error(future):
+    if future.exception() is not None:
+        logger.error(f"Kitchen - failed to publish an update: "
+                     f"{str(future.exception())}")
+
+
+def load_active_orders():
+    # every location's, from every database
+    orders = []
+    for db_engine in all_engines():
+        with Session(db_engine) as session:
+            orders += fetch_orders(session, ACTIVE_ORDERS)
+    active_orders.load(orders)
+    logger.info(f"Kitchen - loaded {len(active_orders.orders())} active orders")
+
+
+async def follow_kitchen_updates(redis, on_loaded=None):
+    # Runs for the life of the app (started by warm_up). Subscribes first
+    # and loads from the database second, so no update falls in between.
+    delay = RETRY_DELAY
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(KITCHEN_CHANNEL)
+            await asyncio.to_thread(load_active_orders)
+            if on_loaded:
+                on_loaded(True)
+            delay = RETRY_DELAY
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = orjson.loads(message["data"])
+                if data.pop("origin", None) != ORIGIN:
+                    active_orders.apply(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # updates may have been missed: stale until reloaded
+            active_orders.loaded = False
+            if on_loaded:
+                on_loaded(False)
+            logger.warning(f"Kitchen - lost the update channel, reloading in "
+                           f"{delay}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+        finally:
+            await pubsub.aclose()
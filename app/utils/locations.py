@@ -0,0 +1,112 @@
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import with_loader_criteria
+from sqlmodel import Field, Session
+
+# Every restaurant (location) has its own menu, customers, employees and
+# orders: the tables have a location_id column. An API request works in one
+# location, the X-Location-Id header (DEFAULT_LOCATION_ID without it), and
+# every ORM query it runs only sees that location's rows. A location can
+# also live in its own database (LOCATION_SHARDS in app/database.py).
+DEFAULT_LOCATION_ID = int(os.getenv("DEFAULT_LOCATION_ID", "1"))
+LOCATION_HEADER = b"x-location-id"
+
+# The request's location, set by LocationMiddleware. None outside requests
+# (the worker, scripts): no filtering, ids are unique per database anyway.
+current_location = ContextVar("current_location", default=None)
+
+
+def current_location_id() -> int:
+    # the location new rows go to (the column default of location_id)
+    location_id = current_location.get()
+    return DEFAULT_LOCATION_ID if location_id is None else location_id
+
+
+class LocationScoped:
+    # Marks the table models with a location_id column (MenuItem, Customer,
+    # Employee, Order, OrderArchive); order items go with their order
+    pass
+
+
+def location_field():
+    # location_id of a LocationScoped model: the request's location, for
+    # ORM objects and for Core inserts alike; existing rows got 1
+    return Field(default_factory=current_location_id,
+                 sa_column_kwargs={"default": current_location_id, "server_default": "1"})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def only_current_location(state):
+    # Adds "location_id = <the request's location>" to every ORM SELECT,
+    # UPDATE and DELETE of a LocationScoped model: a row of another
+    # location is simply not found (404), and can't be changed.
+    location_id = current_location.get()
+    if location_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        # Each option costs, so only the model the statement is about (its
+        # first entity; joined rows of the same location follow from it) or
+        # else all of them, e.g. select(func.count()).select_from(Order).
+        # state.all_mappers would be exact but costs more than the query.
+        mapper = state.bind_mapper
+        models = [mapper.class_] if mapper is not None and \
+            issubclass(mapper.class_, LocationScoped) else LocationScoped.__subclasses__()
+        state.statement = state.statement.options(*[
+            location_criteria(model, location_id) for model in models])
+
+
+_criteria = {}
+
+
+def location_criteria(model, location_id: int):
+    # One option per model (the mixin itself has no location_id column to
+    # build the criteria against), made once per location. A plain
+    # expression, not a lambda: SQLAlchemy re-runs a lambda's closure
+    # tracking on every execution.
+    option = _criteria.get((model, location_id))
+    if option is None:
+        option = _criteria[(model, location_id)] = with_loader_criteria(
+            model, model.location_id == location_id, include_aliases=True)
+    return option
+
+
+def parse_location(scope) -> Optional[int]:
+    # the X-Location-Id header; DEFAULT_LOCATION_ID without one, None when
+    # it isn't a positive integer
+    for name, value in scope.get("headers", []):
+        if name == LOCATION_HEADER:
+            try:
+                location_id = int(value)
+            except ValueError:
+                return None
+            return location_id if location_id > 0 else None
+    return DEFAULT_LOCATION_ID
+
+
+class LocationMiddleware:
+    # Pure ASGI middleware: sets current_location for the request (the sync
+    # routes and dependencies run with a copy of this context)
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        location_id = parse_location(scope)
+        if location_id is None:
+            body = orjson.dumps({"detail": "X-Location-Id must be a positive integer"})
+            await send({"type": "http.response.start", "status": 400,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+        token = current_location.set(location_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_location.reset(token)
@@ -0,0 +1,370 @@
+import heapq
+from bisect import bisect_left
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Optional
+
+from sqlalchemy import case, func, or_
+from sqlmodel import Session
+
+from app.database import engine_for
+from app.models import MenuItem, MenuItemRead
+from app.utils.locations import current_location, current_location_id
+from app.utils.logger import logger
+from app.utils.projections import fetch_rows
+
+# GET /menu/search: case-insensitive substring match on the name, typo
+# tolerant (trigram similarity) when that finds too little, with category
+# and price filters. Best matches first: exact name, name prefix, word
+# prefix, anywhere in the name (each in name order), then similar names.
+#
+# On PostgreSQL the database does it, through the pg_trgm GIN index on
+# lower(name) (ix_menu_items_name_trgm). Otherwise every process keeps the
+# catalog in memory with an inverted index of its name trigrams, one per
+# location (see MenuSearch for when it is rebuilt; writes made by another
+# process show up within MENU_SEARCH_REFRESH_SECONDS).
+MENU_SEARCH_BACKEND = os.getenv("MENU_SEARCH_BACKEND", "auto")  # auto|database|memory
+MENU_SEARCH_REFRESH_SECONDS = float(os.getenv("MENU_SEARCH_REFRESH_SECONDS", "30"))
+# menu writes searched on top of the index before it is rebuilt sooner
+MENU_SEARCH_MAX_CHANGES = int(os.getenv("MENU_SEARCH_MAX_CHANGES", "50"))
+# pg_trgm's default similarity threshold
+SIMILARITY_THRESHOLD = float(os.getenv("MENU_SEARCH_SIMILARITY", "0.3"))
+
+# relevance classes, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+
+
+def grams(text: str, size: int) -> set:
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def similarity(shared: int, query_grams: int, name_grams: int) -> float:
+    # like pg_trgm: shared trigrams over all distinct trigrams of the two
+    return shared / (query_grams + name_grams - shared)
+
+
+def match_class(query: str, name: str) -> int:
+    if name == query:
+        return EXACT
+    if name.startswith(query):
+        return PREFIX
+    if f" {query}" in name:
+        return WORD_PREFIX
+    return SUBSTRING
+
+
+def rank(query: Optional[str], item: dict):
+    # the order MenuSearchIndex.search() returns item in for query (lower
+    # case), or None when it doesn't match: matches containing the query by
+    # match class, then similar names by similarity, each in name order
+    name = item["name"].lower()
+    if not query:
+        return (0, 0, name, item["id"])
+    if query in name:
+        return (0, match_class(query, name), name, item["id"])
+    query_trigrams, name_trigrams = grams(query, 3), grams(name, 3)
+    if not query_trigrams:
+        return None
+    score = similarity(len(query_trigrams & name_trigrams), len(query_trigrams),
+                       len(name_trigrams))
+    if score < SIMILARITY_THRESHOLD:
+        return None
+    return (1, -score, name, item["id"])
+
+
+class MenuSearchIndex:
+    # One immutable snapshot of the catalog. Items are numbered in name
+    # order, so "by name" is "by position" everywhere below, and the names
+    # starting with a query are one contiguous range of positions.
+
+    def __init__(self, items: list[dict]):
+        self.items = sorted(items, key=lambda item: (item["name"].lower(), item["id"]))
+        self.names = [item["name"].lower() for item in self.items]
+        self.prices = [item["price"] for item in self.items]
+        self.built_at = time.monotonic()
+        # positions by category, in name order and as a set
+        self.categories = defaultdict(list)
+        # positions by name trigram / bigram (2 letter queries)
+        trigrams = defaultdict(list)
+        bigrams = defaultdict(list)
+        self.trigram_counts = []
+        for position, (item, name) in enumerate(zip(self.items, self.names)):
+            self.categories[item["category"]].append(position)
+            name_trigrams = grams(name, 3)
+            self.trigram_counts.append(len(name_trigrams))
+            for gram in name_trigrams:
+                trigrams[gram].append(position)
+            for gram in grams(name, 2):
+                bigrams[gram].append(position)
+        self.category_sets = {category: set(positions)
+                              for category, positions in self.categories.items()}
+        self.trigrams = {gram: set(positions) for gram, positions in trigrams.items()}
+        self.bigrams = {gram: set(positions) for gram, positions in bigrams.items()}
+
+    def prefix_range(self, query: str) -> range:
+        # positions of the names that are query or start with it
+        return range(bisect_left(self.names, query),
+                     bisect_left(self.names, query + "\uffff"))
+
+    def substring_matches(self, query: str) -> set:
+        # positions whose name contains query: intersect the posting sets
+        # (smallest first), then confirm, since grams can match out of order
+        if len(query) >= 3:
+            postings = [self.trigrams.get(gram, set()) for gram in grams(query, 3)]
+        elif len(query) == 2:
+            postings = [self.bigrams.get(query, set())]
+        else:
+            return {position for position, name in enumerate(self.names) if query in name}
+        if len(postings) == 1:
+            return postings[0]
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return {position for position in candidates if query in self.names[position]}
+
+    def similar_matches(self, query: str) -> dict:
+        # position -> similarity, for names sharing enough trigrams with query
+        query_trigrams = grams(query, 3)
+        if not query_trigrams:
+            return {}
+        shared = Counter()
+        for gram in query_trigrams:
+            shared.update(self.trigrams.get(gram, ()))
+        # similarity can't exceed shared / len(query_trigrams): skip the
+        # names that don't share enough to get there
+        min_shared = SIMILARITY_THRESHOLD * len(query_trigrams)
+        scores = {}
+        for position, count in shared.items():
+            if count >= min_shared:
+                score = similarity(count, len(query_trigrams), self.trigram_counts[position])
+                if score >= SIMILARITY_THRESHOLD:
+                    scores[position] = score
+        return scores
+
+    def search(self, query: Optional[str], category: Optional[str],
+               min_price: Optional[float], max_price: Optional[float],
+               limit: int) -> list[dict]:
+        allowed = None if category is None else self.category_sets.get(category, set())
+
+        def keep(position):
+            price = self.prices[position]
+            return (allowed is None or position in allowed) and \
+                (min_price is None or price >= min_price) and \
+                (max_price is None or price <= max_price)
+
+        def first(positions, count):
+            found = []
+            for position in positions:
+                if len(found) == count:
+                    break
+                if keep(position):
+                    found.append(position)
+            return found
+
+        if not query:
+            # filters only: in name order
+            positions = self.categories.get(category, []) if category is not None \
+                else range(len(self.items))
+            return [self.items[position] for position in first(positions, limit)]
+
+        query = query.lower()
+        # exact name and name prefix: already in order
+        prefixed = self.prefix_range(query)
+        ranked = first(prefixed, limit)
+        if len(ranked) < limit:
+            # then the word prefixes and the other substring matches
+            rest = [position for position in self.substring_matches(query)
+                    if position not in prefixed and keep(position)]
+            ranked += heapq.nsmallest(limit - len(ranked), rest, key=lambda position: (
+                match_class(query, self.names[position]), position))
+        if len(ranked) < limit:
+            # still not enough: typos, word order ("chiken tikka")
+            found = set(ranked)
+            similar = {position: score for position, score in self.similar_matches(query).items()
+                       if position not in found and query not in self.names[position]
+                       and keep(position)}
+            ranked += heapq.nsmallest(limit - len(ranked), similar, key=lambda position: (
+                -similar[position], position))
+        return [self.items[position] for position in ranked]
+
+
+class PatchedMenuSearchIndex:
+    # A MenuSearchIndex with the menu writes made since it was built on
+    # top: changes is menu item id -> the item as written, or None when
+    # deleted. A few items, so they are matched one by one.
+
+    def __init__(self, index: MenuSearchIndex, changes: dict):
+        self.index = index
+        self.changes = changes
+
+    def search(self, query: Optional[str], category: Optional[str],
+               min_price: Optional[float], max_price: Optional[float],
+               limit: int) -> list[dict]:
+        # enough from the index that the changed items it still has can be
+        # dropped, then merged with the changed ones that match
+        found = [item for item in self.index.search(query, category, min_price, max_price,
+                                                    limit + len(self.changes))
+                 if item["id"] not in self.changes]
+        found += [item for item in self.changes.values() if item is not None
+                  and (category is None or item["category"] == category)
+                  and (min_price is None or item["price"] >= min_price)
+                  and (max_price is None or item["price"] <= max_price)]
+        query = query.lower() if query else None
+        ranked = [(rank(query, item), item) for item in found]
+        ranked = sorted((key, item) for key, item in ranked if key is not None)
+        return [item for _, item in ranked[:limit]]
+
+
+class MenuSearch:
+    # Holds the current MenuSearchIndex of one location in this process. A
+    # menu write here goes on top of it right away (so the writer finds its
+    # own change) without a rebuild; past MENU_SEARCH_REFRESH_SECONDS, or
+    # MENU_SEARCH_MAX_CHANGES writes, it is rebuilt in the background while
+    # searches keep using the current one. Only the first search waits for
+    # a build.
+
+    def __init__(self, location_id: int):
+        self.location_id = location_id
+        self._index = None
+        # menu item id -> (change number, item or None), since the build
+        self._changes = {}
+        self._changed = 0
+        self._patched = None
+        self._changes_lock = threading.Lock()
+        # one build at a time
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def changed(self, item: dict):
+        # after a create or update; a copy, the caller's dict may change
+        self._apply(item["id"], dict(item))
+
+    def removed(self, item_id: int):
+        self._apply(item_id, None)
+
+    def _apply(self, item_id: int, item: Optional[dict]):
+        with self._changes_lock:
+            if self._index is None and not self._lock.locked():
+                # no index yet: the first search reads the write anyway
+                return
+            self._changed += 1
+            self._changes[item_id] = (self._changed, item)
+            self._patched = None
+            too_many = len(self._changes) > MENU_SEARCH_MAX_CHANGES
+        if too_many:
+            self._start_refresh()
+
+    def build(self, session: Session):
+        changed = self._changed
+        started = time.perf_counter()
+        index = MenuSearchIndex(fetch_rows(session, MenuItem, MenuItemRead))
+        with self._changes_lock:
+            self._index = index
+            # writes made after the build started stay on top of it
+            self._changes = {item_id: change for item_id, change in self._changes.items()
+                             if change[0] > changed}
+            self._patched = None
+        logger.info(f"Menu search - indexed {len(index.items)} menu items in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+
+    def index(self, session: Session):
+        # the MenuSearchIndex, or a PatchedMenuSearchIndex over it
+        if self._index is None:
+            with self._lock:
+                # unless another request built it while we waited
+                if self._index is None:
+                    self.build(session)
+        elif time.monotonic() - self._index.built_at >= MENU_SEARCH_REFRESH_SECONDS:
+            self._start_refresh()
+        with self._changes_lock:
+            if not self._changes:
+                return self._index
+            if self._patched is None:
+                self._patched = PatchedMenuSearchIndex(
+                    self._index, {item_id: item for item_id, (_, item) in self._changes.items()})
+            return self._patched
+
+    def _start_refresh(self):
+        with self._changes_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="menu-search-refresh",
+                         daemon=True).start()
+
+    def refresh(self):
+        # a thread of its own: only this location's menu items
+        token = current_location.set(self.location_id)
+        try:
+            with self._lock, Session(engine_for(self.location_id)) as session:
+                self.build(session)
+        except Exception as e:
+            logger.error(f"Menu search - failed to refresh the index of location "
+                         f"{self.location_id}: {str(e)}")
+        finally:
+            self._refreshing = False
+            current_location.reset(token)
+
+
+menu_searches = {}
+_menu_searches_lock = threading.Lock()
+
+
+def menu_search_for(location_id: int = None) -> MenuSearch:
+    # the request's location by default
+    if location_id is None:
+        location_id = current_location_id()
+    search = menu_searches.get(location_id)
+    if search is None:
+        with _menu_searches_lock:
+            search = menu_searches.setdefault(location_id, MenuSearch(location_id))
+    return search
+
+
+def use_database(session: Session) -> bool:
+    if MENU_SEARCH_BACKEND == "auto":
+        return session.get_bind().dialect.name == "postgresql"
+    return MENU_SEARCH_BACKEND == "database"
+
+
+def search_database(session: Session, query: Optional[str], category: Optional[str],
+                    min_price: Optional[float], max_price: Optional[float],
+                    limit: int) -> list[dict]:
+    # Same matching and order as MenuSearchIndex, in SQL. Both the ILIKE
+    # style substring test and pg_trgm's % (similarity) operator use the
+    # trigram index on lower(name).
+    name = func.lower(MenuItem.name)
+    where = []
+    order_by = []
+    if category is not None:
+        where.append(MenuItem.category == category)
+    if min_price is not None:
+        where.append(MenuItem.price >= min_price)
+    if max_price is not None:
+        where.append(MenuItem.price <= max_price)
+    if query:
+        query = query.lower()
+        contains = name.contains(query, autoescape=True)
+        where.append(or_(contains, name.op("%")(query)))
+        order_by += [
+            case((name == query, EXACT),
+                 (name.startswith(query, autoescape=True), PREFIX),
+                 (name.contains(f" {query}", autoescape=True), WORD_PREFIX),
+                 (contains, SUBSTRING),
+                 else_=SUBSTRING + 1),
+            # the similar (not containing) names: most similar first
+            case((contains, 0), else_=func.similarity(name, query)).desc(),
+        ]
+    order_by += [name, MenuItem.id]
+    return fetch_rows(session, MenuItem, MenuItemRead, *where,
+                      order_by=order_by, limit=limit)
+
+
+def search_menu(session: Session, query: Optional[str] = None,
+                category: Optional[str] = None, min_price: Optional[float] = None,
+                max_price: Optional[float] = None, limit: int = 20) -> list[dict]:
+    # MenuItemRead-shaped dicts, best matches first
+    if use_database(session):
+        return search_database(session, query, category, min_price, max_price, limit)
+    return menu_search_for().index(session).search(query, category, min_price, max_price, limit)
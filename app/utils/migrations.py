@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+# alembic.ini sits in the repo root, next to main.py
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def alembic_config(database_url=None) -> Config:
+    config = Config(str(ALEMBIC_INI))
+    if database_url:
+        # read by migrations/env.py instead of DATABASE_URL
+        config.set_main_option("sqlalchemy.url", database_url)
+    return config
+
+
+def upgrade_database(database_url=None, revision: str = "head"):
+    # `alembic upgrade head` from code (seed script, tests)
+    command.upgrade(alembic_config(database_url), revision)
+
+
+def migration_status(engine):
+    # (revision the database is at, latest revision in migrations/versions)
+    script = ScriptDirectory.from_config(alembic_config())
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    return current, script.get_current_head()
+
+
+def ensure_schema_is_current(engine):
+    # The app no longer creates tables itself. Raises when the database
+    # hasn't been migrated to the latest revision: the warm-up
+    # (app/utils/warmup.py) keeps retrying, and /health/ready answers 503
+    # until it is. The app itself starts and serves either way.
+    current, head = migration_status(engine)
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            "Run `alembic upgrade head` first.")
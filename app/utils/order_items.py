@@ -0,0 +1,89 @@
+from collections import defaultdict
+
+from sqlmodel import Session, delete, func, insert, select, update
+
+from app.models import MenuItem, Order, OrderItem
+
+
+def menu_item_prices(session: Session, menu_item_ids) -> dict:
+    # current menu price by id, one query: the unit_price of new items
+    return dict(session.exec(
+        select(MenuItem.id, MenuItem.price)
+        .where(MenuItem.id.in_(set(menu_item_ids)))
+    ).all())
+
+
+def new_item(order_id: int, menu_item_id: int, quantity: int, prices: dict) -> dict:
+    # an order_items row with the price snapshot, for insert(OrderItem)
+    unit_price = prices[menu_item_id]
+    return {"order_id": order_id, "menu_item_id": menu_item_id,
+            "quantity": quantity, "unit_price": unit_price,
+            "line_total": quantity * unit_price}
+
+
+def refresh_order_total(session: Session, order_id: int) -> float:
+    # Recomputes orders.order_total from the stored line totals, after the
+    # items changed (one UPDATE ... RETURNING, no join). Returns it.
+    return session.exec(
+        update(Order)
+        .where(Order.id == order_id)
+        .values(order_total=select(func.coalesce(func.sum(OrderItem.line_total), 0))
+                .where(OrderItem.order_id == order_id)
+                .scalar_subquery())
+        .returning(Order.order_total)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def diff_order_items(order_id: int, existing, requested, prices: dict):
+    # Pairs the requested items with the existing rows of the same menu
+    # item (in id order), so unchanged lines keep their row, id and price
+    # snapshot; new lines get the current price from `prices`.
+    # Returns (inserts, updates, delete_ids) ready for apply_item_changes().
+    rows_by_menu_item = defaultdict(list)
+    for row in existing:
+        rows_by_menu_item[row.menu_item_id].append(row)
+
+    inserts, updates = [], []
+    for item in requested:
+        rows = rows_by_menu_item.get(item.menu_item_id)
+        if rows:
+            row = rows.pop(0)
+            if row.quantity != item.quantity:
+                updates.append({"id": row.id, "quantity": item.quantity,
+                                "line_total": item.quantity * row.unit_price})
+        else:
+            inserts.append(new_item(order_id, item.menu_item_id,
+                                    item.quantity, prices))
+    delete_ids = [row.id for rows in rows_by_menu_item.values() for row in rows]
+    return inserts, updates, delete_ids
+
+
+def apply_item_changes(session: Session, inserts, updates, delete_ids):
+    # At most three batched statements, no commit: the caller owns the
+    # transaction
+    if delete_ids:
+        session.exec(delete(OrderItem).where(OrderItem.id.in_(delete_ids)))
+    if updates:
+        # executemany UPDATE ... WHERE id = ? (ORM bulk update by primary key)
+        session.exec(update(OrderItem), params=updates)
+    if inserts:
+        session.exec(insert(OrderItem), params=inserts)
+
+
+def replace_order_items(session: Session, order_id: int, requested):
+    # Makes the order's items match the requested list, touching only the
+    # rows that change, then refreshes the order's total. Returns how many
+    # rows were inserted/updated/deleted.
+    existing = session.exec(
+        select(OrderItem.id, OrderItem.menu_item_id, OrderItem.quantity,
+               OrderItem.unit_price)
+        .where(OrderItem.order_id == order_id)
+        .order_by(OrderItem.id)
+    ).all()
+    prices = menu_item_prices(session, [item.menu_item_id for item in requested])
+    inserts, updates, delete_ids = diff_order_items(
+        order_id, existing, requested, prices)
+    apply_item_changes(session, inserts, updates, delete_ids)
+    refresh_order_total(session, order_id)
+    return len(inserts), len(updates), len(delete_ids)
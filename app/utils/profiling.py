@@ -0,0 +1,219 @@
+import asyncio
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+from app.utils.logger import logger
+
+# Opt-in per-request profiling. Nothing is installed unless one of these is set:
+#   PROFILING_TOKEN        requests sending "X-Profile-Token: <token>" (or
+#                          ?profile_token=<token>) are profiled
+#   PROFILING_SAMPLE_RATE  fraction (0-1) of all requests that are profiled
+# Reports go to PROFILING_DIR. A profiled request that also sends
+# "X-Profile-Response: report" gets the JSON report instead of its response.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+# seconds between two stack samples
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+
+# stdlib functions a thread sits in while it has nothing to do
+IDLE_FUNCTIONS = {"wait", "select", "poll", "get", "_worker", "run_forever"}
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILING_TOKEN) or PROFILING_SAMPLE_RATE > 0
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    # Samples the Python stacks of every busy thread, so sync routes running
+    # in the threadpool show up too (cProfile only sees the event loop thread)
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or self._idle(frame):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    @staticmethod
+    def _idle(frame) -> bool:
+        filename = frame.f_code.co_filename
+        return frame.f_code.co_name in IDLE_FUNCTIONS and (
+            filename.endswith(("threading.py", "queue.py", "selectors.py",
+                               "thread.py", "base_events.py")))
+
+
+class RequestProfiler:
+    # cProfile + stack sampling + tracemalloc around one request
+
+    def __init__(self, interval: float = PROFILING_INTERVAL):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.started_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.started_tracemalloc = True
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sampler.stop()
+        self.elapsed = time.perf_counter() - self.started
+        self.snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+    def report(self, request_line: str, top: int = 25) -> dict:
+        stats = pstats.Stats(self.profile)
+        functions = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in sorted(
+                stats.stats.items(), key=lambda s: s[1][3], reverse=True)[:top]:
+            functions.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "total_s": round(tottime, 6),
+                "cumulative_s": round(cumtime, 6),
+            })
+        allocations = [
+            {"location": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1),
+             "count": stat.count}
+            for stat in self.snapshot.statistics("lineno")[:top]
+        ]
+        return {
+            "request": request_line,
+            "elapsed_s": round(self.elapsed, 6),
+            "samples": self.sampler.samples,
+            "top_functions": functions,
+            "top_allocations": allocations,
+            "stacks": dict(self.sampler.stacks.most_common(top)),
+        }
+
+    def save(self, directory: str, name: str, report: dict):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+        # pstats: open with `python -m pstats` or snakeviz
+        self.profile.dump_stats(base + ".pstats")
+        # collapsed stacks: feed to flamegraph.pl or speedscope
+        with open(base + ".collapsed", "w") as f:
+            for stack, count in self.sampler.stacks.items():
+                f.write(f"{stack} {count}\n")
+        with open(base + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+
+
+class ProfilingMiddleware:
+    # ASGI middleware; main.py only adds it when profiling_enabled()
+
+    def __init__(self, app, token=PROFILING_TOKEN,
+                 sample_rate=PROFILING_SAMPLE_RATE, output_dir=PROFILING_DIR):
+        self.app = app
+        self.token = token
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        # cProfile and tracemalloc are process wide: one profile at a time
+        self._busy = threading.Lock()
+
+    def _authorized(self, scope) -> bool:
+        if not self.token:
+            return False
+        supplied = dict(scope["headers"]).get(b"x-profile-token", b"").decode()
+        if not supplied:
+            query = parse_qs(scope.get("query_string", b"").decode())
+            supplied = query.get("profile_token", [""])[0]
+        return bool(supplied) and hmac.compare_digest(supplied, self.token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        on_demand = self._authorized(scope)
+        sampled = not on_demand and self.sample_rate > 0 and \
+            random.random() < self.sample_rate
+        if not (on_demand or sampled) or not self._busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        try:
+            await self._profile(scope, receive, send, on_demand)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send, on_demand):
+        request_line = f"{scope['method']} {scope['path']}"
+        name = "{}-{}-{}".format(
+            time.strftime("%Y%m%d-%H%M%S"),
+            scope["path"].strip("/").replace("/", "_") or "root",
+            uuid.uuid4().hex[:8])
+        inline = on_demand and dict(scope["headers"]).get(
+            b"x-profile-response") == b"report"
+
+        async def send_wrapper(message):
+            if inline:
+                # the report replaces the real response
+                return
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-report", name.encode())]
+            await send(message)
+
+        profiler = RequestProfiler()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            report = profiler.report(request_line)
+            await asyncio.to_thread(profiler.save, self.output_dir, name, report)
+            logger.info(f"Profiled {request_line} in {profiler.elapsed:.3f}s "
+                        f"-> {os.path.join(self.output_dir, name)}")
+
+        if inline:
+            body = json.dumps(report).encode()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode()),
+                                    (b"x-profile-report", name.encode())]})
+            await send({"type": "http.response.body", "body": body})
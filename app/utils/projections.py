@@ -0,0 +1,220 @@
+from sqlalchemy import select as select_rows
+from sqlmodel import Session, select
+
+from app.models import MenuItem, Order, OrderArchive, OrderItem, OrderItemArchive, OrderRead
+from app.models.orders import ACTIVE_ORDERS, ACTIVE_STATUSES
+
+# Read-only queries that select just the columns a *Read schema needs and
+# return plain dicts. Nothing enters the session's identity map, and since
+# the column types already match the schema, rows_response() dumps the dicts
+# without validating them again.
+
+# order ids per IN (...) query when loading order items
+ITEMS_CHUNK_SIZE = 5000
+
+# the items table of each orders table
+ITEM_MODELS = {Order: OrderItem, OrderArchive: OrderItemArchive}
+
+
+def read_columns(model, schema, fields=None):
+    # the model's columns that appear in the response schema, in schema
+    # order; only the requested ones when given fields (?fields=)
+    table_columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields
+            if name in table_columns and (fields is None or name in fields)]
+
+
+def as_dicts(result) -> list[dict]:
+    # zip over the keys once: much cheaper than Row._mapping per row
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+def fetch_rows(session: Session, model, schema, *where,
+               order_by=None, limit=None, fields=None) -> list[dict]:
+    # SQLAlchemy's select: SQLModel's returns bare values, not rows, when
+    # only one column is selected (?fields=id)
+    statement = select_rows(*read_columns(model, schema, fields)).where(*where)
+    if order_by is not None:
+        statement = statement.order_by(*order_by)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return as_dicts(session.exec(statement))
+
+
+def fetch_row(session: Session, model, schema, row_id: int, fields=None):
+    rows = fetch_rows(session, model, schema, model.id == row_id, fields=fields)
+    return rows[0] if rows else None
+
+
+def in_request_order(rows: list[dict], ids) -> tuple[list[dict], list[int]]:
+    # For batch reads: the rows in the order of the requested ids (each id
+    # once), and the ids no row was found for
+    by_id = {row["id"]: row for row in rows}
+    found, missing = [], []
+    for row_id in dict.fromkeys(ids):
+        if row_id in by_id:
+            found.append(by_id[row_id])
+        else:
+            missing.append(row_id)
+    return found, missing
+
+
+def fetch_rows_by_ids(session: Session, model, schema, ids, fields=None):
+    # one IN (...) query; returns (rows, missing ids)
+    rows = fetch_rows(session, model, schema, model.id.in_(set(ids)),
+                      fields=fields)
+    return in_request_order(rows, ids)
+
+
+def attach_order_items(session: Session, orders: list[dict],
+                       item_model=OrderItem) -> list[dict]:
+    # Fills orders[...]["items"] with one query per chunk of orders,
+    # joining the menu item name and price for MenuItemNested
+    # (item_model=OrderItemArchive for archived orders)
+    by_id = {order["id"]: order for order in orders}
+    for order in orders:
+        order["items"] = []
+    order_ids = list(by_id)
+    for start in range(0, len(order_ids), ITEMS_CHUNK_SIZE):
+        rows = session.exec(
+            select(item_model.id, item_model.order_id, item_model.menu_item_id,
+                   item_model.quantity, item_model.unit_price, item_model.line_total,
+                   MenuItem.name, MenuItem.price)
+            .join(MenuItem, MenuItem.id == item_model.menu_item_id)
+            .where(item_model.order_id.in_(
+                order_ids[start:start + ITEMS_CHUNK_SIZE]))
+            .order_by(item_model.id)
+        ).all()
+        for row in rows:
+            by_id[row.order_id]["items"].append({
+                "id": row.id,
+                "menu_item_id": row.menu_item_id,
+                "quantity": row.quantity,
+                "unit_price": row.unit_price,
+                "line_total": row.line_total,
+                "menu_item": {"id": row.menu_item_id, "name": row.name,
+                              "price": row.price},
+            })
+    return orders
+
+
+def fetch_orders(session: Session, *where, order_by=None,
+                 limit=None, fields=None, items=True, model=Order) -> list[dict]:
+    # OrderRead-shaped dicts, items included, in two queries; with fields
+    # and/or items=False (see app/utils/fieldsets.py) only what was asked for
+    # (model=OrderArchive reads the archive tables)
+    orders = fetch_rows(session, model, OrderRead, *where,
+                        order_by=order_by if order_by is not None else [model.id],
+                        limit=limit, fields=fields)
+    if not items:
+        return orders
+    return attach_order_items(session, orders, item_model=ITEM_MODELS[model])
+
+
+def fetch_order(session: Session, order_id: int, fields=None, items=True):
+    orders = fetch_orders(session, Order.id == order_id, fields=fields, items=items)
+    return orders[0] if orders else None
+
+
+def fetch_archived_orders(session: Session, ids, fields=None, items=True) -> list[dict]:
+    # OrderRead-shaped dicts of archived orders (app/utils/archive.py)
+    return fetch_orders(session, OrderArchive.id.in_(set(ids)), fields=fields,
+                        items=items, model=OrderArchive)
+
+
+def fetch_orders_by_ids(session: Session, ids, *where, fields=None, items=True):
+    # like fetch_rows_by_ids(), items attached with one more query; ids not
+    # found are looked up in the archive (unless filtered: the filters are
+    # for live orders)
+    orders = fetch_orders(session, Order.id.in_(set(ids)), *where,
+                          fields=fields, items=items)
+    found, missing = in_request_order(orders, ids)
+    if missing and not where:
+        orders += fetch_archived_orders(session, missing, fields=fields, items=items)
+        found, missing = in_request_order(orders, ids)
+    return found, missing
+
+
+def order_filters(status=None, customer_id=None, created_from=None,
+                  created_to=None, menu_item_id=None, model=Order) -> list:
+    # WHERE clauses for the list filters; each one is backed by an index
+    # (see migrations/versions/755e31e069f0_order_filter_indexes.py);
+    # model=OrderArchive gives the same filters for the archive tables
+    item_model = ITEM_MODELS[model]
+    where = []
+    if status:
+        # ?status=Pending&status=Preparing or ?status=Pending,Preparing
+        statuses = sorted({s.strip() for value in status
+                           for s in value.split(",") if s.strip()})
+        if statuses == sorted(ACTIVE_STATUSES):
+            # the partial index's own predicate, with literals instead of
+            # bound parameters, so the planner can match ix_orders_active
+            where.append(ACTIVE_ORDERS)
+        else:
+            where.append(model.status.in_(statuses))
+    if customer_id is not None:
+        where.append(model.customer_id == customer_id)
+    if created_from is not None:
+        where.append(model.created_at >= created_from)
+    if created_to is not None:
+        where.append(model.created_at < created_to)
+    if menu_item_id is not None:
+        # IN (subquery) rather than a correlated EXISTS: both are a semi
+        # join on PostgreSQL, and SQLite can then start from the index
+        # instead of checking every order
+        where.append(model.id.in_(
+            select(item_model.order_id)
+            .where(item_model.menu_item_id == menu_item_id)))
+    return where
+
+
+def fetch_order_page(session: Session, *where, order: str = "asc",
+                     limit=None, cursor=None, fields=None, items=True, model=Order):
+    # Keyset paging by id (ids are handed out in creation order, so this is
+    # also created_at order). The id is unique, so pages never skip or
+    # repeat rows. Returns the orders and the cursor of the next page, or
+    # None on the last one. Without a limit every match is returned.
+    where = list(where)
+    if cursor is not None:
+        where.append(model.id > cursor if order == "asc" else model.id < cursor)
+    order_by = [model.id.asc() if order == "asc" else model.id.desc()]
+
+    # one extra row tells us whether there is a next page
+    orders = fetch_orders(session, *where, order_by=order_by,
+                          limit=limit + 1 if limit else None,
+                          fields=fields, items=items, model=model)
+    if limit and len(orders) > limit:
+        orders = orders[:limit]
+        return orders, orders[-1]["id"]
+    return orders, None
+
+
+def fetch_order_history(session: Session, status=None, customer_id=None,
+                        created_from=None, created_to=None, order: str = "asc",
+                        limit=None, cursor=None, fields=None, items=True):
+    # Like fetch_order_page() over the live and the archived orders
+    # together (the archive keeps the ids, so the cursor works for both):
+    # a page from each table, merged by id. Items are loaded only for the
+    # orders that make the page.
+    pages = {}
+    more = False
+    for model in (Order, OrderArchive):
+        where = order_filters(status, customer_id, created_from, created_to, model=model)
+        pages[model], next_cursor = fetch_order_page(
+            session, *where, order=order, limit=limit, cursor=cursor,
+            fields=fields, items=False, model=model)
+        more = more or next_cursor is not None
+
+    orders = sorted(pages[Order] + pages[OrderArchive], key=lambda o: o["id"],
+                    reverse=order == "desc")
+    next_cursor = None
+    if limit and (more or len(orders) > limit):
+        orders = orders[:limit]
+        next_cursor = orders[-1]["id"]
+    if items:
+        archived = {o["id"] for o in pages[OrderArchive]}
+        attach_order_items(session, [o for o in orders if o["id"] not in archived])
+        attach_order_items(session, [o for o in orders if o["id"] in archived],
+                           item_model=OrderItemArchive)
+    return orders, next_cursor
@@ -0,0 +1,60 @@
+import math
+import os
+import time
+
+from starlette.requests import cookie_parser
+
+from app.database import prefer_primary
+
+# After a successful write, the client's reads go to the primary for this
+# many seconds, so it never reads its own write from a lagging replica
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# holds the end of the window, as a unix timestamp
+STICKY_COOKIE = "primary_until"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# POST only because the ids don't fit in a query string: reads
+READ_POSTS = ("/batch-get",)
+
+
+class ReadYourWritesMiddleware:
+    # Pure ASGI middleware, installed only when read replicas are configured
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        if scope["method"] in WRITE_METHODS and \
+                not scope["path"].endswith(READ_POSTS):
+            async def send_with_cookie(message):
+                if message["type"] == "http.response.start" and \
+                        message["status"] < 400:
+                    until = time.time() + READ_YOUR_WRITES_SECONDS
+                    cookie = (f"{STICKY_COOKIE}={until:.3f}; "
+                              f"Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                              "Path=/; HttpOnly; SameSite=Lax")
+                    message = {**message, "headers": [
+                        *message.get("headers", []),
+                        (b"set-cookie", cookie.encode("latin-1"))]}
+                await send(message)
+            return await self.app(scope, receive, send_with_cookie)
+
+        # reads: the primary while the client's window is open
+        token = prefer_primary.set(sticky_until(scope) > time.time())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            prefer_primary.reset(token)
+
+
+def sticky_until(scope) -> float:
+    for name, value in scope.get("headers", []):
+        if name == b"cookie":
+            try:
+                return float(cookie_parser(value.decode("latin-1"))
+                             .get(STICKY_COOKIE, 0))
+            except ValueError:
+                return 0.0
+    return 0.0
@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+# One TypeAdapter per response schema (e.g. List[OrderRead]), built on first use
+@lru_cache(maxsize=None)
+def get_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def serialize(schema: Any, data: Any) -> bytes:
+    # Reads the ORM objects (or row mappings) into the *Read schema once and
+    # dumps them straight to JSON bytes in pydantic-core, skipping FastAPI's
+    # response_model validation + jsonable_encoder + json.dumps passes
+    adapter = get_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def model_response(schema: Any, data: Any, status_code: int = 200) -> Response:
+    # Routes keep response_model=... for the OpenAPI docs; returning a
+    # Response makes FastAPI send it as-is
+    return Response(content=serialize(schema, data), status_code=status_code,
+                    media_type="application/json")
+
+
+def rows_response(data: Any, status_code: int = 200,
+                  next_cursor: Any = None) -> Response:
+    # For dicts built by app/utils/projections.py, already shaped and typed
+    # like the *Read schema: straight to orjson, no validation at all.
+    # Paged lists pass the next page's cursor, sent as X-Next-Cursor.
+    headers = None
+    if next_cursor is not None:
+        headers = {"X-Next-Cursor": str(next_cursor)}
+    return Response(content=orjson.dumps(data), status_code=status_code,
+                    media_type="application/json", headers=headers)
@@ -0,0 +1,277 @@
+import asyncio
+import os
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+from app.models import MenuItem
+from app.utils.locations import current_location_id
+from app.utils.logger import logger
+
+# Sold-out checks without locking menu_items rows. The live count of every
+# menu item that tracks its stock (MenuItem.stock_quantity is not NULL) is a
+# Redis counter, stock:{location_id}:{id}. POST /orders/ reserves all of an order's lines
+# in one atomic Lua script; deleting or editing an order releases what it
+# no longer needs. The worker copies the counters back to
+# menu_items.stock_quantity every minute (reconcile()), and a missing
+# counter (e.g. Redis restarted) starts again from that column. A Cancelled
+# order holds no stock: cancelling gives it back, reopening reserves it
+# again.
+STOCK_KEY_PREFIX = os.getenv("STOCK_KEY_PREFIX", "stock:")
+# seconds a route waits for Redis before giving up
+STOCK_TIMEOUT = float(os.getenv("STOCK_TIMEOUT", "1"))
+
+# KEYS: the counters; ARGV: the quantities, then the stock to start a
+# missing counter from. Takes all or nothing: returns 0 when every line was
+# reserved, else the (1 based) index of the first line that is short.
+RESERVE_SCRIPT = """
+local count = #KEYS
+for i = 1, count do
+    local value = redis.call('GET', KEYS[i])
+    if not value then
+        value = ARGV[count + i]
+        redis.call('SET', KEYS[i], value)
+    end
+    if tonumber(value) < tonumber(ARGV[i]) then
+        return i
+    end
+end
+for i = 1, count do
+    redis.call('DECRBY', KEYS[i], ARGV[i])
+end
+return 0
+"""
+
+# KEYS: the counters; ARGV: the quantities to give back. A missing counter
+# is left alone: it will start again from the database.
+RELEASE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('INCRBY', KEYS[i], ARGV[i])
+    end
+end
+return 0
+"""
+
+
+def stock_key(location_id: int, menu_item_id: int) -> str:
+    # menu item ids are only unique per database (see LOCATION_SHARDS)
+    return f"{STOCK_KEY_PREFIX}{location_id}:{menu_item_id}"
+
+
+def order_lines(items) -> dict:
+    # menu_item_id -> total quantity (an order can list an item twice)
+    lines = {}
+    for item in items:
+        lines[item.menu_item_id] = lines.get(item.menu_item_id, 0) + item.quantity
+    return lines
+
+
+def held_lines(status: str, lines: dict) -> dict:
+    # what an order with these lines keeps reserved
+    return {} if status == "Cancelled" else lines
+
+
+def tracked_items(session: Session, ids) -> dict:
+    # menu_item_id -> stock_quantity, for the ones that track their stock
+    if not ids:
+        return {}
+    return dict(session.exec(
+        select(MenuItem.id, MenuItem.stock_quantity)
+        .where(MenuItem.id.in_(set(ids)), MenuItem.stock_quantity.is_not(None))).all())
+
+
+def tracked_lines(lines: dict, stock: dict) -> dict:
+    return {menu_item_id: quantity for menu_item_id, quantity in lines.items()
+            if quantity > 0 and stock.get(menu_item_id) is not None}
+
+
+def line_changes(old: dict, new: dict):
+    # (more, less): what an edit from old to new lines needs to reserve,
+    # and what it gives back
+    more = {menu_item_id: quantity - old.get(menu_item_id, 0)
+            for menu_item_id, quantity in new.items() if quantity > old.get(menu_item_id, 0)}
+    less = {menu_item_id: quantity - new.get(menu_item_id, 0)
+            for menu_item_id, quantity in old.items() if quantity > new.get(menu_item_id, 0)}
+    return more, less
+
+
+# async versions: for the worker, and anything with its own Redis client
+
+async def reserve(redis, location_id: int, lines: dict, stock: dict) -> Optional[int]:
+    # lines: menu_item_id -> quantity, stock: menu_item_id -> stock_quantity
+    # (where a missing counter starts). Returns None when all were reserved,
+    # else the menu item that is short.
+    if not lines:
+        return None
+    ids = sorted(lines)
+    short = await redis.eval(
+        RESERVE_SCRIPT, len(ids),
+        *[stock_key(location_id, menu_item_id) for menu_item_id in ids],
+        *[lines[menu_item_id] for menu_item_id in ids],
+        *[stock[menu_item_id] for menu_item_id in ids])
+    return ids[int(short) - 1] if int(short) else None
+
+
+async def release(redis, location_id: int, lines: dict):
+    if not lines:
+        return
+    ids = sorted(lines)
+    await redis.eval(RELEASE_SCRIPT, len(ids),
+                     *[stock_key(location_id, menu_item_id) for menu_item_id in ids],
+                     *[lines[menu_item_id] for menu_item_id in ids])
+
+
+async def set_stock(redis, location_id: int, menu_item_id: int, quantity: Optional[int]):
+    if quantity is None:
+        await redis.delete(stock_key(location_id, menu_item_id))
+    else:
+        await redis.set(stock_key(location_id, menu_item_id), quantity)
+
+
+async def live_stock(redis, keys) -> dict:
+    # (location_id, menu_item_id) -> counter, for the keys that have one
+    keys = list(keys)
+    if not keys:
+        return {}
+    values = await redis.mget([stock_key(*key) for key in keys])
+    return {key: int(value) for key, value in zip(keys, values) if value is not None}
+
+
+def load_stock(db_engine) -> dict:
+    # (location_id, menu_item_id) -> stock_quantity, for every item of every
+    # location in this database that tracks its stock
+    with Session(db_engine) as session:
+        rows = session.exec(
+            select(MenuItem.location_id, MenuItem.id, MenuItem.stock_quantity)
+            .where(MenuItem.stock_quantity.is_not(None))).all()
+    return {(location_id, menu_item_id): quantity for location_id, menu_item_id, quantity in rows}
+
+
+def save_stock(db_engine, changed: dict):
+    # one executemany; only while still tracked (not reset to NULL by
+    # PUT /menu/{id}/stock in the meantime)
+    with Session(db_engine) as session:
+        session.connection().execute(
+            update(MenuItem.__table__)
+            .where(MenuItem.id == bindparam("item_id"), MenuItem.stock_quantity.is_not(None))
+            .values(stock_quantity=bindparam("quantity")),
+            [{"item_id": menu_item_id, "quantity": quantity}
+             for (_, menu_item_id), quantity in changed.items()])
+        session.commit()
+
+
+async def reconcile(redis, db_engine) -> int:
+    # Copies the counters to menu_items.stock_quantity, and starts the
+    # missing ones from it. Returns how many rows were updated.
+    stock = await asyncio.to_thread(load_stock, db_engine)
+    if not stock:
+        return 0
+    live = await live_stock(redis, stock)
+    for key in stock.keys() - live.keys():
+        # nx: a reservation may have started it in the meantime
+        await redis.set(stock_key(*key), stock[key], nx=True)
+    changed = {key: quantity for key, quantity in live.items() if stock[key] != quantity}
+    if changed:
+        await asyncio.to_thread(save_stock, db_engine, changed)
+    return len(changed)
+
+
+# sync versions, for the routes: run on the warm Redis pool's event loop,
+# for the request's location
+
+def run_on_pool(make_coro, action: str):
+    # raises 503 when Redis can't be reached in time
+    from app.tasks.enqueue import submit_to_pool
+
+    future = submit_to_pool(make_coro)
+    if future is None:
+        logger.error(f"Stock - can't {action}: Redis is not connected")
+        raise HTTPException(status_code=503, detail="Stock counters unavailable, retry later")
+    try:
+        return future.result(timeout=STOCK_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Stock - can't {action}: {str(e)}")
+        raise HTTPException(status_code=503, detail="Stock counters unavailable, retry later")
+
+
+def reserve_stock(lines: dict, stock: dict):
+    # 409 naming the first sold out item; nothing is reserved then
+    lines = tracked_lines(lines, stock)
+    if not lines:
+        return
+    location_id = current_location_id()
+    short = run_on_pool(lambda redis: reserve(redis, location_id, lines, stock),
+                        "reserve stock")
+    if short is not None:
+        logger.warning(f"Stock - menu item {short} is sold out")
+        raise HTTPException(status_code=409,
+                            detail=f"Menu item {short} is sold out or not enough left")
+
+
+@contextmanager
+def reserved_stock(lines: dict, stock: dict):
+    # reserves before the write, gives it back if the write fails
+    reserve_stock(lines, stock)
+    try:
+        yield
+    except BaseException:
+        release_stock(lines, stock)
+        raise
+
+
+def release_stock(lines: dict, stock: dict):
+    # after the order change is committed: an error is only logged (the
+    # counter is low until reset), the change itself stands
+    lines = tracked_lines(lines, stock)
+    if not lines:
+        return
+    location_id = current_location_id()
+    try:
+        run_on_pool(lambda redis: release(redis, location_id, lines), "release stock")
+    except HTTPException:
+        logger.error(f"Stock - not released: {lines}")
+
+
+def set_stock_sync(menu_item_id: int, quantity: Optional[int]):
+    location_id = current_location_id()
+    run_on_pool(lambda redis: set_stock(redis, location_id, menu_item_id, quantity),
+                "set stock")
+
+
+def stock_columns(names: Optional[set]) -> Optional[set]:
+    # ?fields=available needs stock_quantity to work it out
+    if names is not None and "available" in names:
+        return names | {"stock_quantity"}
+    return names
+
+
+def attach_stock(items: list[dict], names: Optional[set] = None) -> list[dict]:
+    # Sets the live stock_quantity (one MGET for the tracked items) and
+    # `available` on MenuItemRead-shaped dicts, as far as `names` (the
+    # ?fields=) asks for them. Without Redis the last reconciled count is used.
+    want_stock = names is None or "stock_quantity" in names
+    want_available = names is None or "available" in names
+    if not (want_stock or want_available):
+        return items
+    location_id = current_location_id()
+    tracked = [(location_id, item["id"]) for item in items
+               if item.get("stock_quantity") is not None]
+    live = {}
+    if tracked:
+        try:
+            live = run_on_pool(lambda redis: live_stock(redis, tracked), "read stock")
+        except HTTPException:
+            pass
+    for item in items:
+        quantity = live.get((location_id, item["id"]), item.get("stock_quantity"))
+        if want_stock:
+            item["stock_quantity"] = quantity
+        else:
+            item.pop("stock_quantity", None)
+        if want_available:
+            item["available"] = quantity is None or quantity > 0
+    return items
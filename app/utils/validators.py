@@ -1,68 +1,32 @@
+import re
 from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
-from app.models import MenuItem, Employee, Customer
-from typing import Optional
-
-
-def check_menuitem_unique_name(
-    session: Session,
-        name: str,
-        item_id: Optional[int] = None
-):
-    query = select(MenuItem).where(MenuItem.name == name)
-    if item_id is not None:
-        query = query.where(MenuItem.id != item_id)
-
-    existing = session.exec(query).first()
-    if existing:
-        raise HTTPException(
-            status_code=400, detail="Menu item with this name already exists")
-
-
-def check_employee_unique_fields(
-        session: Session,
-        email: Optional[str],
-        phone: Optional[str],
-        emp_id: Optional[int] = None
-):
-    filters = []
-    if email:
-        filters.append(Employee.email == email)
-    if phone:
-        filters.append(Employee.phone == phone)
-
-    if not filters:
-        return  # Nothing to check
-
-    query = select(Employee).where(*filters)
-    if emp_id is not None:
-        query = query.where(Employee.id != emp_id)
-
-    existing = session.exec(query).first()
-    if existing:
-        if existing.email == email:
-            raise HTTPException(
-                status_code=400,
-                detail="Another employee with this email already exists")
-        if existing.phone == phone:
-            raise HTTPException(
-                status_code=400,
-                detail="Another employee with this phone already exists")
-
-
-def check_customer_unique_email(
-    session: Session,
-        email: str,
-        customer_id: Optional[int] = None
-):
-    query = select(Customer).where(Customer.email == email)
-    if customer_id is not None:
-        query = query.where(Customer.id != customer_id)
-
-    existing = session.exec(query).first()
-    if existing:
-        raise HTTPException(
-            status_code=400, detail="Customer with this email already exists")
+from app.models import MenuItem, Customer
+
+# 400 messages for the unique constraints, by table and column
+UNIQUE_MESSAGES = {
+    "menu_items": {"name": "Menu item with this name already exists"},
+    "employees": {"email": "Another employee with this email already exists",
+                  "phone": "Another employee with this phone already exists"},
+    "customers": {"email": "Customer with this email already exists"},
+}
+# the columns in a unique violation: SQLite "UNIQUE constraint failed:
+# table.location_id, table.column", PostgreSQL "Key (location_id, column)=
+# (...) already exists"; the last one is the field (unique per location)
+UNIQUE_COLUMN = re.compile(r"UNIQUE constraint failed: (?:\w+\.\w+, )*\w+\.(\w+)|"
+                           r"Key \((?:\w+, )*(\w+)\)=")
+
+
+def raise_for_integrity_error(error: IntegrityError, table: str):
+    # Maps a unique violation on `table` to its field-specific 400;
+    # anything else is re-raised as is
+    match = UNIQUE_COLUMN.search(str(error.orig))
+    column = match and (match.group(1) or match.group(2))
+    message = UNIQUE_MESSAGES.get(table, {}).get(column)
+    if message is None:
+        raise error
+    raise HTTPException(status_code=400, detail=message)
 
 
 def validate_customer_exists(session: Session, customer_id: int):
@@ -71,9 +35,14 @@ def validate_customer_exists(session: Session, customer_id: int):
         raise HTTPException(status_code=404, detail="Customer not found")
 
 
-def validate_menu_items_exist(session: Session, item_ids: list[int]):
+def validate_menu_items_exist(session: Session, item_ids: list[int]) -> dict:
+    # one query for the whole order instead of one per item; returns
+    # {menu_item_id: stock_quantity} for the stock checks (app/utils/stock.py)
+    found = dict(session.exec(
+        select(MenuItem.id, MenuItem.stock_quantity)
+        .where(MenuItem.id.in_(set(item_ids)))).all())
     for item_id in item_ids:
-        menu_item = session.get(MenuItem, item_id)
-        if not menu_item:
+        if item_id not in found:
             raise HTTPException(
                 status_code=404, detail=f"Menu item {item_id} not found")
+    return found
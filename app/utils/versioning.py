@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.utils.logger import logger
+
+# ETag / If-Match for versioned rows (Order.version), see app/models/orders.py
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def check_if_match(if_match: Optional[str], version: int):
+    # No If-Match header: unconditional write, still protected by the
+    # compare-and-swap. Otherwise one of the listed ETags (or *) must be
+    # the current version.
+    if if_match is None:
+        return
+    tags = {tag.strip().removeprefix("W/") for tag in if_match.split(",")}
+    if "*" not in tags and etag(version) not in tags:
+        raise HTTPException(
+            status_code=412,
+            detail="Order has changed since it was read, reload it and retry",
+            headers={"ETag": etag(version)})
+
+
+def if_match_versions(if_match: Optional[str]):
+    # the versions an If-Match header accepts, None for any (no header or *)
+    if if_match is None:
+        return None
+    tags = [tag.strip().removeprefix("W/") for tag in if_match.split(",")]
+    if "*" in tags:
+        return None
+    return [int(tag.strip('"')) for tag in tags if tag.strip('"').isdigit()]
+
+
+@contextmanager
+def write_conflicts(label: str):
+    # Turns a lost compare-and-swap (another request or the worker updated
+    # the row after we read it) into a 409 instead of a 500
+    try:
+        yield
+    except StaleDataError:
+        logger.warning(f"{label} - Conflicting concurrent update")
+        raise HTTPException(
+            status_code=409,
+            detail="Order was changed by another request, reload it and retry")
@@ -0,0 +1,97 @@
+import asyncio
+
+from app.database import DB_POOL_SIZE, REPLICA_CHECK_SECONDS, all_engines, replicas
+from app.tasks.enqueue import open_pool
+from app.utils.kitchen import follow_kitchen_updates
+from app.utils.logger import logger
+
+# seconds between retries of a failed warm-up step, doubling up to the max
+RETRY_DELAY = 1
+MAX_RETRY_DELAY = 30
+
+
+class Readiness:
+    # What GET /health/ready reports; flipped by warm_up()
+
+    def __init__(self):
+        self.checks = {"schema": False, "database": False, "redis": False,
+                       "kitchen": False}
+        self.errors = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(self.checks.values())
+
+
+readiness = Readiness()
+
+
+def kitchen_loaded(loaded: bool):
+    readiness.checks["kitchen"] = loaded
+
+
+def check_schema():
+    # alembic is imported here, after the app is already serving
+    from app.utils.migrations import ensure_schema_is_current
+
+    # the main database and every location shard
+    for db_engine in all_engines():
+        ensure_schema_is_current(db_engine)
+
+
+def fill_db_pool():
+    # open every pooled connection up front, so the first requests don't
+    # pay for connecting
+    connections = []
+    try:
+        for db_engine in all_engines():
+            for _ in range(DB_POOL_SIZE):
+                connection = db_engine.connect()
+                connection.exec_driver_sql("SELECT 1")
+                connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def run_step(name: str, step):
+    delay = RETRY_DELAY
+    while True:
+        try:
+            result = await step()
+        except Exception as e:
+            readiness.errors[name] = str(e)
+            logger.warning(f"Warm-up - {name} not ready, retrying in "
+                           f"{delay}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+        else:
+            readiness.checks[name] = True
+            readiness.errors.pop(name, None)
+            logger.info(f"Warm-up - {name} ready")
+            return result
+
+
+async def monitor_replicas():
+    # read replica health checks, for as long as the app runs
+    while replicas.engines:
+        await asyncio.to_thread(replicas.check)
+        await asyncio.sleep(REPLICA_CHECK_SECONDS)
+
+
+async def warm_up():
+    # Runs in the background from lifespan: the app serves /health/live
+    # immediately, /health/ready turns 200 once everything here is done.
+    # Replica health checks start right away, independent of the rest.
+    await asyncio.gather(prepare(), monitor_replicas())
+
+
+async def prepare():
+    await run_step("schema", lambda: asyncio.to_thread(check_schema))
+    redis, _ = await asyncio.gather(
+        run_step("redis", open_pool),
+        run_step("database", lambda: asyncio.to_thread(fill_db_pool)),
+    )
+    # loads the kitchen board (the last readiness check), then keeps it in
+    # sync with the other processes for as long as the app runs
+    await follow_kitchen_updates(redis, on_loaded=kitchen_loaded)
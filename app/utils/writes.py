@@ -0,0 +1,48 @@
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, insert, select, update
+
+from app.utils.projections import as_dicts, read_columns
+from app.utils.validators import raise_for_integrity_error
+
+
+def insert_returning(session: Session, model, schema, values: dict) -> dict:
+    # One round trip for POST: INSERT ... RETURNING the *Read schema's
+    # columns (id and server defaults included), then commit. Duplicates
+    # are rejected by the unique constraints, not by a SELECT beforehand,
+    # which also closes the race between two concurrent inserts.
+    statement = insert(model).values(**values).returning(
+        *read_columns(model, schema))
+    try:
+        rows = as_dicts(session.exec(statement))
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        raise_for_integrity_error(e, model.__tablename__)
+    return rows[0]
+
+
+def update_returning(session: Session, model, schema, row_id: int,
+                     values: dict, *where) -> Optional[dict]:
+    # One round trip for PUT/PATCH: UPDATE ... SET ... WHERE id = ?
+    # RETURNING the *Read schema's columns, then commit. No SELECT before
+    # it and no refresh after it; the unique constraints do the checking.
+    # Returns the updated row as a dict, or None when no row matched.
+    columns = read_columns(model, schema)
+    if values:
+        statement = (update(model)
+                     .where(model.id == row_id, *where)
+                     .values(**values)
+                     .returning(*columns)
+                     .execution_options(synchronize_session=False))
+    else:
+        # PATCH with an empty body: nothing to write, just read the row
+        statement = select(*columns).where(model.id == row_id, *where)
+    try:
+        rows = as_dicts(session.exec(statement))
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        raise_for_integrity_error(e, model.__tablename__)
+    return rows[0] if rows else None
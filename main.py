@@ -1,28 +1,60 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-from app.routers import menu, employees, customers, orders, summary
+from app.routers import menu, employees, customers, orders, summary, metrics, health, kitchen
+from app.database import replicas
+from app.tasks.enqueue import close_pool
 from app.utils.logger import logger
-from sqlmodel import SQLModel
-from app.database import engine
-
-
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+from app.utils.profiling import ProfilingMiddleware, profiling_enabled
+from app.utils.read_your_writes import ReadYourWritesMiddleware
+from app.utils.admission import ADMISSION_CONTROL, AdmissionMiddleware
+from app.utils.compression import CompressionMiddleware
+from app.utils.locations import LocationMiddleware
+from app.utils.warmup import warm_up
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
     # Startup
+    # No schema work here: tables come from `alembic upgrade head`. The
+    # schema check, DB pool and Redis warm up in the background and flip
+    # GET /health/ready when done.
+    warmup = asyncio.create_task(warm_up())
     logger.info("FastAPI app is starting...")
     yield
     # Shutdown
+    warmup.cancel()
+    await close_pool()
     logger.info("FastAPI app is shutting down...")
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# orjson for every response that isn't already built by model_response
+
+# gzip/brotli for responses over COMPRESSION_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
+# X-Location-Id: the restaurant every query of the request is scoped to
+app.add_middleware(LocationMiddleware)
+
+# Opt-in request profiling, not installed at all unless configured
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# Reads go to the replicas only when there are any; this keeps a client
+# that just wrote on the primary for a few seconds
+if replicas.engines:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Added last so it runs first: sheds load before any other work is done
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
 
 app.include_router(menu.router)
 app.include_router(employees.router)
 app.include_router(customers.router)
 app.include_router(orders.router)
 app.include_router(summary.router)
+app.include_router(metrics.router)
+app.include_router(health.router)
+app.include_router(kitchen.router)
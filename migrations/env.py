@@ -7,7 +7,7 @@ from alembic import context
 from dotenv import load_dotenv
 
 # Import all models here to register them with SQLModel.metadata
-from app.models import menu, employees, customers, orders, order_items, order_summary
+from app.models import menu, employees, customers, orders, order_items, order_summary, archive
 
 # Load environment variables
 load_dotenv()
@@ -20,7 +20,7 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -48,7 +48,7 @@ def run_migrations_offline() -> None:
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
+    url = config.get_main_option("sqlalchemy.url") or DATABASE_URL
     context.configure(
         url=url,
         target_metadata=target_metadata,
@@ -68,7 +68,9 @@ def run_migrations_online() -> None:
 
     """
     from sqlmodel import create_engine
-    engine = create_engine(DATABASE_URL, echo=True)
+    # sqlalchemy.url is only set when migrations are run from code
+    url = config.get_main_option("sqlalchemy.url") or DATABASE_URL
+    engine = create_engine(url, echo=True)
     with engine.connect() as connection:
         context.configure(
             connection=connection,
@@ -0,0 +1,45 @@
+"""menu search indexes
+
+Revision ID: 0f8ca2d32b4d
+Revises: 1b9ffc89c768
+Create Date: 2026-10-19 02:10:14.295008
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0f8ca2d32b4d'
+down_revision: Union[str, Sequence[str], None] = '1b9ffc89c768'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /menu/search (app/utils/menu_search.py)
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    if is_postgresql:
+        # trigram operators and index support
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # GIN trigram index: name LIKE '%...%' and similarity (%) matches
+        op.create_index('ix_menu_items_name_trgm', 'menu_items',
+                        [sa.text('lower(name) gin_trgm_ops')],
+                        unique=False, postgresql_using='gin')
+    else:
+        # same index as the model declares; search runs in memory here
+        op.create_index('ix_menu_items_name_trgm', 'menu_items',
+                        [sa.text('lower(name)')], unique=False)
+    # menu_items (category, price): ?category= with a price range
+    op.create_index('ix_menu_items_category_price', 'menu_items',
+                    ['category', 'price'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_menu_items_category_price', table_name='menu_items')
+    op.drop_index('ix_menu_items_name_trgm', table_name='menu_items')
+    # pg_trgm is left installed: other database objects may use it
@@ -0,0 +1,78 @@
+"""locations
+
+Revision ID: 122986780a2d
+Revises: ba7c3bf294d4
+Create Date: 2026-10-19 02:18:22.663002
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '122986780a2d'
+down_revision: Union[str, Sequence[str], None] = 'ba7c3bf294d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# unique constraints that become per location: (table, column)
+PER_LOCATION = [('customers', 'email'), ('employees', 'email'),
+                ('employees', 'phone'), ('menu_items', 'name')]
+# names for the unnamed constraints of the initial migration, so batch
+# mode (SQLite) can find them; PostgreSQL named them <table>_<column>_key
+NAMING = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Multi-location (app/utils/locations.py): every row so far belongs to
+    # location 1, and names/emails/phones become unique per location.
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    for table in ('customers', 'employees', 'menu_items', 'orders'):
+        op.add_column(table, sa.Column('location_id', sa.Integer(),
+                                       server_default='1', nullable=False))
+    op.add_column('orders_archive', sa.Column('location_id', sa.Integer(),
+                                              server_default='1', nullable=False))
+    # orders (location_id, id): GET /orders/ of one location, in id order
+    op.create_index('ix_orders_location_id_id', 'orders', ['location_id', 'id'],
+                    unique=False)
+
+    for table in ('customers', 'employees', 'menu_items'):
+        # batch: SQLite can only change constraints by copying the table
+        with op.batch_alter_table(table, naming_convention=NAMING) as batch_op:
+            for uq_table, column in PER_LOCATION:
+                if uq_table != table:
+                    continue
+                old_name = f'{table}_{column}_key' if is_postgresql else f'uq_{table}_{column}'
+                batch_op.drop_constraint(old_name, type_='unique')
+                batch_op.create_unique_constraint(
+                    f'uq_{table}_location_id_{column}', ['location_id', column])
+    if not is_postgresql:
+        # the copy loses expression indexes, which SQLite can't reflect
+        op.create_index('ix_menu_items_name_trgm', 'menu_items',
+                        [sa.text('lower(name)')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    is_postgresql = op.get_bind().dialect.name == "postgresql"
+    for table in ('menu_items', 'employees', 'customers'):
+        with op.batch_alter_table(table, naming_convention=NAMING) as batch_op:
+            for uq_table, column in PER_LOCATION:
+                if uq_table != table:
+                    continue
+                batch_op.drop_constraint(f'uq_{table}_location_id_{column}',
+                                         type_='unique')
+                old_name = f'{table}_{column}_key' if is_postgresql else f'uq_{table}_{column}'
+                batch_op.create_unique_constraint(old_name, [column])
+    if not is_postgresql:
+        # lost with the copy, as in upgrade()
+        op.create_index('ix_menu_items_name_trgm', 'menu_items',
+                        [sa.text('lower(name)')], unique=False)
+    op.drop_index('ix_orders_location_id_id', table_name='orders')
+    op.drop_column('orders_archive', 'location_id')
+    for table in ('orders', 'menu_items', 'employees', 'customers'):
+        op.drop_column(table, 'location_id')
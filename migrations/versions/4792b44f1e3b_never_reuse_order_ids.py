@@ -0,0 +1,59 @@
+"""never reuse order ids
+
+Revision ID: 4792b44f1e3b
+Revises: a28cd09729bd
+Create Date: 2026-10-19 03:10:27.391562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4792b44f1e3b'
+down_revision: Union[str, Sequence[str], None] = 'a28cd09729bd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# live table -> its archive table (app/models/archive.py)
+TABLES = {'orders': 'orders_archive', 'order_items': 'order_items_archive'}
+# partial index predicate, same as app.models.orders.ACTIVE_ORDERS
+ACTIVE_ORDERS = sa.text("status IN ('Pending', 'Preparing')")
+
+
+def rebuild(autoincrement: bool):
+    # SQLite hands out max(id) + 1, so once the newest order is archived its
+    # id comes back, and clashes with the archived row. AUTOINCREMENT
+    # tables count on from sqlite_sequence instead; only a copy of the
+    # table can turn it on or off. PostgreSQL sequences never go back.
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}):
+            pass
+    # the copy loses the WHERE of the partial index
+    op.drop_index('ix_orders_active', table_name='orders')
+    op.create_index('ix_orders_active', 'orders', ['location_id', 'id'], unique=False,
+                    sqlite_where=ACTIVE_ORDERS)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    rebuild(autoincrement=True)
+    # count on from the highest id handed out so far, archived ones included
+    for table, archive in TABLES.items():
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', "
+                   f"max((SELECT coalesce(max(id), 0) FROM {table}), "
+                   f"(SELECT coalesce(max(id), 0) FROM {archive}))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    rebuild(autoincrement=False)
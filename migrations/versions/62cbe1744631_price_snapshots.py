@@ -0,0 +1,54 @@
+"""price snapshots
+
+Revision ID: 62cbe1744631
+Revises: d2d64e9c2732
+Create Date: 2026-10-19 02:03:24.716528
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '62cbe1744631'
+down_revision: Union[str, Sequence[str], None] = 'd2d64e9c2732'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # order_items.unit_price / line_total: the price when the item was
+    # ordered; orders.order_total: the sum of its line totals. All written
+    # by the order routes, so totals are read without joining menu_items.
+    op.add_column('order_items', sa.Column('unit_price', sa.Float(),
+                                           server_default='0', nullable=False))
+    op.add_column('order_items', sa.Column('line_total', sa.Float(),
+                                           server_default='0', nullable=False))
+    op.add_column('orders', sa.Column('order_total', sa.Float(),
+                                      server_default='0', nullable=False))
+
+    # Backfill (plain SQL, works on SQLite and PostgreSQL). The old prices
+    # are gone: existing items get today's menu prices, which is what
+    # every total was computed from until now anyway.
+    op.execute("""
+        UPDATE order_items SET
+            unit_price = (SELECT price FROM menu_items
+                          WHERE menu_items.id = order_items.menu_item_id),
+            line_total = quantity * (SELECT price FROM menu_items
+                                     WHERE menu_items.id = order_items.menu_item_id)
+    """)
+    op.execute("""
+        UPDATE orders SET order_total = COALESCE((
+            SELECT SUM(line_total) FROM order_items
+            WHERE order_items.order_id = orders.id), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('orders', 'order_total')
+    op.drop_column('order_items', 'line_total')
+    op.drop_column('order_items', 'unit_price')
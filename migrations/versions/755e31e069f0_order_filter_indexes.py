@@ -0,0 +1,59 @@
+"""order filter indexes
+
+Revision ID: 755e31e069f0
+Revises: d8fbd60f6e8f
+Create Date: 2026-10-19 01:35:46.693299
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '755e31e069f0'
+down_revision: Union[str, Sequence[str], None] = 'd8fbd60f6e8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# partial index predicate, same as app.models.orders.ACTIVE_ORDERS
+ACTIVE_ORDERS = sa.text("status IN ('Pending', 'Preparing')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Composite indexes for the GET /orders/ filters, created before the
+    # single-column ones they replace are dropped (same leading column).
+    # orders (status, id): ?status=... in id order, cursor paging by id
+    op.create_index('ix_orders_status_id', 'orders', ['status', 'id'],
+                    unique=False)
+    # orders (customer_id, id): ?customer_id=..., Customer.orders loads
+    op.create_index('ix_orders_customer_id_id', 'orders',
+                    ['customer_id', 'id'], unique=False)
+    # orders (id) WHERE active: the kitchen's Pending/Preparing queries,
+    # only as big as the orders that are still open
+    op.create_index('ix_orders_active', 'orders', ['id'], unique=False,
+                    postgresql_where=ACTIVE_ORDERS, sqlite_where=ACTIVE_ORDERS)
+    # order_items (menu_item_id, order_id): ?menu_item_id=... EXISTS check
+    op.create_index('ix_order_items_menu_item_id_order_id', 'order_items',
+                    ['menu_item_id', 'order_id'], unique=False)
+    op.drop_index(op.f('ix_order_items_menu_item_id'), table_name='order_items')
+    op.drop_index(op.f('ix_orders_customer_id'), table_name='orders')
+    op.drop_index(op.f('ix_orders_status'), table_name='orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_orders_status'), 'orders', ['status'],
+                    unique=False)
+    op.create_index(op.f('ix_orders_customer_id'), 'orders', ['customer_id'],
+                    unique=False)
+    op.create_index(op.f('ix_order_items_menu_item_id'), 'order_items',
+                    ['menu_item_id'], unique=False)
+    op.drop_index('ix_order_items_menu_item_id_order_id',
+                  table_name='order_items')
+    op.drop_index('ix_orders_active', table_name='orders')
+    op.drop_index('ix_orders_customer_id_id', table_name='orders')
+    op.drop_index('ix_orders_status_id', table_name='orders')
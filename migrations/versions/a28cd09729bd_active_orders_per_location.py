@@ -0,0 +1,39 @@
+"""active orders per location
+
+Revision ID: a28cd09729bd
+Revises: 122986780a2d
+Create Date: 2026-10-19 02:41:09.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a28cd09729bd'
+down_revision: Union[str, Sequence[str], None] = '122986780a2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# partial index predicate, same as app.models.orders.ACTIVE_ORDERS
+ACTIVE_ORDERS = sa.text("status IN ('Pending', 'Preparing')")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # orders (location_id, id) WHERE active: API requests filter on their
+    # location, and SQLite doesn't use the (id) partial index alongside a
+    # location_id term (it scanned orders for ?status=Pending&status=Preparing)
+    op.drop_index('ix_orders_active', table_name='orders')
+    op.create_index('ix_orders_active', 'orders', ['location_id', 'id'], unique=False,
+                    postgresql_where=ACTIVE_ORDERS, sqlite_where=ACTIVE_ORDERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_active', table_name='orders')
+    op.create_index('ix_orders_active', 'orders', ['id'], unique=False,
+                    postgresql_where=ACTIVE_ORDERS, sqlite_where=ACTIVE_ORDERS)
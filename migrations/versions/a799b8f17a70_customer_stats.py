@@ -0,0 +1,57 @@
+"""customer stats
+
+Revision ID: a799b8f17a70
+Revises: 755e31e069f0
+Create Date: 2026-10-19 01:39:37.389313
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a799b8f17a70'
+down_revision: Union[str, Sequence[str], None] = '755e31e069f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # customers: lifetime stats maintained by the order write paths
+    op.add_column('customers', sa.Column('order_count', sa.Integer(),
+                                         server_default='0', nullable=False))
+    op.add_column('customers', sa.Column('lifetime_spend', sa.Float(),
+                                         server_default='0', nullable=False))
+    op.add_column('customers', sa.Column('last_order_at', sa.DateTime(),
+                                         nullable=True))
+    # orders (customer_id, created_at): a customer's latest order and the
+    # date ranges of GET /customers/{id}/orders
+    op.create_index('ix_orders_customer_id_created_at', 'orders',
+                    ['customer_id', 'created_at'], unique=False)
+
+    # Backfill from the existing orders (plain SQL, works on SQLite and
+    # PostgreSQL); from here on the app keeps the columns current
+    op.execute("""
+        UPDATE customers SET
+            order_count = (SELECT COUNT(*) FROM orders
+                           WHERE orders.customer_id = customers.id),
+            lifetime_spend = COALESCE((
+                SELECT SUM(order_items.quantity * menu_items.price)
+                FROM orders
+                JOIN order_items ON order_items.order_id = orders.id
+                JOIN menu_items ON menu_items.id = order_items.menu_item_id
+                WHERE orders.customer_id = customers.id), 0),
+            last_order_at = (SELECT MAX(orders.created_at) FROM orders
+                             WHERE orders.customer_id = customers.id)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_customer_id_created_at', table_name='orders')
+    op.drop_column('customers', 'last_order_at')
+    op.drop_column('customers', 'lifetime_spend')
+    op.drop_column('customers', 'order_count')
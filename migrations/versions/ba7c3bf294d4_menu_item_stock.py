@@ -0,0 +1,31 @@
+"""menu item stock
+
+Revision ID: ba7c3bf294d4
+Revises: 0f8ca2d32b4d
+Create Date: 2026-10-19 02:14:30.831997
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba7c3bf294d4'
+down_revision: Union[str, Sequence[str], None] = '0f8ca2d32b4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # menu items' stock (app/utils/stock.py); NULL, i.e. not tracked, for
+    # every existing item
+    op.add_column('menu_items', sa.Column('stock_quantity', sa.Integer(),
+                                          nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('menu_items', 'stock_quantity')
@@ -0,0 +1,31 @@
+"""order version
+
+Revision ID: d2d64e9c2732
+Revises: a799b8f17a70
+Create Date: 2026-10-19 01:44:39.907812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2d64e9c2732'
+down_revision: Union[str, Sequence[str], None] = 'a799b8f17a70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # orders.version: compare-and-swap counter for concurrent order writes
+    # (API routes and the ARQ worker), also the order's ETag
+    op.add_column('orders', sa.Column('version', sa.Integer(),
+                                      server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('orders', 'version')
@@ -0,0 +1,49 @@
+"""hot path indexes
+
+Revision ID: d8fbd60f6e8f
+Revises: dc22168c3503
+Create Date: 2026-10-19 09:12:40.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8fbd60f6e8f'
+down_revision: Union[str, Sequence[str], None] = 'dc22168c3503'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Kept separate from the baseline so databases that were built by the
+    # old create_all() and stamped at dc22168c3503 get the indexes too.
+    # order_items.order_id: Order.items loads and the items IN (...) query
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items',
+                    ['order_id'], unique=False)
+    # order_items.menu_item_id: joins to menu_items, menu item deletes
+    op.create_index(op.f('ix_order_items_menu_item_id'), 'order_items',
+                    ['menu_item_id'], unique=False)
+    # orders.customer_id: Customer.orders loads, customer deletes
+    op.create_index(op.f('ix_orders_customer_id'), 'orders',
+                    ['customer_id'], unique=False)
+    # orders.status: worker / kitchen lookups by status
+    op.create_index(op.f('ix_orders_status'), 'orders',
+                    ['status'], unique=False)
+    # orders.created_at: /summary day ranges and newest-first ordering
+    op.create_index(op.f('ix_orders_created_at'), 'orders',
+                    ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_orders_created_at'), table_name='orders')
+    op.drop_index(op.f('ix_orders_status'), table_name='orders')
+    op.drop_index(op.f('ix_orders_customer_id'), table_name='orders')
+    op.drop_index(op.f('ix_order_items_menu_item_id'),
+                  table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
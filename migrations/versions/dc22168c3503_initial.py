@@ -9,6 +9,7 @@ from typing import Sequence, Union
 
 from alembic import op
 import sqlalchemy as sa
+import sqlmodel
 
 
 # revision identifiers, used by Alembic.
@@ -21,12 +22,80 @@ depends_on: Union[str, Sequence[str], None] = None
 def upgrade() -> None:
     """Upgrade schema."""
     # ### commands auto generated by Alembic - please adjust! ###
-    pass
+    op.create_table(
+        'customers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=100),
+                  nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(length=120),
+                  nullable=True),
+        sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(length=20),
+                  nullable=True),
+        sa.Column('joined_date', sa.Date(),
+                  server_default=sa.text('CURRENT_DATE'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table(
+        'employees',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=100),
+                  nullable=False),
+        sa.Column('role', sqlmodel.sql.sqltypes.AutoString(length=50),
+                  nullable=False),
+        sa.Column('email', sqlmodel.sql.sqltypes.AutoString(length=120),
+                  nullable=False),
+        sa.Column('phone', sqlmodel.sql.sqltypes.AutoString(length=20),
+                  nullable=True),
+        sa.Column('hire_date', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('phone')
+    )
+    op.create_table(
+        'menu_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=100),
+                  nullable=False),
+        sa.Column('description', sqlmodel.sql.sqltypes.AutoString(),
+                  nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('category', sqlmodel.sql.sqltypes.AutoString(length=50),
+                  nullable=False),
+        sa.Column('preparation_time_minutes', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.create_table(
+        'orders',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(),
+                  server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(length=20),
+                  nullable=False),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'order_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('menu_item_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     """Downgrade schema."""
     # ### commands auto generated by Alembic - please adjust! ###
-    pass
+    op.drop_table('order_items')
+    op.drop_table('orders')
+    op.drop_table('menu_items')
+    op.drop_table('employees')
+    op.drop_table('customers')
     # ### end Alembic commands ###
@@ -0,0 +1,104 @@
+"""POST /orders/ throughput with and without the order group commit.
+
+Seeds a database with scripts.seed_data, then has --concurrency clients
+post --orders orders each way: one commit per order, and through
+app.utils.group_commit (for every --windows value, in milliseconds).
+Requests go through the ASGI app in-process; the ARQ enqueue is skipped
+and the kitchen updates stay in-process (no Redis).
+
+Usage (from the repo root):
+    python -m scripts.bench_group_commit --orders 2000 --concurrency 32
+    python -m scripts.bench_group_commit --database-url postgresql://...
+
+Without --database-url a temporary SQLite database is used.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the order group commit")
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--windows", default="2,5",
+                        help="comma separated GROUP_COMMIT_WINDOW_MS values")
+    parser.add_argument("--max-batch", type=int, default=50)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    args.windows = [float(v) for v in args.windows.split(",")]
+    return args
+
+
+def run_once(client, args, customer_ids, menu_item_ids):
+    rng = random.Random(42)
+    bodies = [{
+        "customer_id": rng.choice(customer_ids),
+        "items": [{"menu_item_id": menu_item_id, "quantity": rng.randint(1, 3)}
+                  for menu_item_id in rng.sample(menu_item_ids, rng.randint(1, 4))],
+    } for _ in range(args.orders)]
+
+    def post(body):
+        started = time.perf_counter()
+        status = client.post("/orders/", json=body).status_code
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        results = list(executor.map(post, bodies))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds for _, seconds in results)
+    failed = sum(1 for status, _ in results if status != 200)
+    return (args.orders / elapsed, latencies[len(latencies) // 2],
+            latencies[int(len(latencies) * 0.99)], failed)
+
+
+def main(args):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    from sqlmodel import Session
+
+    from app.database import engine
+    from app.models import Customer, MenuItem
+    from app.routers import orders
+    from app.utils import group_commit
+    from main import app
+    from scripts import seed_data
+
+    seed_data.generate(seed_data.parse_args([
+        "--database-url", args.database_url, "--create-tables",
+        "--orders", "100", "--customers", "500", "--days", "1",
+    ]))
+    with Session(engine) as session:
+        customer_ids = session.exec(select(Customer.id)).scalars().all()
+        menu_item_ids = session.exec(select(MenuItem.id)).scalars().all()
+
+    # no `with`: the startup warm-up (Redis, kitchen channel) isn't wanted
+    orders.enqueue_sync = lambda order_id, location_id: None
+    client = TestClient(app)
+    print(f"{'mode':>16} {'orders/s':>9} {'p50':>7} {'p99':>7} {'failed':>6}")
+    modes = [("one per commit", None)] + [
+        (f"group {window:g}ms", group_commit.OrderGroupCommit(window, args.max_batch))
+        for window in args.windows]
+    for name, writer in modes:
+        group_commit.order_writer = writer
+        rate, p50, p99, failed = run_once(client, args, customer_ids, menu_item_ids)
+        print(f"{name:>16} {rate:>9.1f} {p50:>7.3f} {p99:>7.3f} {failed:>6}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "bench_group_commit.db")
+    # read when the app modules are imported
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["ORDER_GROUP_COMMIT"] = "false"
+    import logging
+
+    # per-request log lines would dominate the measurement
+    logging.getLogger("restaurant_logger").setLevel(logging.WARNING)
+    main(args)
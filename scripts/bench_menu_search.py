@@ -0,0 +1,84 @@
+"""Latency of the in-memory menu search index (app/utils/menu_search.py).
+
+Builds a MenuSearchIndex over a generated catalog of --items menu items
+(names of 2-3 made up words) and times --queries searches of each kind:
+name prefixes of 2-6 letters, the same with a category and a price range,
+and misspelled words (the trigram similarity fallback). Reports the build
+time and the p50 / p99 / max of the best of --repeat runs of each query.
+
+Usage (from the repo root):
+    python -m scripts.bench_menu_search --items 50000
+"""
+import argparse
+import random
+import string
+import time
+
+CATEGORIES = ["Main", "Starter", "Dessert", "Drink", "Side"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the menu search index")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def make_catalog(rng, count):
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+             for _ in range(max(count // 15, 100))]
+    items = [{
+        "id": item_id,
+        "name": " ".join(rng.choice(words) for _ in range(rng.randint(2, 3))).title(),
+        "description": None,
+        "price": round(rng.uniform(1, 50), 2),
+        "category": rng.choice(CATEGORIES),
+        "preparation_time_minutes": rng.randint(1, 30),
+    } for item_id in range(1, count + 1)]
+    return words, items
+
+
+def time_queries(index, queries, repeat, limit, **filters):
+    timings = []
+    for query in queries:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            index.search(query, limit=limit, **filters)
+            best = min(best, time.perf_counter() - started)
+        timings.append(best)
+    timings.sort()
+    return (timings[len(timings) // 2], timings[int(len(timings) * 0.99)], timings[-1])
+
+
+def main(args):
+    from app.utils.menu_search import MenuSearchIndex
+
+    rng = random.Random(42)
+    words, items = make_catalog(rng, args.items)
+    started = time.perf_counter()
+    index = MenuSearchIndex(items)
+    print(f"build: {args.items} items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    prefixes = [rng.choice(words)[:rng.randint(2, 6)] for _ in range(args.queries)]
+    typos = []
+    for word in rng.sample(words, min(args.queries, len(words))):
+        position = rng.randrange(1, len(word))
+        typos.append(word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:])
+    no_filters = {"category": None, "min_price": None, "max_price": None}
+    cases = {
+        "name": (prefixes, no_filters),
+        "name + category + price": (
+            prefixes, {"category": "Main", "min_price": 10, "max_price": 30}),
+        "misspelled": (typos, no_filters),
+    }
+    for name, (queries, filters) in cases.items():
+        p50, p99, worst = time_queries(index, queries, args.repeat, args.limit, **filters)
+        print(f"  {name:<24} p50 {p50 * 1e6:6.0f} us  p99 {p99 * 1e6:6.0f} us  "
+              f"max {worst * 1e6:6.0f} us")
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,91 @@
+"""Load + encode benchmark for the list endpoints: full ORM entities versus
+column-projected rows (app/utils/projections.py).
+
+Reports the best wall time, time per row and the tracemalloc peak of one
+request's worth of work, each run in a fresh session.
+
+Usage (from the repo root):
+    python -m scripts.bench_projection --orders 5000 --menu-items 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import List
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark list projections")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--menu-items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def measure(engine, repeat, load, encode):
+    from sqlmodel import Session
+
+    timings = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            rows = load(session)
+            encode(rows)
+            timings.append(time.perf_counter() - started)
+    with Session(engine) as session:
+        tracemalloc.start()
+        encode(load(session))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return min(timings), peak, len(rows)
+
+
+def main(args):
+    import orjson
+    from sqlmodel import create_engine, select
+
+    from app.models import MenuItem, MenuItemRead, Order, OrderRead
+    from app.utils.projections import fetch_orders, fetch_rows
+    from app.utils.responses import serialize
+    from scripts import seed_data
+
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed_data.generate(seed_data.parse_args([
+        "--database-url", database_url, "--create-tables", "--days", "30",
+        "--orders", str(args.orders), "--menu-items", str(args.menu_items),
+        "--customers", "500",
+    ]))
+    engine = create_engine(database_url)
+
+    # (load, encode) pairs: ORM entities go through model_response's
+    # serialize(), projected dicts through rows_response's orjson.dumps()
+    cases = {
+        "GET /orders/": {
+            "orm entities": (lambda s: s.exec(select(Order)).all(),
+                             lambda rows: serialize(List[OrderRead], rows)),
+            "projection": (fetch_orders, orjson.dumps),
+        },
+        "GET /menu/": {
+            "orm entities": (lambda s: s.exec(select(MenuItem)).all(),
+                             lambda rows: serialize(List[MenuItemRead], rows)),
+            "projection": (lambda s: fetch_rows(s, MenuItem, MenuItemRead),
+                           orjson.dumps),
+        },
+    }
+    for endpoint, loaders in cases.items():
+        print(endpoint)
+        for name, (load, encode) in loaders.items():
+            seconds, peak, rows = measure(engine, args.repeat, load, encode)
+            print(f"  {name:<13} {seconds * 1000:9.1f} ms  "
+                  f"{seconds / rows * 1e6:7.1f} us/row  "
+                  f"peak {peak / 1024 / 1024:7.2f} MiB")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    import logging
+
+    logging.getLogger("restaurant_logger").setLevel(logging.WARNING)
+    main(args)
@@ -0,0 +1,95 @@
+"""Response serialization benchmark for the orders and menu list endpoints.
+
+Compares, on the same preloaded ORM objects:
+  fastapi+json    response_model validation + jsonable output + stdlib json
+  fastapi+orjson  response_model validation + jsonable output + orjson
+  model_response  one from_attributes pass + pydantic-core dump_json
+
+Usage (from the repo root):
+    python -m scripts.bench_serialization --orders 5000 --menu-items 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark response encoding")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--menu-items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(args):
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from sqlalchemy.orm import selectinload
+    from sqlmodel import Session, create_engine, select
+
+    from app.models import MenuItem, MenuItemRead, Order, OrderItem, OrderRead
+    from app.utils.responses import serialize
+    from scripts import seed_data
+
+    database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed_data.generate(seed_data.parse_args([
+        "--database-url", database_url, "--create-tables", "--days", "30",
+        "--orders", str(args.orders), "--menu-items", str(args.menu_items),
+        "--customers", "500",
+    ]))
+    engine = create_engine(database_url)
+
+    with Session(engine) as session:
+        # everything is loaded up front so only the encoding is measured
+        cases = {
+            "GET /orders/": (List[OrderRead], session.exec(
+                select(Order).options(
+                    selectinload(Order.items).selectinload(OrderItem.menu_item))
+            ).all()),
+            "GET /menu/": (List[MenuItemRead],
+                           session.exec(select(MenuItem)).all()),
+        }
+
+        for endpoint, (schema, objects) in cases.items():
+            field = create_model_field("Response", schema)
+
+            def fastapi_encode(response_class):
+                content = asyncio.run(serialize_response(
+                    field=field, response_content=objects))
+                return response_class(content).body
+
+            results = {
+                "fastapi+json": best_of(
+                    args.repeat, lambda: fastapi_encode(JSONResponse)),
+                "fastapi+orjson": best_of(
+                    args.repeat, lambda: fastapi_encode(ORJSONResponse)),
+                "model_response": best_of(
+                    args.repeat, lambda: serialize(schema, objects)),
+            }
+            baseline = results["fastapi+json"]
+            print(f"{endpoint} ({len(objects)} rows)")
+            for name, seconds in results.items():
+                print(f"  {name:<15} {seconds * 1000:9.1f} ms  "
+                      f"{baseline / seconds:5.2f}x")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    import logging
+
+    logging.getLogger("restaurant_logger").setLevel(logging.WARNING)
+    main(args)
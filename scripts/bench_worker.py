@@ -0,0 +1,129 @@
+"""ARQ worker throughput benchmark.
+
+Floods `update_order_status` jobs into Redis and drains them with a burst
+worker, for every combination of --max-jobs and --pool-sizes (the size of
+the worker's database connection pool). The task sleeps are scaled down
+with ORDER_TASK_TIME_SCALE so the run measures the worker, not the kitchen.
+
+Usage (from the repo root):
+    python -m scripts.bench_worker --jobs 2000 --max-jobs 10,50,200
+    python -m scripts.bench_worker --redis-url redis://localhost:6379
+
+Without --redis-url the jobs go through fakeredis. Without --database-url
+a temporary SQLite database is seeded with scripts.seed_data.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ARQ worker")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--max-jobs", default="10,50,100",
+                        help="comma separated ARQ max_jobs values")
+    parser.add_argument("--pool-sizes", default="5,20",
+                        help="comma separated DB pool sizes")
+    parser.add_argument("--time-scale", type=float, default=0.0005,
+                        help="ORDER_TASK_TIME_SCALE for the task sleeps")
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    args.max_jobs = [int(v) for v in args.max_jobs.split(",")]
+    args.pool_sizes = [int(v) for v in args.pool_sizes.split(",")]
+    return args
+
+
+async def redis_pool(redis_url):
+    from arq.connections import ArqRedis, RedisSettings, create_pool
+
+    if redis_url:
+        return await create_pool(RedisSettings.from_dsn(redis_url))
+    import fakeredis
+    from arq import worker
+
+    # fakeredis has no INFO command, which the worker only logs at startup
+    async def skip_redis_info(redis, log_func):
+        pass
+
+    worker.log_redis_info = skip_redis_info
+    return ArqRedis(connection_pool=fakeredis.aioredis.FakeRedis().connection_pool)
+
+
+async def run_once(pool, engine, order_ids, max_jobs):
+    from arq.worker import Worker
+
+    from app.tasks.metrics import metrics
+    from app.tasks.settings import WorkerSettings
+
+    await pool.flushdb()
+    metrics.reset()
+    for order_id in order_ids:
+        await pool.enqueue_job("update_order_status", order_id)
+
+    worker = Worker(
+        functions=WorkerSettings.functions,
+        redis_pool=pool,
+        burst=True,
+        max_jobs=max_jobs,
+        poll_delay=0.01,
+        handle_signals=False,
+        keep_result=0,
+        ctx={"engine": engine},
+    )
+    started = time.perf_counter()
+    await worker.main()
+    elapsed = time.perf_counter() - started
+    await worker.close()
+    return elapsed, metrics.snapshot()["functions"]["update_order_status"]
+
+
+async def main(args):
+    from sqlalchemy import select
+    from sqlmodel import create_engine
+
+    from app.models import Order
+    from scripts import seed_data
+
+    seed_data.generate(seed_data.parse_args([
+        "--database-url", args.database_url, "--create-tables",
+        "--orders", str(args.jobs), "--customers", "100", "--days", "1",
+    ]))
+    pool = await redis_pool(args.redis_url)
+
+    print(f"{'max_jobs':>8} {'pool':>5} {'jobs/s':>9} {'wait p50':>9} "
+          f"{'wait p99':>9} {'run p50':>8} {'run p99':>8} {'failed':>6}")
+    for pool_size in args.pool_sizes:
+        engine = create_engine(args.database_url, pool_size=pool_size,
+                               max_overflow=0, pool_timeout=60)
+        with engine.connect() as conn:
+            order_ids = conn.execute(
+                select(Order.id).order_by(Order.id.desc()).limit(args.jobs)
+            ).scalars().all()
+        for max_jobs in args.max_jobs:
+            elapsed, stats = await run_once(pool, engine, order_ids, max_jobs)
+            waits, runs = stats["queue_wait_s"], stats["duration_s"]
+            print(f"{max_jobs:>8} {pool_size:>5} {stats['jobs'] / elapsed:>9.1f} "
+                  f"{waits['p50']:>9.3f} {waits['p99']:>9.3f} "
+                  f"{runs['p50']:>8.3f} {runs['p99']:>8.3f} "
+                  f"{stats['outcomes'].get('failed', 0):>6}")
+        engine.dispose()
+    await pool.aclose()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # both are read when the app modules are imported
+    os.environ["ORDER_TASK_TIME_SCALE"] = str(args.time_scale)
+    if not args.database_url:
+        args.database_url = "sqlite:///" + os.path.join(
+            tempfile.mkdtemp(), "bench_worker.db")
+    os.environ.setdefault("DATABASE_URL", args.database_url)
+    import logging
+
+    # per-job log lines would dominate the measurement
+    logging.getLogger("restaurant_logger").setLevel(logging.WARNING)
+    logging.getLogger("arq").setLevel(logging.WARNING)
+    asyncio.run(main(args))
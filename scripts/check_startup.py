@@ -0,0 +1,57 @@
+"""Cold start budget check for `import main`.
+
+Runs `python -X importtime -c "import main"` in fresh interpreters and
+fails (exit code 1) when the best import time is over --budget seconds,
+or when a module that should only load lazily (alembic, arq, redis) is
+imported at startup.
+
+Usage (from the repo root):
+    python -m scripts.check_startup --budget 1.5 --runs 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# only needed after startup: migration check, worker metrics, Redis pool
+LAZY_MODULES = ("alembic", "arq", "redis")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure_import(runs: int = 3, env=None):
+    # best cumulative time of `import main` in seconds, plus the top-level
+    # packages it pulled in
+    env = dict(os.environ if env is None else env)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best, packages = None, set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=root, env=env, capture_output=True, text=True, check=True)
+        for match in IMPORT_LINE.finditer(result.stderr):
+            packages.add(match.group(4).split(".")[0])
+            if match.group(4) == "main" and not match.group(3).strip():
+                seconds = int(match.group(2)) / 1e6
+                best = seconds if best is None else min(best, seconds)
+    return best, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time budget")
+    parser.add_argument("--budget", type=float,
+                        default=float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5")))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    seconds, packages = measure_import(args.runs)
+    eager = sorted(set(LAZY_MODULES) & packages)
+    print(f"import main: {seconds:.3f}s (budget {args.budget:.3f}s)")
+    if eager:
+        print(f"imported at startup but should be lazy: {', '.join(eager)}")
+    return 1 if seconds > args.budget or eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
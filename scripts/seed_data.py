@@ -0,0 +1,312 @@
+"""Deterministic synthetic dataset generator for scale testing.
+
+Generates customers, employees, menu items and orders (with order items)
+using the table definitions from app/models and bulk-loads them:
+PostgreSQL goes through COPY, every other backend through executemany.
+
+Usage (from the repo root):
+    python -m scripts.seed_data --customers 50000 --orders 10000000
+    python -m scripts.seed_data --database-url sqlite:///local.db --orders 100000
+
+The same --seed and --end-date always produce the same dataset. Ids continue from the
+current max id of each table, so the script can be re-run to append.
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import time
+from bisect import bisect
+from datetime import date, datetime, time as dtime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, select
+from sqlmodel import create_engine
+
+from app.models import Customer, Employee, MenuItem, Order, OrderItem
+from app.utils.customer_stats import recompute_customer_stats
+from app.utils.logger import logger
+from app.utils.migrations import upgrade_database
+
+
+CATEGORIES = {
+    # category: (min price, max price, min prep minutes, max prep minutes)
+    "Starter": (3.5, 9.0, 5, 12),
+    "Main": (9.0, 28.0, 12, 35),
+    "Pizza": (8.0, 18.0, 10, 20),
+    "Dessert": (4.0, 9.5, 3, 10),
+    "Drink": (1.5, 6.0, 1, 3),
+    "Side": (2.5, 6.5, 3, 8),
+}
+ADJECTIVES = ["Classic", "Spicy", "Smoky", "Garden", "Crispy", "House",
+              "Grilled", "Golden", "Rustic", "Sweet", "Tangy", "Herb"]
+DISHES = ["Burger", "Salad", "Wrap", "Soup", "Pasta", "Curry", "Taco",
+          "Bowl", "Sandwich", "Skewer", "Pie", "Toast"]
+ROLES = ["Chef", "Cook", "Waiter", "Cashier", "Manager", "Cleaner"]
+
+# Relative order volume per hour of the day (lunch and dinner peaks)
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 1, 2, 3, 3, 4, 8,
+                14, 13, 6, 3, 3, 6, 12, 14, 11, 6, 2, 1]
+# Relative order volume per weekday (Monday = 0)
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 1.0, 1.3, 1.5, 1.2]
+# How many lines an order has: 1 line is the most common
+LINE_COUNT_WEIGHTS = [30, 30, 20, 10, 6, 4]
+QUANTITY_WEIGHTS = [70, 20, 7, 3]
+
+
+def zipf_cum_weights(n: int, s: float = 1.1):
+    # popular menu items / regular customers get most of the orders
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def weighted_index(rng: random.Random, cum_weights):
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+class Loader:
+    # Writes rows for one table, batched, using the fastest path for the dialect
+
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.is_postgres = engine.dialect.name == "postgresql"
+        self.rows_written = 0
+
+    def write(self, model, rows):
+        if not rows:
+            return
+        table = model.__table__
+        # rows may stop early: the remaining columns get their defaults
+        columns = [c.name for c in table.columns][:len(rows[0])]
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if self.is_postgres:
+                self._copy(table.name, columns, batch)
+            else:
+                with self.engine.begin() as conn:
+                    conn.execute(table.insert(),
+                                 [dict(zip(columns, row)) for row in batch])
+        self.rows_written += len(rows)
+
+    def _copy(self, table_name, columns, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if v is None else v for v in row])
+        buffer.seek(0)
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table_name} ({', '.join(columns)}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer)
+            raw.commit()
+        finally:
+            raw.close()
+
+    def reset_sequences(self, models):
+        # COPY with explicit ids doesn't advance the serial sequences
+        if not self.is_postgres:
+            return
+        with self.engine.begin() as conn:
+            for model in models:
+                table = model.__tablename__
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 1))")
+
+
+def generate_menu_items(rng, first_id, count):
+    rows = []
+    categories = list(CATEGORIES)
+    for i in range(count):
+        item_id = first_id + i
+        category = categories[i % len(categories)]
+        low, high, prep_low, prep_high = CATEGORIES[category]
+        price = round(rng.uniform(low, high), 2)
+        name = f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} #{item_id}"
+        rows.append((item_id, name, f"{category} - {name}", price, category,
+                     rng.randint(prep_low, prep_high)))
+    return rows
+
+
+def generate_employees(rng, first_id, count, start_day, end_day):
+    rows = []
+    span = max((end_day - start_day).days, 1)
+    for i in range(count):
+        emp_id = first_id + i
+        rows.append((emp_id, f"Employee {emp_id}", rng.choice(ROLES),
+                     f"employee{emp_id}@example.com", f"+1555{emp_id:07d}",
+                     start_day + timedelta(days=rng.randrange(span))))
+    return rows
+
+
+def generate_customers(rng, first_id, count, start_day, end_day):
+    rows = []
+    span = max((end_day - start_day).days, 1)
+    for i in range(count):
+        cust_id = first_id + i
+        phone = f"+1444{cust_id:07d}" if rng.random() < 0.6 else None
+        rows.append((cust_id, f"Customer {cust_id}",
+                     f"customer{cust_id}@example.com", phone,
+                     start_day + timedelta(days=rng.randrange(span))))
+    return rows
+
+
+def orders_per_day(total, days, start_day):
+    # spread the orders over the days: weekly pattern plus slow growth,
+    # rounded so the counts add up to exactly `total`
+    weights = [WEEKDAY_WEIGHTS[(start_day + timedelta(days=d)).weekday()]
+               * (1 + d / max(days, 1)) for d in range(days)]
+    scale = total / sum(weights)
+    counts = [math.floor(w * scale) for w in weights]
+    for d in range(total - sum(counts)):
+        counts[-1 - d % days] += 1
+    return counts
+
+
+def order_status(created_at, now):
+    age = now - created_at
+    if age > timedelta(hours=2):
+        return "Completed"
+    return "Pending" if age < timedelta(minutes=15) else "Preparing"
+
+
+def generate(args, engine=None):
+    # engine: load into this one instead of --database-url (the tests'
+    # in-memory databases)
+    if engine is None:
+        engine = create_engine(args.database_url)
+    if args.create_tables:
+        upgrade_database(args.database_url)
+
+    rng = random.Random(args.seed)
+    loader = Loader(engine, args.batch_size)
+    end_day = args.end_date or date.today()
+    start_day = end_day - timedelta(days=args.days - 1)
+    # orders on the last day stop at "now" so there are live ones
+    now = datetime.now() if end_day == date.today() else \
+        datetime.combine(end_day, dtime.max)
+    seconds_today = (now - datetime.combine(end_day, dtime())).seconds
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        menu_first = next_id(conn, MenuItem)
+        employee_first = next_id(conn, Employee)
+        customer_first = next_id(conn, Customer)
+        order_first = next_id(conn, Order)
+        order_item_first = next_id(conn, OrderItem)
+
+    menu_rows = generate_menu_items(rng, menu_first, args.menu_items)
+    loader.write(MenuItem, menu_rows)
+    # for the order items' price snapshots
+    prices = {row[0]: row[3] for row in menu_rows}
+    loader.write(Employee, generate_employees(
+        rng, employee_first, args.employees, start_day, end_day))
+    loader.write(Customer, generate_customers(
+        rng, customer_first, args.customers, start_day, end_day))
+    logger.info(f"seed - {loader.rows_written} reference rows loaded")
+
+    menu_ids = list(range(menu_first, menu_first + args.menu_items))
+    customer_ids = list(range(customer_first, customer_first + args.customers))
+    rng.shuffle(menu_ids)
+    rng.shuffle(customer_ids)
+    menu_weights = zipf_cum_weights(len(menu_ids))
+    customer_weights = zipf_cum_weights(len(customer_ids), s=0.8)
+    hour_weights = list(accumulate(HOUR_WEIGHTS))
+    line_weights = list(accumulate(LINE_COUNT_WEIGHTS))
+    quantity_weights = list(accumulate(QUANTITY_WEIGHTS))
+
+    order_id, order_item_id = order_first, order_item_first
+    order_rows, item_rows = [], []
+
+    def flush():
+        # orders go first so the order_items foreign keys are satisfied
+        loader.write(Order, order_rows)
+        loader.write(OrderItem, item_rows)
+        order_rows.clear()
+        item_rows.clear()
+        elapsed = time.perf_counter() - started
+        logger.info(f"seed - {order_id - order_first} orders, "
+                    f"{loader.rows_written} rows in {elapsed:.1f}s")
+
+    for day_offset, count in enumerate(
+            orders_per_day(args.orders, args.days, start_day)):
+        day = start_day + timedelta(days=day_offset)
+        day_length = seconds_today if day == end_day else 86400
+        seconds = sorted(
+            (weighted_index(rng, hour_weights) * 3600 + rng.randrange(3600))
+            * day_length // 86400
+            for _ in range(count))
+        for second in seconds:
+            created_at = datetime.combine(day, dtime()) + \
+                timedelta(seconds=second)
+            customer_id = customer_ids[weighted_index(rng, customer_weights)]
+            lines = weighted_index(rng, line_weights) + 1
+            order_total = 0.0
+            for menu_item_id in {menu_ids[weighted_index(rng, menu_weights)]
+                                 for _ in range(lines)}:
+                quantity = weighted_index(rng, quantity_weights) + 1
+                line_total = quantity * prices[menu_item_id]
+                item_rows.append((order_item_id, order_id, menu_item_id,
+                                  quantity, prices[menu_item_id], line_total))
+                order_total += line_total
+                order_item_id += 1
+            # version 1, then the total of the lines above
+            order_rows.append((order_id, customer_id, created_at,
+                               order_status(created_at, now), 1, order_total))
+            order_id += 1
+        if len(order_rows) + len(item_rows) >= args.batch_size:
+            flush()
+    flush()
+    loader.reset_sequences([MenuItem, Employee, Customer, Order, OrderItem])
+    # the orders were loaded behind the API's back: fill in the new
+    # customers' order_count / lifetime_spend / last_order_at
+    with engine.begin() as conn:
+        recompute_customer_stats(conn, Customer.id >= customer_first)
+        # Fresh statistics for the planner after a bulk load. Without them
+        # SQLite takes any "location_id = ?" index over the created_at,
+        # customer_id and status ones, and with one location that reads
+        # every order.
+        conn.exec_driver_sql("ANALYZE")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"seed - done: {loader.rows_written} rows in {elapsed:.1f}s "
+                f"({loader.rows_written / max(elapsed, 1e-9) * 60:,.0f} rows/min)")
+    return loader.rows_written
+
+
+def parse_args(argv=None):
+    from app.database import DATABASE_URL
+
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic restaurant dataset")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--customers", type=int, default=10_000)
+    parser.add_argument("--employees", type=int, default=50)
+    parser.add_argument("--menu-items", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365,
+                        help="spread the orders over this many days up to today")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None,
+                        help="last day of orders (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--create-tables", action="store_true",
+                        help="run the alembic migrations before loading")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("set DATABASE_URL or pass --database-url")
+    if min(args.customers, args.menu_items, args.days) < 1:
+        parser.error("--customers, --menu-items and --days must be >= 1")
+    return args
+
+
+if __name__ == "__main__":
+    generate(parse_args())
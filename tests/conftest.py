@@ -0,0 +1,319 @@
+"""Shared fixtures: the app on an in-memory SQLite database and fakeredis.
+
+Nothing here needs PostgreSQL, Redis or the network. Every test gets its
+own database: an empty one (`engine`), or a copy of the seeded dataset
+(`seeded`), which is generated once per run by scripts/seed_data.py at
+--seed-scale times the default size.
+
+The app code opens sessions on app.database.engine (get_session, the read
+fallback, group commit, the kitchen board, the summary fan-out), so the
+test database replaces that engine and the shard registry instead of just
+overriding the get_session dependency: every path, including the replica
+and location routing under test, then lands on it.
+
+Tests make their rows through the API: create_menu_item() and
+create_customer(), or the menu_item and customer_id fixtures.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# read when the app modules are imported
+os.environ.update({
+    "DATABASE_URL": "sqlite://",
+    "READ_REPLICA_URLS": "",
+    "LOCATION_SHARDS": "",
+    "ORDER_GROUP_COMMIT": "false",
+    "PROFILING_SAMPLE_RATE": "0",
+    "RATE_LIMIT_PER_SECOND": "0",
+    "SQL_ECHO": "false",
+})
+
+import fakeredis
+from arq.connections import ArqRedis
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+
+import main
+from app import database
+from app.tasks import enqueue
+from app.utils import kitchen, menu_search
+from scripts import seed_data
+
+BUDGETS_FILE = Path(__file__).with_name("budgets.json")
+# default dataset, multiplied by --seed-scale
+SEED_SIZES = {"customers": 200, "employees": 10, "menu-items": 40, "orders": 2000}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--seed-scale", type=float,
+                     default=float(os.getenv("TEST_SEED_SCALE", "1")),
+                     help="size of the seeded dataset, 1 = %s" % SEED_SIZES)
+    parser.addoption("--record-budgets", action="store_true",
+                     help="rewrite tests/budgets.json from this run's measurements")
+
+
+def new_engine(url: str = "sqlite://"):
+    # an empty database with the schema (test_migrations.py checks that it
+    # matches `alembic upgrade head`); in memory unless url says otherwise
+    if url == "sqlite://":
+        db_engine = create_engine(url, connect_args={"check_same_thread": False},
+                                  poolclass=StaticPool)
+    else:
+        db_engine = create_engine(url, connect_args={"timeout": 30})
+    SQLModel.metadata.create_all(db_engine)
+    return db_engine
+
+
+def copy_database(source, target):
+    # SQLite's online backup: a fresh copy of the seeded data in a few ms
+    source_connection, target_connection = source.raw_connection(), target.raw_connection()
+    try:
+        source_connection.driver_connection.backup(target_connection.driver_connection)
+    finally:
+        source_connection.close()
+        target_connection.close()
+
+
+@pytest.fixture(scope="session")
+def seed_scale(request) -> float:
+    return request.config.getoption("--seed-scale")
+
+
+@pytest.fixture(scope="session")
+def seeded_template(seed_scale):
+    # generated once per run, copied for every test that wants it
+    db_engine = new_engine()
+    argv = ["--database-url", "sqlite://", "--days", "7"]
+    for option, size in SEED_SIZES.items():
+        argv += [f"--{option}", str(max(1, math.ceil(size * seed_scale)))]
+    seed_data.generate(seed_data.parse_args(argv), engine=db_engine)
+    yield db_engine
+    db_engine.dispose()
+
+
+@pytest.fixture
+def engine():
+    db_engine = new_engine()
+    yield db_engine
+    db_engine.dispose()
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    # for tests that write from several threads at once: the in-memory
+    # database is a single shared connection
+    db_engine = new_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    yield db_engine
+    db_engine.dispose()
+
+
+@pytest.fixture
+def seeded(engine, seeded_template):
+    copy_database(seeded_template, engine)
+    return engine
+
+
+class FakeRedisPool:
+    # An ArqRedis pool on fakeredis, on an event loop in its own thread,
+    # installed as app.tasks.enqueue's warm pool: the routes reach it the
+    # way they reach the real one (submit_to_pool)
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.pool = ArqRedis(connection_pool=fakeredis.aioredis.FakeRedis().connection_pool)
+
+    def run(self, coro):
+        # runs a coroutine on the pool's loop, from the test's thread
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout=10)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedisPool()
+    monkeypatch.setattr(enqueue, "_pool", fake.pool)
+    monkeypatch.setattr(enqueue, "_pool_loop", fake.loop)
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def use_database(monkeypatch, redis):
+    # points the app at a test database and returns a client for it. No
+    # `with TestClient`: the startup warm-up (schema check against alembic,
+    # pool filling, the Redis channel) isn't wanted, the kitchen board is
+    # loaded here instead.
+    def use(db_engine, shards: dict = None):
+        shards = shards or {}
+        engines = {database.DATABASE_URL: db_engine}
+        engines.update({f"shard-{location_id}": shard for location_id, shard in shards.items()})
+        monkeypatch.setattr(database, "engine", db_engine)
+        monkeypatch.setattr(database, "_engines_by_url", engines)
+        monkeypatch.setattr(database, "shard_engines", dict(shards))
+        menu_search.menu_searches.clear()
+        kitchen.load_active_orders()
+        return TestClient(main.app)
+
+    yield use
+    menu_search.menu_searches.clear()
+    kitchen.active_orders.load([], forget_removed=True)
+
+
+@pytest.fixture
+def client(engine, use_database):
+    return use_database(engine)
+
+
+class QueryLog:
+    # every statement sent to a database, in order
+
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def clear(self):
+        self.statements.clear()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@pytest.fixture
+def queries(engine):
+    log = QueryLog()
+    event.listen(engine, "before_cursor_execute", log.record)
+    yield log
+    event.remove(engine, "before_cursor_execute", log.record)
+
+
+def query_plans(db_engine, statements) -> list:
+    # (sql, EXPLAIN QUERY PLAN lines) of every SELECT in statements
+    plans = []
+    with db_engine.connect() as connection:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                continue
+            rows = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+def full_scans(plans, tables) -> list:
+    # the plan lines that read a whole table without an index
+    return [(statement, line) for statement, lines in plans for line in lines
+            if any(line == f"SCAN {table}" or line.startswith(f"SCAN {table} ")
+                   and "USING" not in line for table in tables)]
+
+
+class Budgets:
+    # Recorded query count and wall time per endpoint (tests/budgets.json).
+    # A measurement over its budget fails the test; --record-budgets writes
+    # this run's measurements instead, with headroom on the time.
+    TIME_HEADROOM = 4
+    MIN_MS = 25
+
+    def __init__(self, path: Path, record: bool, time_factor: float):
+        self.path = path
+        self.record = record
+        self.time_factor = time_factor
+        self.budgets = json.loads(path.read_text()) if path.exists() else {}
+        self.measured = {}
+
+    def check(self, name: str, query_count: int, seconds: float):
+        ms = seconds * 1000
+        if self.record:
+            self.measured[name] = {
+                "queries": query_count,
+                "ms": max(self.MIN_MS, math.ceil(ms * self.TIME_HEADROOM))}
+            return
+        budget = self.budgets.get(name)
+        assert budget is not None, \
+            f"no budget recorded for {name!r}, run pytest --record-budgets"
+        assert query_count <= budget["queries"], \
+            f"{name}: {query_count} queries, budget {budget['queries']}"
+        assert ms <= budget["ms"] * self.time_factor, \
+            f"{name}: {ms:.1f}ms, budget {budget['ms'] * self.time_factor:.0f}ms"
+
+    def save(self):
+        if self.record and self.measured:
+            budgets = {**self.budgets, **self.measured}
+            self.path.write_text(json.dumps(dict(sorted(budgets.items())), indent=2) + "\n")
+
+
+@pytest.fixture(scope="session")
+def budgets(request, seed_scale):
+    # slower machines: TEST_TIME_BUDGET_FACTOR=3; bigger datasets take longer
+    time_factor = float(os.getenv("TEST_TIME_BUDGET_FACTOR", "1")) * max(1.0, seed_scale)
+    recorded = Budgets(BUDGETS_FILE, request.config.getoption("--record-budgets"),
+                       time_factor)
+    yield recorded
+    recorded.save()
+
+
+def measure(client, log: QueryLog, make_request, repeat: int = 3):
+    # (queries, best wall time in seconds) of make_request(i), a fresh
+    # (method, url, kwargs) per run so writes don't repeat themselves; the
+    # first run warms the statement caches and isn't timed
+    method, url, kwargs = make_request(0)
+    response = client.request(method, url, **kwargs)
+    assert response.status_code < 400, (method, url, response.status_code, response.text)
+    most, best = 0, float("inf")
+    for i in range(1, repeat + 1):
+        method, url, kwargs = make_request(i)
+        log.clear()
+        started = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        best = min(best, time.perf_counter() - started)
+        assert response.status_code < 400, (method, url, response.status_code, response.text)
+        most = max(most, log.count)
+    return most, best
+
+
+def first_row(db_engine, sql: str, **params):
+    with db_engine.connect() as connection:
+        return connection.execute(text(sql), params).first()
+
+
+def create_menu_item(client, name: str = "Soup", price: float = 5, category: str = "Starter",
+                     headers: dict = None) -> dict:
+    # POST /menu/ (in the location of headers), checked; the new item
+    response = client.post("/menu/", headers=headers, json={
+        "name": name, "price": price, "category": category, "preparation_time_minutes": 5})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def create_customer(client, name: str = "Ann", email: str = None, headers: dict = None) -> dict:
+    # POST /customers/, checked; the email follows the name unless given
+    email = email or f"{name.lower().replace(' ', '.')}@example.com"
+    response = client.post("/customers/", headers=headers, json={"name": name, "email": email})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def menu_item(client):
+    return create_menu_item(client)
+
+
+@pytest.fixture
+def customer_id(client):
+    return create_customer(client)["id"]
@@ -0,0 +1,86 @@
+"""Admission control (app/utils/admission.py): the cap follows the
+configured database pools, and a full server lets in the most important
+requests first."""
+import asyncio
+
+import pytest
+
+from app.utils import admission
+from app.utils.admission import AdmissionController, Overloaded, RouteGroup
+
+
+@pytest.mark.parametrize("shards, replicas, capacity", [
+    ({}, [], 15),
+    # two locations sharing one shard database: one more pool
+    ({2: "sqlite:///shard.db", 3: "sqlite:///shard.db"}, [], 30),
+    ({2: "sqlite:///shard.db"}, ["sqlite:///r1.db", "sqlite:///r2.db"], 60),
+])
+def test_capacity_counts_every_pool(monkeypatch, shards, replicas, capacity):
+    monkeypatch.setattr(admission, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(admission, "LOCATION_SHARDS", shards)
+    monkeypatch.setattr(admission, "READ_REPLICA_URLS", replicas)
+    assert admission.database_capacity() == capacity
+
+
+def groups(queue_size=10):
+    return (RouteGroup("writes", 0, 4, queue_size), RouteGroup("default", 1, 4, queue_size),
+            RouteGroup("analytics", 2, 2, queue_size))
+
+
+def test_reserved_slots_are_only_for_priority_0():
+    writes, default, analytics = groups()
+    controller = AdmissionController([writes, default, analytics], max_concurrency=4,
+                                     max_wait=0.1, reserved=2)
+
+    async def scenario():
+        await controller.acquire(default)
+        await controller.acquire(analytics)
+        # the other two slots are reserved: analytics and default wait, then are shed
+        for group in (analytics, default):
+            with pytest.raises(Overloaded):
+                await controller.acquire(group)
+        await controller.acquire(writes)
+        await controller.acquire(writes)
+
+    asyncio.run(scenario())
+    assert (controller.running, analytics.shed, default.shed) == (4, 1, 1)
+
+
+def test_free_slots_go_to_the_most_important_waiter():
+    writes, default, analytics = groups()
+    controller = AdmissionController([writes, default, analytics], max_concurrency=1,
+                                     max_wait=1, reserved=0)
+
+    async def scenario():
+        await controller.acquire(default)
+        queued = [asyncio.create_task(controller.acquire(group))
+                  for group in (analytics, default, writes)]
+        await asyncio.sleep(0)
+        let_in = []
+        for _ in queued:
+            running = next(group for group in (writes, default, analytics) if group.running)
+            controller.release(running)
+            await asyncio.sleep(0)
+            let_in.append(next(group.name for group in (writes, default, analytics)
+                                if group.running))
+        return let_in
+
+    assert asyncio.run(scenario()) == ["writes", "default", "analytics"]
+
+
+def test_a_full_queue_is_shed_right_away():
+    writes, default, analytics = groups(queue_size=1)
+    controller = AdmissionController([writes, default, analytics], max_concurrency=1,
+                                     max_wait=1, reserved=0)
+
+    async def scenario():
+        await controller.acquire(default)
+        waiting = asyncio.create_task(controller.acquire(default))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue is full"):
+            await controller.acquire(default)
+        controller.release(default)
+        await waiting
+
+    asyncio.run(scenario())
+    assert (default.running, default.shed) == (1, 1)
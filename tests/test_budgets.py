@@ -0,0 +1,125 @@
+"""Query count and wall time of every endpoint against its recorded budget.
+
+An endpoint that starts issuing a query per row (N+1), or simply gets
+slower, fails here. After an intended change, re-record with
+`pytest tests/test_budgets.py --record-budgets` and commit budgets.json.
+"""
+import pytest
+
+from conftest import create_customer, create_menu_item, first_row, measure
+
+
+@pytest.fixture
+def ids(seeded, client):
+    # ids to aim the requests at, from the seeded data; a few spare rows
+    # nothing refers to, so deleting them works
+    def column(sql):
+        with seeded.connect() as connection:
+            return [row[0] for row in connection.exec_driver_sql(sql).all()]
+
+    latest = first_row(seeded, "SELECT id, date(created_at) FROM orders "
+                               "ORDER BY created_at DESC, id DESC LIMIT 1")
+    spare_menu_items = [create_menu_item(client, f"Spare item {i}", 5, "Side")["id"]
+                        for i in range(4)]
+    spare_employees = [client.post("/employees/", json={
+        "name": f"Spare {i}", "role": "Cook", "email": f"spare{i}@example.com",
+        "hire_date": "2024-01-01"}).json()["id"] for i in range(4)]
+    spare_customers = [create_customer(client, f"Spare {i}")["id"] for i in range(4)]
+    return {
+        "menu_item": 1,
+        "menu_items": column("SELECT id FROM menu_items ORDER BY id LIMIT 3"),
+        "customer": column("SELECT customer_id FROM orders GROUP BY customer_id "
+                           "ORDER BY count(*) DESC, customer_id LIMIT 1")[0],
+        "orders": column("SELECT id FROM orders ORDER BY id DESC LIMIT 8"),
+        "order_items": column("SELECT o.id || ':' || min(i.id) FROM orders o "
+                              "JOIN order_items i ON i.order_id = o.id "
+                              "GROUP BY o.id ORDER BY o.id LIMIT 4"),
+        "day": latest[1],
+        "employee": 1,
+        "spare_menu_items": spare_menu_items,
+        "spare_employees": spare_employees,
+        "spare_customers": spare_customers,
+    }
+
+
+def order_payload(ids, i):
+    return {"customer_id": ids["customer"], "items": [
+        {"menu_item_id": menu_item_id, "quantity": i + 1} for menu_item_id in ids["menu_items"]]}
+
+
+# name -> (ids, run number) -> (method, url, request kwargs)
+ENDPOINTS = {
+    "GET /menu/": lambda ids, i: ("GET", "/menu/", {}),
+    "GET /menu/?ids": lambda ids, i: ("GET", "/menu/?ids=1,2,3,4,5", {}),
+    "GET /menu/search": lambda ids, i: ("GET", "/menu/search?q=burger&max_price=20", {}),
+    "GET /menu/{id}": lambda ids, i: ("GET", f"/menu/{ids['menu_item']}", {}),
+    "POST /menu/batch-get": lambda ids, i: ("POST", "/menu/batch-get", {"json": {"ids": [1, 2, 3]}}),
+    "POST /menu/": lambda ids, i: ("POST", "/menu/", {"json": {
+        "name": f"Budget item {i}", "price": 7.5, "category": "Main",
+        "preparation_time_minutes": 12}}),
+    "PUT /menu/{id}": lambda ids, i: ("PUT", f"/menu/{ids['menu_item']}", {"json": {
+        "name": f"Renamed {i}", "price": 8 + i, "category": "Main",
+        "preparation_time_minutes": 10}}),
+    "PATCH /menu/{id}": lambda ids, i: ("PATCH", f"/menu/{ids['menu_item']}",
+                                        {"json": {"price": 9 + i}}),
+    "PUT /menu/{id}/stock": lambda ids, i: ("PUT", f"/menu/{ids['menu_item']}/stock",
+                                            {"json": {"stock_quantity": 50 + i}}),
+    "DELETE /menu/{id}": lambda ids, i: ("DELETE", f"/menu/{ids['spare_menu_items'][i]}", {}),
+
+    "GET /customers/": lambda ids, i: ("GET", "/customers/", {}),
+    "GET /customers/{id}": lambda ids, i: ("GET", f"/customers/{ids['customer']}", {}),
+    "GET /customers/{id}/orders": lambda ids, i: (
+        "GET", f"/customers/{ids['customer']}/orders?limit=20&expand=items", {}),
+    "POST /customers/batch-get": lambda ids, i: ("POST", "/customers/batch-get",
+                                                 {"json": {"ids": [1, 2, 3]}}),
+    "POST /customers/": lambda ids, i: ("POST", "/customers/", {"json": {
+        "name": f"Budget {i}", "email": f"budget{i}@example.com"}}),
+    "PATCH /customers/{id}": lambda ids, i: ("PATCH", f"/customers/{ids['customer']}",
+                                             {"json": {"name": f"Regular {i}"}}),
+    "DELETE /customers/{id}": lambda ids, i: ("DELETE", f"/customers/{ids['spare_customers'][i]}", {}),
+
+    "GET /employees/": lambda ids, i: ("GET", "/employees/", {}),
+    "GET /employees/{id}": lambda ids, i: ("GET", f"/employees/{ids['employee']}", {}),
+    "POST /employees/": lambda ids, i: ("POST", "/employees/", {"json": {
+        "name": f"Budget {i}", "role": "Waiter", "email": f"waiter{i}@example.com",
+        "hire_date": "2024-05-01"}}),
+    "DELETE /employees/{id}": lambda ids, i: ("DELETE", f"/employees/{ids['spare_employees'][i]}", {}),
+
+    "GET /orders/": lambda ids, i: ("GET", "/orders/?limit=50&order=desc", {}),
+    "GET /orders/?expand=items": lambda ids, i: ("GET", "/orders/?limit=50&expand=items", {}),
+    "GET /orders/?status": lambda ids, i: ("GET", "/orders/?status=Pending&status=Preparing&limit=50", {}),
+    "GET /orders/?ids": lambda ids, i: ("GET", "/orders/?ids=" + ",".join(map(str, ids["orders"])), {}),
+    "GET /orders/{id}": lambda ids, i: ("GET", f"/orders/{ids['orders'][0]}", {}),
+    "POST /orders/batch-get": lambda ids, i: ("POST", "/orders/batch-get", {"json": {"ids": ids["orders"]}}),
+    "POST /orders/": lambda ids, i: ("POST", "/orders/", {"json": order_payload(ids, i)}),
+    "PUT /orders/{id}": lambda ids, i: ("PUT", f"/orders/{ids['orders'][i]}", {"json": order_payload(ids, i)}),
+    "PATCH /orders/{id}": lambda ids, i: ("PATCH", f"/orders/{ids['orders'][i]}",
+                                          {"json": {"status": "Preparing"}}),
+    "POST /orders/{id}/items": lambda ids, i: ("POST", f"/orders/{ids['orders'][i]}/items", {"json": {
+        "menu_item_id": ids["menu_items"][0], "quantity": 1}}),
+    "DELETE /orders/{id}/items/{item_id}": lambda ids, i: (
+        "DELETE", "/orders/{}/items/{}".format(*ids["order_items"][i].split(":")), {}),
+    "DELETE /orders/{id}": lambda ids, i: ("DELETE", f"/orders/{ids['orders'][i + 4]}", {}),
+
+    "GET /summary/": lambda ids, i: ("GET", f"/summary/?date={ids['day']}&per_page=20", {}),
+    "GET /summary/?all_locations": lambda ids, i: (
+        "GET", f"/summary/?date={ids['day']}&per_page=20&all_locations=true", {}),
+    "GET /kitchen/active": lambda ids, i: ("GET", "/kitchen/active", {}),
+    "GET /health/live": lambda ids, i: ("GET", "/health/live", {}),
+}
+
+
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+def test_endpoint_budget(name, ids, client, queries, budgets):
+    query_count, seconds = measure(client, queries, lambda i: ENDPOINTS[name](ids, i))
+    budgets.check(name, query_count, seconds)
+
+
+def test_query_count_does_not_grow_with_the_page(ids, client, queries):
+    # the items of 50 orders come in one query, not one per order
+    counts = []
+    for limit in (5, 50):
+        queries.clear()
+        assert client.get(f"/orders/?limit={limit}&expand=items").status_code == 200
+        counts.append(queries.count)
+    assert counts[0] == counts[1]
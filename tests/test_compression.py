@@ -0,0 +1,23 @@
+"""Response compression (app/utils/compression.py)."""
+import pytest
+
+
+@pytest.fixture
+def client(seeded, use_database):
+    return use_database(seeded)
+
+
+@pytest.mark.parametrize("url, accept_encoding, content_encoding", [
+    ("/menu/", "gzip", "gzip"),
+    # under COMPRESSION_MIN_BYTES
+    ("/menu/1?fields=id", "gzip", None),
+    # the client asked for none
+    ("/menu/", "identity", None),
+])
+def test_vary_on_every_response(client, url, accept_encoding, content_encoding):
+    response = client.get(url, headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == content_encoding
+    # a cache can't hand one client's encoding to another
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()
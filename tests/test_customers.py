@@ -0,0 +1,87 @@
+"""Customer emails are unique per location, also under concurrent inserts.
+
+The unique constraints decide, not a SELECT before the INSERT: the create
+routes of customers, menu items and employees run one INSERT ... RETURNING.
+A customer's order history includes the archived orders.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.archive import archive_old_orders
+from conftest import first_row
+
+NEW_ROWS = {
+    "/customers/": {"name": "Ann", "email": "ann@example.com"},
+    "/menu/": {"name": "Soup", "price": 5, "category": "Starter", "preparation_time_minutes": 5},
+    "/employees/": {"name": "Eve", "role": "Cook", "email": "eve@example.com",
+                    "hire_date": "2024-01-01"},
+}
+
+
+def new_customer(client, email: str, name: str = "Ann"):
+    return client.post("/customers/", json={"name": name, "email": email})
+
+
+def test_duplicate_email_is_a_400(client):
+    assert new_customer(client, "ann@example.com").status_code == 200
+    response = new_customer(client, "ann@example.com", name="Other Ann")
+    assert response.status_code == 400, response.text
+
+
+def test_concurrent_inserts_keep_one(file_engine, use_database):
+    # no check-then-insert race: the unique constraint decides
+    client = use_database(file_engine)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(
+            lambda i: new_customer(client, "race@example.com", f"Racer {i}").status_code,
+            range(16)))
+    assert sorted(codes) == [200] + [400] * 15
+    assert first_row(file_engine, "SELECT count(*) FROM customers "
+                                  "WHERE email = 'race@example.com'")[0] == 1
+
+
+@pytest.mark.parametrize("url", list(NEW_ROWS))
+def test_create_is_one_insert_returning(url, client, queries):
+    # the new row, then the same one again: the constraint rejects it
+    for status_code in (200, 400):
+        queries.clear()
+        assert client.post(url, json=NEW_ROWS[url]).status_code == status_code
+        statements = [statement for statement, _ in queries.statements]
+        assert len(statements) == 1, statements
+        assert statements[0].startswith("INSERT INTO") and "RETURNING" in statements[0]
+
+
+def test_order_history_includes_archived_orders(engine, client, menu_item, customer_id):
+    ids = [client.post("/orders/", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": menu_item["id"], "quantity": 1}]}).json()["id"] for _ in range(3)]
+    # the first two are done and get archived (cutoff: tomorrow)
+    for order_id in ids[:2]:
+        client.patch(f"/orders/{order_id}", json={"status": "Completed"})
+    assert archive_old_orders(engine, after_days=-1) == 2
+
+    # newest first, two per page: one live and one archived order, then
+    # the last archived one
+    url = f"/customers/{customer_id}/orders?limit=2"
+    first = client.get(url)
+    assert [o["id"] for o in first.json()] == [ids[2], ids[1]]
+    second = client.get(f"{url}&cursor={first.headers['X-Next-Cursor']}")
+    assert [o["id"] for o in second.json()] == [ids[0]]
+    assert "X-Next-Cursor" not in second.headers
+    assert [len(o["items"]) for o in first.json() + second.json()] == [1, 1, 1]
+
+    completed = client.get(f"/customers/{customer_id}/orders?status=Completed").json()
+    assert [o["id"] for o in completed] == [ids[1], ids[0]]
+    assert client.get(f"/customers/{customer_id}").json()["order_count"] == 3
+
+
+def test_archived_order_ids_are_not_handed_out_again(engine, client, menu_item, customer_id):
+    new_order = {"customer_id": customer_id, "items": [{"menu_item_id": menu_item["id"], "quantity": 1}]}
+    archived = client.post("/orders/", json=new_order).json()["id"]
+    client.patch(f"/orders/{archived}", json={"status": "Completed"})
+    assert archive_old_orders(engine, after_days=-1) == 1
+
+    # the newest order is gone from orders, but its id stays taken
+    assert client.post("/orders/", json=new_order).json()["id"] == archived + 1
+    assert [o["id"] for o in client.get(f"/customers/{customer_id}/orders").json()] == \
+        [archived + 1, archived]
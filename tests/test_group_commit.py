@@ -0,0 +1,107 @@
+"""Group commit of new orders (app/utils/group_commit.py)."""
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.models import OrderCreate
+from app.utils.group_commit import OrderGroupCommit
+
+from conftest import create_customer, first_row
+
+
+def order(customer_id, menu_item_id):
+    return OrderCreate(customer_id=customer_id,
+                       items=[{"menu_item_id": menu_item_id, "quantity": 1}])
+
+
+@pytest.fixture
+def ids(client, menu_item):
+    # two customers, to tell the orders of one batch apart
+    return [create_customer(client, f"Guest {i}")["id"] for i in range(2)], menu_item["id"]
+
+
+def test_orders_of_one_batch_get_their_own_ids(ids):
+    (first, second), menu_item_id = ids
+    writer = OrderGroupCommit(window_ms=50)
+    results = {}
+    threads = [threading.Thread(target=lambda c=c: results.update(
+        {c: writer.submit(order(c, menu_item_id), 1)})) for c in (first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results.values()) == [1, 2]
+
+
+def test_a_stuck_writer_is_a_503(ids, monkeypatch):
+    (customer_id, _), menu_item_id = ids
+    writer = OrderGroupCommit(window_ms=1, timeout=0.2)
+    released = threading.Event()
+    monkeypatch.setattr(writer, "write", lambda batch: released.wait(5))
+    try:
+        with pytest.raises(HTTPException) as error:
+            writer.submit(order(customer_id, menu_item_id), 1)
+        assert error.value.status_code == 503
+    finally:
+        released.set()
+
+
+def test_a_timed_out_order_is_never_written(engine, ids, monkeypatch):
+    (first, second), menu_item_id = ids
+    writer = OrderGroupCommit(window_ms=1, timeout=0.2)
+    # the first batch hangs until released; the next order waits behind it
+    started, released = threading.Event(), threading.Event()
+    write_to = writer.write_to
+    monkeypatch.setattr(writer, "write_to", lambda db_engine, batch: (
+        started.set(), released.wait(5), write_to(db_engine, batch)))
+    results = {}
+    slow = threading.Thread(target=lambda: results.update(
+        first=writer.submit(order(first, menu_item_id), 1)))
+    slow.start()
+    started.wait(5)
+    try:
+        with pytest.raises(HTTPException) as error:
+            writer.submit(order(second, menu_item_id), 1)
+        assert error.value.status_code == 503
+    finally:
+        released.set()
+    slow.join()
+
+    # the write under way when its route timed out still answers it; the
+    # cancelled one is skipped by the writer, even once it gets to it
+    assert results["first"] == 1
+    assert writer.submit(order(first, menu_item_id), 1) == 2
+    assert first_row(engine, "SELECT count(*) FROM orders WHERE customer_id = :id",
+                     id=second)[0] == 0
+
+
+def test_a_bad_order_only_fails_its_own_request(engine, ids):
+    (first, second), menu_item_id = ids
+    writer = OrderGroupCommit(window_ms=100)
+    results = {}
+
+    def submit(name, new_order):
+        try:
+            results[name] = writer.submit(new_order, 1)
+        except Exception as e:
+            results[name] = e
+
+    # no such menu item: fails the batch, then only its own retry
+    threads = [threading.Thread(target=submit, args=args) for args in (
+        ("good", order(first, menu_item_id)), ("bad", order(second, menu_item_id + 100)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["good"] == 1
+    assert isinstance(results["bad"], Exception)
+    assert first_row(engine, "SELECT count(*) FROM orders")[0] == 1
+
+
+def test_default_timeout_follows_the_pool(file_engine, use_database):
+    use_database(file_engine)
+    writer = OrderGroupCommit(window_ms=5)
+    # the window, then two checkouts of SQLAlchemy's default 30s
+    assert file_engine.pool.timeout() == 30
+    assert writer.write_timeout(1) == pytest.approx(60.005)
@@ -0,0 +1,46 @@
+"""The in-memory kitchen board (app/utils/kitchen.py) and GET /kitchen/active."""
+from app.utils.kitchen import ActiveOrderIndex, order_changed, order_removed
+
+
+def order(order_id, version, status="Pending"):
+    return {"id": order_id, "location_id": 1, "version": version, "status": status,
+            "items": []}
+
+
+def board(index):
+    return [o["id"] for o in index.orders()]
+
+
+def test_late_messages_do_not_bring_orders_back():
+    index = ActiveOrderIndex()
+    index.load([])
+    index.apply(order_changed(order(1, 1)))
+    index.apply(order_changed(order(2, 1)))
+    assert board(index) == [1, 2]
+
+    # cancelled, then a late upsert of the version before
+    index.apply(order_changed(order(1, 2, "Cancelled")))
+    index.apply(order_changed(order(1, 1)))
+    # deleted, then a late upsert of the same version
+    index.apply(order_removed(2, 1, version=1))
+    index.apply(order_changed(order(2, 1)))
+    assert board(index) == []
+
+    # a later write does count: the order is active again
+    index.apply(order_changed(order(1, 3)))
+    assert board(index) == [1]
+
+
+def test_board_follows_the_order_routes(client, menu_item, customer_id):
+    created = [client.post("/orders/", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": menu_item["id"], "quantity": 1}]}).json() for _ in range(3)]
+    assert [o["id"] for o in client.get("/kitchen/active").json()] == [o["id"] for o in created]
+
+    client.patch(f"/orders/{created[0]['id']}", json={"status": "Cancelled"})
+    client.delete(f"/orders/{created[1]['id']}")
+    assert [o["id"] for o in client.get("/kitchen/active").json()] == [created[2]["id"]]
+
+    # a renamed menu item shows up on the board with the nested fields only
+    client.patch(f"/menu/{menu_item['id']}", json={"name": "Tomato soup"})
+    line = client.get("/kitchen/active").json()[0]["items"][0]
+    assert line["menu_item"] == {"id": menu_item["id"], "name": "Tomato soup", "price": 5}
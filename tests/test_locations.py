@@ -0,0 +1,111 @@
+"""Every request only sees its own location's rows (X-Location-Id).
+
+Locations 1 and 2 share the main database, location 3 lives in a shard.
+"""
+import pytest
+
+from conftest import create_customer, create_menu_item, first_row, new_engine
+
+L2, L3 = {"X-Location-Id": "2"}, {"X-Location-Id": "3"}
+
+
+@pytest.fixture
+def shard():
+    db_engine = new_engine()
+    yield db_engine
+    db_engine.dispose()
+
+
+@pytest.fixture
+def client(engine, shard, use_database):
+    return use_database(engine, shards={3: shard})
+
+
+def ok(response, status_code=200):
+    assert response.status_code == status_code, response.text
+    return response.json() if response.content else None
+
+
+@pytest.fixture
+def world(client):
+    # the same menu item and customer in each location, and an order each
+    menu = [create_menu_item(client, "Pizza", price, "Main", headers)
+            for price, headers in ((9, None), (11, L2), (12, L3))]
+    customers = [create_customer(client, headers=headers) for headers in (None, L2, L3)]
+    orders = [ok(client.post("/orders/", headers=headers, json={
+        "customer_id": customer["id"], "items": [{"menu_item_id": item["id"], "quantity": quantity}]}))
+        for headers, customer, item, quantity in zip((None, L2, L3), customers, menu, (2, 1, 3))]
+    return {"menu": menu, "customers": customers, "orders": orders}
+
+
+@pytest.mark.parametrize("value", ["abc", "0", "-1"])
+def test_bad_location_header(client, value):
+    assert client.get("/menu/", headers={"X-Location-Id": value}).status_code == 400
+
+
+def test_rows_go_to_their_location(engine, shard, world):
+    assert [item["location_id"] for item in world["menu"]] == [1, 2, 3]
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT location_id, count(*) FROM orders GROUP BY 1").all() == [(1, 1), (2, 1)]
+    assert first_row(shard, "SELECT location_id, count(*) FROM orders") == (3, 1)
+
+
+def test_other_locations_are_not_found(client, world):
+    other_item, other_order = world["menu"][1], world["orders"][1]
+    assert [item["id"] for item in ok(client.get("/menu/"))] == [world["menu"][0]["id"]]
+    assert [item["id"] for item in ok(client.get("/menu/", headers=L3))] == [world["menu"][2]["id"]]
+    assert client.get(f"/menu/{other_item['id']}").status_code == 404
+    assert client.patch(f"/menu/{other_item['id']}", json={"price": 1}).status_code == 404
+    assert client.delete(f"/menu/{other_item['id']}").status_code == 404
+    assert ok(client.get(f"/menu/{other_item['id']}", headers=L2))["price"] == 11
+    assert client.get(f"/orders/{other_order['id']}").status_code == 404
+    assert client.delete(f"/orders/{other_order['id']}").status_code == 404
+    # the name is taken in location 2 itself
+    assert client.post("/menu/", headers=L2, json={
+        "name": "Pizza", "price": 9.5, "category": "Main",
+        "preparation_time_minutes": 5}).status_code == 400
+
+
+def test_other_locations_customers_are_not_found(client, world):
+    other = world["customers"][1]
+    assert client.get(f"/customers/{other['id']}").status_code == 404
+    assert client.delete(f"/customers/{other['id']}").status_code == 404
+    assert client.delete(f"/customers/{other['id']}", headers=L3).status_code == 404
+    assert ok(client.get(f"/customers/{other['id']}", headers=L2))["email"] == "ann@example.com"
+
+
+def test_cannot_order_across_locations(client, world):
+    mine, theirs = world["customers"][0], world["customers"][1]
+    item, other_item = world["menu"][0], world["menu"][1]
+    assert client.post("/orders/", json={"customer_id": theirs["id"], "items": [
+        {"menu_item_id": item["id"], "quantity": 1}]}).status_code == 404
+    assert client.post("/orders/", json={"customer_id": mine["id"], "items": [
+        {"menu_item_id": other_item["id"], "quantity": 1}]}).status_code in (400, 404)
+
+
+def test_kitchen_and_search_per_location(client, world):
+    assert [order["id"] for order in ok(client.get("/kitchen/active", headers=L2))] == \
+        [world["orders"][1]["id"]]
+    assert [order["location_id"] for order in ok(client.get("/kitchen/active", headers=L3))] == [3]
+    assert [item["id"] for item in ok(client.get("/menu/search?q=piz", headers=L2))] == \
+        [world["menu"][1]["id"]]
+
+
+def test_summary_of_all_locations(engine, shard, client, world):
+    # one order a minute apart, location 3 the newest
+    for db_engine, location_id, minute in ((engine, 1, 1), (engine, 2, 2), (shard, 3, 3)):
+        with db_engine.begin() as connection:
+            connection.exec_driver_sql(
+                "UPDATE orders SET created_at = ? WHERE location_id = ?",
+                (f"2026-10-01 12:0{minute}:00", location_id))
+
+    summary = ok(client.get("/summary/?date=2026-10-01"))
+    assert summary["total_orders"] == 1 and summary["orders"][0]["location_id"] == 1
+
+    summary = ok(client.get("/summary/?date=2026-10-01&all_locations=true&per_page=2"))
+    assert (summary["total_orders"], summary["total_pages"]) == (3, 2)
+    assert [order["location_id"] for order in summary["orders"]] == [3, 2]
+    summary = ok(client.get("/summary/?date=2026-10-01&all_locations=true&per_page=2&page=2"))
+    assert [order["location_id"] for order in summary["orders"]] == [1]
+    assert summary["orders"][0]["items_ordered"][0]["quantity"] == 2
@@ -0,0 +1,61 @@
+"""The in-memory menu search (app/utils/menu_search.py): menu writes are
+searched on top of the index, without rebuilding it."""
+import random
+
+import pytest
+
+from app.utils.menu_search import MenuSearch, MenuSearchIndex, PatchedMenuSearchIndex
+
+from conftest import create_menu_item
+
+WORDS = ["tomato", "soup", "chicken", "tikka", "pizza", "pie", "apple", "burger", "cheese"]
+QUERIES = [None, "soup", "pi", "piz", "chiken tika", "apple pie", "burgr", "e"]
+
+
+def catalog(rng, count, first_id=1):
+    return [{"id": item_id, "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))).title(),
+             "price": rng.randint(1, 20), "category": rng.choice(["Main", "Dessert"])}
+            for item_id in range(first_id, first_id + count)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_patched_index_finds_what_a_rebuilt_one_does(seed):
+    rng = random.Random(seed)
+    items = {item["id"]: item for item in catalog(rng, 60)}
+    index = MenuSearchIndex(list(items.values()))
+
+    # renames, new items and deletes
+    changes = {item["id"]: item for item in catalog(rng, 10, first_id=55)}
+    changes.update({item_id: None for item_id in rng.sample(sorted(items), 5)})
+    items.update(changes)
+    rebuilt = MenuSearchIndex([item for item in items.values() if item is not None])
+    patched = PatchedMenuSearchIndex(index, changes)
+
+    for query in QUERIES:
+        for filters in ({}, {"category": "Main"}, {"min_price": 5, "max_price": 12}):
+            arguments = dict(query=query, category=None, min_price=None, max_price=None,
+                             limit=8) | filters
+            assert patched.search(**arguments) == rebuilt.search(**arguments), arguments
+
+
+def test_menu_writes_dont_rebuild_the_index(client, monkeypatch):
+    builds = []
+    build = MenuSearch.build
+    monkeypatch.setattr(MenuSearch, "build", lambda self, session: (
+        builds.append(self.location_id), build(self, session)))
+
+    def create(name):
+        return create_menu_item(client, name)["id"]
+
+    soup, stew, pie = create("Soup"), create("Stew"), create("Pie")
+    assert [item["id"] for item in client.get("/menu/search?q=s").json()] == [soup, stew]
+
+    client.patch(f"/menu/{stew}", json={"name": "Fish soup"})
+    client.delete(f"/menu/{soup}")
+    pumpkin = create("Pumpkin soup")
+    client.put(f"/menu/{pie}", json={"name": "Pie", "price": 3, "category": "Dessert",
+                                     "preparation_time_minutes": 5})
+    assert [item["name"] for item in client.get("/menu/search?q=soup").json()] == \
+        ["Fish soup", "Pumpkin soup"]
+    assert client.get("/menu/search?category=Dessert").json()[0]["price"] == 3
+    assert builds == [1]
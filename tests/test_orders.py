@@ -0,0 +1,77 @@
+"""Order writes: item diffs, version checks, the background status job."""
+import pytest
+
+from app.tasks.order_tasks import advance_status
+
+from conftest import create_menu_item, first_row
+
+
+@pytest.fixture
+def menu(client):
+    return [create_menu_item(client, name, price, "Main")["id"]
+            for name, price in (("Burger", 9), ("Fries", 3), ("Shake", 4))]
+
+
+def create_order(client, customer_id, lines):
+    response = client.post("/orders/", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": menu_item_id, "quantity": quantity} for menu_item_id, quantity in lines]})
+    assert response.status_code == 200, response.text
+    return response
+
+
+def item_rows(db_engine, order_id):
+    with db_engine.connect() as connection:
+        return dict(connection.exec_driver_sql(
+            "SELECT menu_item_id, id FROM order_items WHERE order_id = ?", (order_id,)).all())
+
+
+def test_put_only_touches_changed_items(engine, client, menu, customer_id):
+    burger, fries, shake = menu
+    order = create_order(client, customer_id, [(burger, 1), (fries, 2)]).json()
+    before = item_rows(engine, order["id"])
+
+    response = client.put(f"/orders/{order['id']}", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": burger, "quantity": 1}, {"menu_item_id": shake, "quantity": 1}]})
+    assert response.status_code == 200, response.text
+    after = item_rows(engine, order["id"])
+    # the unchanged line keeps its row, fries go, the shake is new
+    assert after[burger] == before[burger]
+    assert set(after) == {burger, shake}
+    assert response.json()["order_total"] == 13
+
+
+def test_stale_if_match_is_a_412(client, menu, customer_id):
+    response = create_order(client, customer_id, [(menu[0], 1)])
+    order_id, first_etag = response.json()["id"], response.headers["ETag"]
+
+    response = client.patch(f"/orders/{order_id}", json={"status": "Preparing"},
+                            headers={"If-Match": first_etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["ETag"] != first_etag
+    assert response.json()["version"] == 2
+
+    # a second writer still holding the first version loses
+    assert client.patch(f"/orders/{order_id}", json={"status": "Cancelled"},
+                        headers={"If-Match": first_etag}).status_code == 412
+    assert client.put(f"/orders/{order_id}", headers={"If-Match": first_etag}, json={
+        "customer_id": customer_id, "items": [{"menu_item_id": menu[1], "quantity": 1}]}
+    ).status_code == 412
+    assert client.get(f"/orders/{order_id}").json()["status"] == "Preparing"
+
+
+def test_create_enqueues_the_status_job(client, redis, menu, customer_id):
+    order_id = create_order(client, customer_id, [(menu[0], 1)]).json()["id"]
+    jobs = redis.run(redis.pool.queued_jobs())
+    assert [(job.function, job.args) for job in jobs] == [("update_order_status", (order_id, 1))]
+
+
+def test_advance_status_leaves_finished_orders_alone(engine, client, menu, customer_id):
+    order_id = create_order(client, customer_id, [(menu[0], 1)]).json()["id"]
+    assert advance_status(engine, order_id, "Preparing") is not None
+    assert first_row(engine, "SELECT status, version FROM orders WHERE id = :id",
+                     id=order_id) == ("Preparing", 2)
+
+    assert client.patch(f"/orders/{order_id}", json={"status": "Cancelled"}).status_code == 200
+    assert advance_status(engine, order_id, "Completed") is None
+    assert first_row(engine, "SELECT status FROM orders WHERE id = :id", id=order_id)[0] == "Cancelled"
+    assert advance_status(engine, order_id + 1, "Completed") is None
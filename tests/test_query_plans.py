@@ -0,0 +1,45 @@
+"""The hot read paths use their indexes, checked with EXPLAIN QUERY PLAN.
+
+Each case sends a request, captures the SQL it ran and asks SQLite how it
+would run it again: no full scan of orders or order_items, and the index
+the case is about shows up in the plan.
+"""
+import pytest
+
+from conftest import first_row, full_scans, query_plans
+
+BIG_TABLES = ("orders", "order_items")
+
+
+@pytest.fixture
+def day(seeded):
+    return first_row(seeded, "SELECT date(max(created_at)) FROM orders")[0]
+
+
+@pytest.fixture
+def customer(seeded):
+    return first_row(seeded, "SELECT customer_id FROM orders GROUP BY customer_id "
+                             "ORDER BY count(*) DESC LIMIT 1")[0]
+
+
+# name -> (url, index the orders query should use)
+CASES = {
+    "summary of a day": ("/summary/?date={day}&per_page=20", "ix_orders_created_at"),
+    "orders of a customer": ("/customers/{customer}/orders?expand=items", "ix_orders_customer_id_"),
+    "orders by status": ("/orders/?status=Cancelled&limit=20&expand=items", "ix_orders_status_id"),
+    "active orders": ("/orders/?status=Pending&status=Preparing&limit=20", "ix_orders_active"),
+    "an order and its items": ("/orders/{order}", "ix_order_items_order_id"),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_uses_index(name, seeded, client, queries, day, customer):
+    url, index = CASES[name]
+    queries.clear()
+    response = client.get(url.format(day=day, customer=customer, order=100))
+    assert response.status_code == 200, response.text
+
+    plans = query_plans(seeded, queries.statements)
+    assert plans, "no SELECT captured"
+    assert full_scans(plans, BIG_TABLES) == []
+    assert any(index in line for _, lines in plans for line in lines), plans
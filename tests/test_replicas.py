@@ -0,0 +1,106 @@
+"""Where get_read_session sends the read routes: replicas, primary, shard."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import create_engine
+
+import main
+from app import database
+from app.utils.read_your_writes import STICKY_COOKIE, ReadYourWritesMiddleware
+
+from conftest import new_engine
+
+
+def customer_names(client, **kwargs):
+    response = client.get("/customers/", **kwargs)
+    assert response.status_code == 200, response.text
+    return [customer["name"] for customer in response.json()]
+
+
+def add_customer(db_engine, name: str, location_id: int = 1):
+    with db_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO customers (location_id, name, email, order_count, lifetime_spend) "
+            "VALUES (?, ?, ?, 0, 0)", (location_id, name, f"{name.lower()}@example.com"))
+
+
+@pytest.fixture
+def replica():
+    # stands in for a replica: a database of its own, told apart by its rows
+    db_engine = new_engine()
+    add_customer(db_engine, "OnReplica")
+    yield db_engine
+    db_engine.dispose()
+
+
+@pytest.fixture
+def use_replicas(monkeypatch):
+    def use(*engines):
+        pool = database.ReplicaPool([])
+        pool.engines, pool.healthy = list(engines), [True] * len(engines)
+        monkeypatch.setattr(database, "replicas", pool)
+        return pool
+    return use
+
+
+def test_primary_without_replicas(engine, client):
+    add_customer(engine, "OnPrimary")
+    assert customer_names(client) == ["OnPrimary"]
+
+
+def test_reads_go_to_a_healthy_replica(engine, client, replica, use_replicas):
+    add_customer(engine, "OnPrimary")
+    use_replicas(replica)
+    assert customer_names(client) == ["OnReplica"]
+
+
+def test_prefer_primary(engine, client, replica, use_replicas):
+    add_customer(engine, "OnPrimary")
+    use_replicas(replica)
+    token = database.prefer_primary.set(True)
+    try:
+        session = next(database.get_read_session())
+        assert session.get_bind() is engine
+        session.close()
+    finally:
+        database.prefer_primary.reset(token)
+
+
+def test_a_down_replica_is_skipped_and_marked(engine, client, replica, use_replicas, tmp_path):
+    add_customer(engine, "OnPrimary")
+    down = create_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    pool = use_replicas(down)
+    assert customer_names(client) == ["OnPrimary"]
+    assert pool.healthy == [False]
+
+    # the next healthy one takes over
+    pool.engines, pool.healthy = [down, replica], [True, True]
+    for _ in range(2):
+        assert customer_names(client) == ["OnReplica"]
+
+
+def test_a_sharded_location_reads_its_shard(engine, use_database, replica, use_replicas):
+    shard = new_engine()
+    add_customer(shard, "OnShard", location_id=3)
+    client = use_database(engine, shards={3: shard})
+    use_replicas(replica)
+    assert customer_names(client, headers={"X-Location-Id": "3"}) == ["OnShard"]
+    shard.dispose()
+
+
+def test_writes_stick_the_client_to_the_primary(engine, use_database, replica, use_replicas):
+    # the middleware is only installed with READ_REPLICA_URLS, so wrap the app here
+    use_database(engine)
+    use_replicas(replica)
+    client = TestClient(ReadYourWritesMiddleware(main.app))
+
+    assert customer_names(client) == ["OnReplica"]
+    response = client.post("/customers/", json={"name": "Fresh", "email": "fresh@example.com"})
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.cookies
+    # the client reads its own write, from the primary
+    assert customer_names(client) == ["Fresh"]
+    # batch-get is a read, it doesn't open the window
+    client.cookies.clear()
+    response = client.post("/customers/batch-get", json={"ids": [1]})
+    assert STICKY_COOKIE not in response.cookies
+    assert customer_names(client) == ["OnReplica"]
@@ -0,0 +1,12 @@
+"""`import main` stays within the cold start budget of scripts/check_startup.py."""
+import os
+
+from scripts.check_startup import LAZY_MODULES, measure_import
+
+
+def test_import_time_and_lazy_modules():
+    budget = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5")) * \
+        float(os.getenv("TEST_TIME_BUDGET_FACTOR", "1"))
+    seconds, packages = measure_import(runs=2)
+    assert seconds <= budget, f"import main took {seconds:.3f}s, budget {budget:.3f}s"
+    assert not set(LAZY_MODULES) & packages
@@ -0,0 +1,107 @@
+"""Stock reservations on the Redis counters (app/utils/stock.py), on fakeredis."""
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tasks import enqueue
+from app.utils.stock import reconcile, stock_key
+
+from conftest import create_customer, create_menu_item, first_row
+
+
+def stocked_item(client, stock: int, name: str = "Pie") -> int:
+    item = create_menu_item(client, name, 4, "Dessert")
+    assert client.put(f"/menu/{item['id']}/stock", json={"stock_quantity": stock}).status_code == 200
+    return item["id"]
+
+
+def counter(redis, menu_item_id: int, location_id: int = 1):
+    value = redis.run(redis.pool.get(stock_key(location_id, menu_item_id)))
+    return None if value is None else int(value)
+
+
+def order(client, customer_id: int, menu_item_id: int, quantity: int = 1):
+    return client.post("/orders/", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": menu_item_id, "quantity": quantity}]})
+
+
+def test_concurrent_orders_never_oversell(file_engine, use_database, redis):
+    client = use_database(file_engine)
+    menu_item_id = stocked_item(client, stock=5)
+    customer_id = create_customer(client)["id"]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        codes = list(pool.map(lambda i: order(client, customer_id, menu_item_id).status_code,
+                              range(20)))
+
+    assert sorted(codes) == [200] * 5 + [409] * 15
+    assert counter(redis, menu_item_id) == 0
+    assert first_row(file_engine, "SELECT count(*) FROM orders")[0] == 5
+    assert client.get(f"/menu/{menu_item_id}").json()["available"] is False
+
+
+def test_all_or_nothing(client, redis, customer_id):
+    plenty, scarce = stocked_item(client, 10, "Soup"), stocked_item(client, 1, "Cake")
+    response = client.post("/orders/", json={"customer_id": customer_id, "items": [
+        {"menu_item_id": plenty, "quantity": 3}, {"menu_item_id": scarce, "quantity": 2}]})
+    assert response.status_code == 409
+    assert (counter(redis, plenty), counter(redis, scarce)) == (10, 1)
+
+
+def test_delete_and_edit_give_stock_back(client, redis, customer_id):
+    menu_item_id = stocked_item(client, stock=5)
+    created = order(client, customer_id, menu_item_id, quantity=3).json()
+    assert counter(redis, menu_item_id) == 2
+
+    response = client.put(f"/orders/{created['id']}", json={
+        "customer_id": customer_id, "items": [{"menu_item_id": menu_item_id, "quantity": 1}]})
+    assert response.status_code == 200, response.text
+    assert counter(redis, menu_item_id) == 4
+
+    assert client.delete(f"/orders/{created['id']}").status_code == 204
+    assert counter(redis, menu_item_id) == 5
+
+
+def test_reconcile_copies_counters_to_the_database(engine, client, redis, customer_id):
+    menu_item_id = stocked_item(client, stock=5)
+    order(client, customer_id, menu_item_id, quantity=2)
+    assert first_row(engine, "SELECT stock_quantity FROM menu_items WHERE id = :id",
+                     id=menu_item_id)[0] == 5
+
+    assert redis.run(reconcile(redis.pool, engine)) == 1
+    assert first_row(engine, "SELECT stock_quantity FROM menu_items WHERE id = :id",
+                     id=menu_item_id)[0] == 3
+
+    # a lost counter starts again from the column
+    redis.run(redis.pool.delete(stock_key(1, menu_item_id)))
+    assert redis.run(reconcile(redis.pool, engine)) == 0
+    assert counter(redis, menu_item_id) == 3
+
+
+def test_no_redis_is_a_503_not_an_oversell(client, redis, customer_id, monkeypatch):
+    menu_item_id = stocked_item(client, stock=5)
+    monkeypatch.setattr(enqueue, "_pool", None)
+    assert order(client, customer_id, menu_item_id).status_code == 503
+    assert client.get("/orders/").json() == []
+
+
+def test_cancelling_gives_stock_back_once(client, redis, customer_id):
+    menu_item_id = stocked_item(client, stock=5)
+    created = order(client, customer_id, menu_item_id, quantity=3).json()
+    assert counter(redis, menu_item_id) == 2
+
+    cancel = {"status": "Cancelled"}
+    assert client.patch(f"/orders/{created['id']}", json=cancel).status_code == 200
+    assert counter(redis, menu_item_id) == 5
+    # cancelling again, or deleting the cancelled order, gives nothing more
+    assert client.patch(f"/orders/{created['id']}", json=cancel).status_code == 200
+    assert counter(redis, menu_item_id) == 5
+
+    # reopening reserves it again, and fails like a new order when short
+    assert client.patch(f"/orders/{created['id']}", json={"status": "Pending"}).status_code == 200
+    assert counter(redis, menu_item_id) == 2
+    client.patch(f"/orders/{created['id']}", json=cancel)
+    order(client, customer_id, menu_item_id, quantity=4)
+    assert client.patch(f"/orders/{created['id']}", json={"status": "Pending"}).status_code == 409
+    assert client.get(f"/orders/{created['id']}").json()["status"] == "Cancelled"
+
+    assert client.delete(f"/orders/{created['id']}").status_code == 204
+    assert counter(redis, menu_item_id) == 1